@@ -1,29 +1,132 @@
 #!/usr/bin/env python3
 import os
-from datetime import datetime
-from flask import Flask, request, jsonify, abort
+import functools
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import Flask, Response, request, jsonify, abort, make_response
 from flask_cors import CORS
 import pymysql
+from db_pool import ConnectionPool
+from horse_races import add_race_routes
+from pagination import BadCursor, decode_cursor, page
+from ttl_cache import TTLCache
+import settings_cache
+import player_lookup
+import ign_index
+import leaderboard
+import bank_totals
+import ledger_export
+import data_version
+import metrics
+import replicas
+import slow_queries
+import profiler
+from events import hub, TooManyClients
 
 # -------------------- CONFIG --------------------
 DB_HOST = os.getenv("BANK_DB_HOST", "127.0.0.1")
 DB_USER = os.getenv("BANK_DB_USER", "factions_test")
 DB_PASS = os.getenv("BANK_DB_PASS", "SuperSecureTestPass123")
 DB_NAME = os.getenv("BANK_DB_NAME", "factions_bank")
+DB_POOL_SIZE = int(os.getenv("BANK_DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("BANK_DB_POOL_TIMEOUT", "10"))
+DB_POOL_MAX_IDLE = float(os.getenv("BANK_DB_POOL_MAX_IDLE", "300"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("BANK_DB_POOL_MAX_LIFETIME", "3600"))
+DB_POOL_PING_INTERVAL = float(os.getenv("BANK_DB_POOL_PING_INTERVAL", "5"))
+COUNT_TTL = float(os.getenv("BANK_COUNT_TTL", "5"))
+SERIES_MAX_POINTS = int(os.getenv("BANK_SERIES_MAX_POINTS", "2000"))
 API_KEY = os.getenv("BANK_API_KEY", "d6892971-aada-4ab6-ac14-76cd4c77054b")
+DB_REPLICAS = os.getenv("BANK_DB_REPLICAS", "")
+REPLICA_POOL_TIMEOUT = float(os.getenv("BANK_REPLICA_POOL_TIMEOUT", "1"))
+REPLICA_CONNECT_TIMEOUT = float(os.getenv("BANK_REPLICA_CONNECT_TIMEOUT", "2"))
 
-def db():
+def _connect():
     return pymysql.connect(
         host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME,
         autocommit=False, cursorclass=pymysql.cursors.DictCursor
     )
 
+pool = ConnectionPool(
+    _connect, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+    max_idle=DB_POOL_MAX_IDLE, max_lifetime=DB_POOL_MAX_LIFETIME,
+    ping_interval=DB_POOL_PING_INTERVAL
+)
+
+def _connect_replica(dsn):
+    return pymysql.connect(
+        **dsn, connect_timeout=REPLICA_CONNECT_TIMEOUT,
+        init_command="SET SESSION TRANSACTION READ ONLY",
+        autocommit=False, cursorclass=pymysql.cursors.DictCursor
+    )
+
+read_replicas = replicas.ReplicaSet(
+    replicas.parse_dsns(DB_REPLICAS, {"host": DB_HOST, "user": DB_USER,
+                                      "password": DB_PASS, "database": DB_NAME}),
+    lambda dsn: ConnectionPool(
+        functools.partial(_connect_replica, dsn), size=DB_POOL_SIZE,
+        timeout=REPLICA_POOL_TIMEOUT, max_idle=DB_POOL_MAX_IDLE,
+        max_lifetime=DB_POOL_MAX_LIFETIME, ping_interval=DB_POOL_PING_INTERVAL
+    )
+)
+
+def db_primary():
+    return metrics.instrument(pool.connection())
+
+def db_write():
+    """Primary connection for a route that writes; the client's reads stick to the primary for a while"""
+    replicas.mark_write()
+    return db_primary()
+
+def db_read(sticky=True):
+    """
+    Connection for a read-only route: a healthy replica, or the primary when
+    there is none or the client wrote within the last BANK_DB_STICKY_SECONDS
+    """
+    if read_replicas and not (sticky and replicas.wants_primary()):
+        cx = read_replicas.connection()
+        if cx is not None:
+            return metrics.instrument(cx)
+        replicas.note_read("primary")
+    elif read_replicas:
+        replicas.note_read("primary")
+    return db_primary()
+
+# Row counts for pagination, keyed by (table, search term)
+counts = TTLCache(maxsize=256, ttl=COUNT_TTL)
+
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["ETag", "Server-Timing"], max_age=600)
+metrics.init_app(app)
+
+TXN_SIGN = {"deposit": 1, "interest": 1, "payout": -1}
 
 print(f"🚀 Starting Factions Bank API")
 print(f"📊 Database: {DB_NAME}")
 print(f"🔌 Host: {DB_HOST}")
+print(f"🧵 Pool size: {DB_POOL_SIZE}")
+if read_replicas:
+    print(f"📚 Read replicas: {', '.join(r.name for r in read_replicas.replicas)}")
+
+def reset_after_fork():
+    """
+    Re-initialise per-process state in a freshly forked worker: the pool,
+    caches, ETag versions and the event hub must never be shared across
+    processes. serve.py calls this from gunicorn's post_fork hook; the pool
+    also notices a PID change on its own.
+    """
+    pool.reset_after_fork()
+    read_replicas.reset_after_fork()
+    replicas.reset_after_fork()
+    counts.reset_after_fork()
+    settings_cache.reset_after_fork()
+    player_lookup.reset_after_fork()
+    ign_index.reset_after_fork()
+    leaderboard.reset_after_fork()
+    ledger_export.reset_after_fork()
+    metrics.reset_after_fork()
+    slow_queries.reset_after_fork()
+    data_version.reset()
+    hub.reset()
 
 # -------------------- AUTH --------------------
 def require_api_key():
@@ -31,63 +134,175 @@ def require_api_key():
     if not k or k != API_KEY:
         abort(401, "invalid or missing API key")
 
+# -------------------- PROFILING --------------------
+@app.before_request
+def start_profile():
+    """?profile=1 (with the API key) returns the request's collapsed stacks instead"""
+    if request.args.get("profile") == "1":
+        require_api_key()
+        profiler.start()
+
+app.after_request(profiler.finish)
+app.teardown_request(profiler.abandon)
+
+# -------------------- READ REPLICAS --------------------
+if read_replicas:
+    app.after_request(replicas.after_request)
+
+# -------------------- CHANGE TRACKING --------------------
+def drop_cached(tables):
+    """Forget cached counts and the leaderboard once `tables` have changed"""
+    counts.clear()
+    if "accounts" in tables or "transactions" in tables:
+        leaderboard.mark_stale()
+
+# Writes by the bot, the interest job or other workers show up in the probe
+data_version.on_change(drop_cached)
+
+def data_changed(*tables):
+    """Call after a write commits: drops cached counts and bumps ETag versions"""
+    drop_cached(tables)
+    data_version.bump(*tables)
+    if read_replicas:
+        # Anything read from a replica under the new tag may predate the
+        # write; bump again once replicas in rotation must have caught up
+        for t in tables:
+            data_version.expire_in(t, replicas.MAX_LAG + 1)
+
+def publish_txn(txn_id, ign, txn_type, amount, note):
+    """Push a txn.created delta shaped like an /api/transactions row"""
+    hub.publish("txn.created", {
+        "id": txn_id,
+        "ign": ign,
+        "txn_type": txn_type,
+        "amount": amount,
+        "effective_delta": TXN_SIGN.get(txn_type, 1) * amount,
+        "note": note,
+        "created_at": datetime.now().isoformat()
+    })
+
+def etagged(*tables):
+    """
+    Serve a strong ETag built from the data version of `tables` and answer
+    a matching If-None-Match with 304 before the view touches MySQL.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            data_version.maybe_probe(functools.partial(db_read, sticky=False))
+            tag = data_version.etag(request.full_path, *tables)
+            if request.if_none_match.contains(tag):
+                resp = make_response("", 304)
+                resp.set_etag(tag)
+                return resp
+            
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code == 200:
+                resp.set_etag(tag)
+                resp.headers["Cache-Control"] = "no-cache"
+            return resp
+        return wrapper
+    return decorator
+
+# -------------------- IGN SEARCH --------------------
+def ign_filter(c, q):
+    """
+    WHERE clause and params for an IGN substring search. The clause filters
+    a.player_id on ids from ign_index so MySQL can use the index; a query
+    too broad to narrow down falls back to the LIKE scan.
+    """
+    ign_index.refresh(c)
+    ids = ign_index.search(q)
+    if ids is None:
+        return "p.ign LIKE %s", [f"%{q}%"]
+    if not ids:
+        return "FALSE", []
+    return f"a.player_id IN ({', '.join(['%s'] * len(ids))})", ids
+
+def player_filter(c, q):
+    """(player_ids, needle) narrowing the leaderboard to IGNs containing q"""
+    if not q:
+        return None, None
+    ign_index.refresh(c)
+    ids = ign_index.search(q)
+    return (None, q) if ids is None else (ids, None)
+
+# -------------------- COUNTS --------------------
+def count_players(c, q=""):
+    return leaderboard.count(*player_filter(c, q))
+
+def count_transactions(c, ign=""):
+    def load():
+        if ign:
+            where, params = ign_filter(c, ign)
+            c.execute("""
+                SELECT COUNT(*) AS n FROM transactions t
+                JOIN accounts a ON a.id=t.account_id
+                JOIN players p ON p.id=a.player_id
+                WHERE """ + where, params)
+        else:
+            c.execute("SELECT COUNT(*) AS n FROM transactions")
+        return c.fetchone()['n']
+    return counts.get_or_load(("transactions", ign), load)
+
 # -------------------- BANK ROUTES --------------------
 
+def player_json(player, settings):
+    """A leaderboard row as served by /api/players"""
+    player.pop('player_id', None)
+    balance = float(player['balance'] or 0)
+    is_premium = balance >= float(settings['premium_min_balance'] or 0)
+    
+    player['is_premium'] = 1 if is_premium else 0
+    player['interest_rate'] = float(
+        settings['premium_interest_rate_per_period'] if is_premium 
+        else settings['interest_rate_per_period']
+    )
+    player['balance'] = balance
+    
+    if player.get('last_compounded_at'):
+        player['last_compounded_at'] = player['last_compounded_at'].isoformat()
+    if player.get('created_at'):
+        player['created_at'] = player['created_at'].isoformat()
+    return player
+
 @app.get("/api/players")
+@etagged("accounts", "settings")
 def api_players():
     q = request.args.get("q", "")
     limit = min(int(request.args.get("limit", 200)), 1000)
     offset = int(request.args.get("offset", 0))
+    # Passing `cursor` (empty for the first page) switches to keyset paging
+    keyset = "cursor" in request.args
+    
+    try:
+        after = decode_cursor(request.args.get("cursor"), Decimal, int)
+    except BadCursor as e:
+        return jsonify({"error": str(e)}), 400
     
     try:
-        with db() as cx:
+        leaderboard.refresh(db_primary)
+        with db_read() as cx:
             with cx.cursor() as c:
-                c.execute("""
-                    SELECT interest_rate_per_period as normal_interest_rate, 
-                           premium_interest_rate_per_period as premium_interest_rate, 
-                           premium_min_balance as premium_balance_requirement 
-                    FROM settings WHERE id=1
-                """)
-                settings = c.fetchone() or {
-                    'normal_interest_rate': 0.05,
-                    'premium_interest_rate': 0.06,
-                    'premium_balance_requirement': 1000000000.00
+                settings = settings_cache.bank_settings(c) or {
+                    'interest_rate_per_period': 0.05,
+                    'premium_interest_rate_per_period': 0.06,
+                    'premium_min_balance': 1000000000.00
                 }
                 
-                sql = """
-                    SELECT p.ign, a.balance, a.last_compounded_at, p.created_at
-                    FROM players p
-                    JOIN accounts a ON a.player_id = p.id AND a.status='active'
-                """
-                params = []
-                
-                if q:
-                    sql += " WHERE p.ign LIKE %s"
-                    params.append(f"%{q}%")
-                
-                sql += " ORDER BY a.balance DESC LIMIT %s OFFSET %s"
-                params.extend([limit, offset])
-                
-                c.execute(sql, params)
-                players = c.fetchall()
-                
-                for player in players:
-                    balance = float(player['balance'] or 0)
-                    premium_req = float(settings['premium_balance_requirement'] or 0)
-                    is_premium = balance >= premium_req
-                    
-                    player['is_premium'] = 1 if is_premium else 0
-                    player['interest_rate'] = float(
-                        settings['premium_interest_rate'] if is_premium 
-                        else settings['normal_interest_rate']
+                player_ids, needle = player_filter(c, q)
+                players = leaderboard.page(limit + 1 if keyset else limit, offset, after,
+                                           player_ids, needle)
+                next_cursor = None
+                if keyset:
+                    players, next_cursor = page(
+                        players, limit, lambda r: (r['balance'], r['player_id'])
                     )
-                    player['balance'] = balance
-                    
-                    if player.get('last_compounded_at'):
-                        player['last_compounded_at'] = player['last_compounded_at'].isoformat()
-                    if player.get('created_at'):
-                        player['created_at'] = player['created_at'].isoformat()
+                    total = leaderboard.count(player_ids, needle)
+                players = [player_json(p, settings) for p in players]
         
+        if keyset:
+            return jsonify({"items": players, "next_cursor": next_cursor, "total": total})
         return jsonify(players)
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -96,35 +311,54 @@ def api_players():
         return jsonify({"error": str(e)}), 500
 
 @app.get("/api/transactions")
+@etagged("transactions")
 def api_transactions():
     ign = request.args.get("ign", "")
     limit = min(int(request.args.get("limit", 200)), 1000)
     offset = int(request.args.get("offset", 0))
+    keyset = "cursor" in request.args
     
     try:
-        with db() as cx:
+        after = decode_cursor(request.args.get("cursor"), int)
+    except BadCursor as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        with db_read() as cx:
             with cx.cursor() as c:
+                sql = """
+                    SELECT t.*, p.ign,
+                           (t.balance_after - t.effective_delta) AS before_balance
+                    FROM transactions t
+                    JOIN accounts a ON a.id=t.account_id
+                    JOIN players p ON p.id=a.player_id
+                """
+                where = []
+                params = []
+                
                 if ign:
-                    c.execute("""
-                        SELECT t.*, p.ign,
-                               (t.balance_after - t.effective_delta) AS before_balance
-                        FROM transactions t
-                        JOIN accounts a ON a.id=t.account_id
-                        JOIN players p ON p.id=a.player_id
-                        WHERE p.ign LIKE %s
-                        ORDER BY t.id DESC LIMIT %s OFFSET %s
-                    """, (f"%{ign}%", limit, offset))
+                    clause, ids = ign_filter(c, ign)
+                    where.append(clause)
+                    params.extend(ids)
+                if after:
+                    where.append("t.id < %s")
+                    params.append(after[0])
+                if where:
+                    sql += " WHERE " + " AND ".join(where)
+                
+                sql += " ORDER BY t.id DESC"
+                if keyset:
+                    sql += " LIMIT %s"
+                    params.append(limit + 1)
                 else:
-                    c.execute("""
-                        SELECT t.*, p.ign,
-                               (t.balance_after - t.effective_delta) AS before_balance
-                        FROM transactions t
-                        JOIN accounts a ON a.id=t.account_id
-                        JOIN players p ON p.id=a.player_id
-                        ORDER BY t.id DESC LIMIT %s OFFSET %s
-                    """, (limit, offset))
+                    sql += " LIMIT %s OFFSET %s"
+                    params.extend([limit, offset])
                 
+                c.execute(sql, params)
                 txns = c.fetchall()
+                next_cursor = None
+                if keyset:
+                    txns, next_cursor = page(txns, limit, lambda r: (r['id'],))
                 
                 for t in txns:
                     for field in ['amount', 'effective_delta', 'balance_after', 'before_balance']:
@@ -134,37 +368,139 @@ def api_transactions():
                         t['fee_pct'] = float(t['fee_pct'])
                     if t.get('created_at'):
                         t['created_at'] = t['created_at'].isoformat()
+                
+                if keyset:
+                    total = count_transactions(c, ign)
         
+        if keyset:
+            return jsonify({"items": txns, "next_cursor": next_cursor, "total": total})
         return jsonify(txns)
     except Exception as e:
         print(f"❌ Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.get("/api/players/rank")
+@etagged("accounts", "settings")
+def api_players_rank():
+    """?ign= -> the player's leaderboard rank and the `around` players either side"""
+    ign = request.args.get("ign", "")
+    around = min(int(request.args.get("around", 5)), 50)
+    if not ign:
+        return jsonify({"error": "ign required"}), 400
+    
+    try:
+        leaderboard.refresh(db_primary)
+        with db_read() as cx:
+            with cx.cursor() as c:
+                settings = settings_cache.bank_settings(c) or {
+                    'interest_rate_per_period': 0.05,
+                    'premium_interest_rate_per_period': 0.06,
+                    'premium_min_balance': 1000000000.00
+                }
+                ids = player_lookup.lookup(c, ign)
+                found = leaderboard.rank(ids[0], around) if ids else None
+        if not found:
+            return jsonify({"error": "No active account for that player"}), 404
+        
+        rank, rows = found
+        return jsonify({
+            "ign": ign,
+            "rank": rank,
+            "total": leaderboard.count(),
+            "around": [player_json(r, settings) for r in rows]
+        })
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.get("/api/players/suggest")
+def api_players_suggest():
+    """Autocomplete: ?q= prefix (then substring) matches from the in-memory IGN index"""
+    q = request.args.get("q", "").strip()
+    limit = min(int(request.args.get("limit", 10)), 50)
+    if not q:
+        return jsonify([])
+    try:
+        if ign_index.due():
+            with db_read() as cx:
+                with cx.cursor() as c:
+                    ign_index.refresh(c)
+        return jsonify(ign_index.suggest(q, limit))
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.get("/api/players/count")
+@etagged("accounts")
+def api_players_count():
+    q = request.args.get("q", "")
+    try:
+        leaderboard.refresh(db_primary)
+        with db_read() as cx:
+            with cx.cursor() as c:
+                return jsonify({"count": count_players(c, q)})
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.get("/api/transactions/count")
+@etagged("transactions")
+def api_transactions_count():
+    ign = request.args.get("ign", "")
+    try:
+        with db_read() as cx:
+            with cx.cursor() as c:
+                return jsonify({"count": count_transactions(c, ign)})
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.get("/api/transactions/export")
+def api_transactions_export():
+    """
+    Stream the ledger as NDJSON (default) or CSV, oldest first:
+    ?from=&to= (ISO dates, `to` exclusive), ?ign= (exact), ?after_id= to resume.
+    """
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ledger_export.FORMATS:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    try:
+        start = ledger_export.parse_time(request.args.get("from"), "from")
+        end = ledger_export.parse_time(request.args.get("to"), "to")
+        after_id = int(request.args.get("after_id", 0))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    sql, params = ledger_export.build_query(start, end, request.args.get("ign"), after_id)
+    try:
+        body = ledger_export.LedgerExport(db_read, fmt, sql, params)
+    except ledger_export.ExportBusy as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return jsonify({"error": str(e)}), 500
+    
+    filename = f"transactions-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    return Response(body, mimetype=ledger_export.FORMATS[fmt], headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no"
+    })
+
 @app.get("/api/settings")
+@etagged("settings", "accounts", "races")
 def api_settings():
     try:
-        with db() as cx:
+        with db_read() as cx:
             with cx.cursor() as c:
-                c.execute("""
-                    SELECT payout_fee_pct, 
-                           interest_rate_per_period as normal_interest_rate, 
-                           premium_interest_rate_per_period as premium_interest_rate, 
-                           premium_min_balance as premium_balance_requirement
-                    FROM settings WHERE id=1
-                """)
-                bank_settings = c.fetchone() or {
+                bank_settings = settings_cache.bank_settings(c) or {
                     'payout_fee_pct': 0.07,
-                    'normal_interest_rate': 0.05,
-                    'premium_interest_rate': 0.06,
-                    'premium_balance_requirement': 1000000000.00
+                    'interest_rate_per_period': 0.05,
+                    'premium_interest_rate_per_period': 0.06,
+                    'premium_min_balance': 1000000000.00
                 }
                 
-                c.execute("""
-                    SELECT winner_cut_pct, second_cut_pct, third_cut_pct,
-                           entry_fee, imperial_cut_pct, rules
-                    FROM horse_race_settings WHERE id=1
-                """)
-                race_settings = c.fetchone() or {
+                race_settings = settings_cache.race_settings(c) or {
                     'winner_cut_pct': 50.00,
                     'second_cut_pct': 30.00,
                     'third_cut_pct': 20.00,
@@ -173,18 +509,14 @@ def api_settings():
                     'rules': 'No rules set'
                 }
                 
-                c.execute("""
-                    SELECT COALESCE(SUM(balance), 0) AS total 
-                    FROM accounts WHERE status='active'
-                """)
-                debt = c.fetchone()
+                totals = bank_totals.read(c)
                 
                 return jsonify({
                     "bank": {
                         "payout_fee_pct": float(bank_settings['payout_fee_pct'] or 0),
-                        "interest_rate_normal": float(bank_settings['normal_interest_rate'] or 0),
-                        "interest_rate_premium": float(bank_settings['premium_interest_rate'] or 0),
-                        "premium_min_balance": float(bank_settings['premium_balance_requirement'] or 0)
+                        "interest_rate_normal": float(bank_settings['interest_rate_per_period'] or 0),
+                        "interest_rate_premium": float(bank_settings['premium_interest_rate_per_period'] or 0),
+                        "premium_min_balance": float(bank_settings['premium_min_balance'] or 0)
                     },
                     "horse_race": {
                         "winner1_pct": float(race_settings['winner_cut_pct'] or 0),
@@ -194,27 +526,113 @@ def api_settings():
                         "imperial_cut": float(race_settings['imperial_cut_pct'] or 0),
                         "rules": race_settings['rules'] or ""
                     },
-                    "total_bank_debt": float(debt['total'] or 0)
+                    "total_bank_debt": float(totals['total_debt']),
+                    "totals": {
+                        "total_debt": float(totals['total_debt']),
+                        "active_accounts": totals['active_accounts'],
+                        "premium_accounts": totals['premium_accounts'],
+                        "open_races": totals['open_races'],
+                        "open_prize_pools": float(totals['open_prize_pools'])
+                    }
                 })
     except Exception as e:
         print(f"❌ Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.post("/api/settings/invalidate")
+def api_settings_invalidate():
+    """Called by admin tooling after it changes rates or race settings"""
+    require_api_key()
+    settings_cache.invalidate()
+    data_changed("settings")
+    hub.publish("settings.changed", {})
+    return jsonify({"success": True})
+
+@app.post("/api/players/invalidate")
+def api_players_invalidate():
+    """
+    Called by whatever opens or closes accounts outside this API, so cached
+    IGN -> account lookups don't outlive them. Body {"ign": ...} drops one
+    player and has the IGN search index pick up new players; an empty body
+    drops them all and rebuilds the index.
+    """
+    require_api_key()
+    data = request.get_json(silent=True) or {}
+    player_lookup.invalidate(data.get("ign"))
+    if data.get("ign") is None:
+        ign_index.invalidate()
+    else:
+        ign_index.mark_stale()
+    leaderboard.invalidate()
+    data_changed("accounts")
+    return jsonify({"success": True})
+
+HISTORY_BUCKETS = {"hour": 3600, "day": 86400, "week": 604800}
+
 @app.get("/api/interest/history")
+@etagged("settings")
 def api_interest_history():
+    """
+    Rate changes in [from, to) (ISO, both optional), ?order=asc|desc, ?limit=.
+    ?bucket=hour|day|week keeps the last change per bucket (UTC-aligned);
+    ?bucket=auto picks the bucket width that yields at most ?points= rows.
+    """
     limit = min(int(request.args.get("limit", 1000)), 5000)
+    order = request.args.get("order", "asc")
+    bucket = request.args.get("bucket")
+    points = max(10, min(int(request.args.get("points", 500)), 5000))
+    if order not in ("asc", "desc"):
+        return jsonify({"error": "order must be asc or desc"}), 400
+    if bucket and bucket != "auto" and bucket not in HISTORY_BUCKETS:
+        return jsonify({"error": "bucket must be hour, day, week or auto"}), 400
+    try:
+        start = ledger_export.parse_time(request.args.get("from"), "from")
+        end = ledger_export.parse_time(request.args.get("to"), "to")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     try:
-        with db() as cx:
+        with db_read() as cx:
             with cx.cursor() as c:
-                c.execute("""
-                    SELECT id, changed_at, 
-                           normal_rate AS rate_normal_pct, 
-                           premium_rate AS rate_premium_pct,
-                           premium_min_balance
-                    FROM interest_rate_history 
-                    ORDER BY changed_at ASC LIMIT %s
-                """, (limit,))
+                conds, params = [], []
+                if start:
+                    conds.append("{t}.changed_at >= %s")
+                    params.append(start)
+                if end:
+                    conds.append("{t}.changed_at < %s")
+                    params.append(end)
+                where = (" WHERE " + " AND ".join(conds)) if conds else ""
+                
+                width = HISTORY_BUCKETS.get(bucket)
+                if bucket == "auto":
+                    first = start
+                    if first is None:
+                        c.execute("SELECT MIN(changed_at) AS first FROM interest_rate_history")
+                        first = c.fetchone()['first']
+                    span = ((end or datetime.now()) - first).total_seconds() if first else 0
+                    width = max(1, -(-int(span) // points))
+                
+                columns = """
+                    SELECT h.id, h.changed_at, 
+                           h.normal_rate AS rate_normal_pct, 
+                           h.premium_rate AS rate_premium_pct,
+                           h.premium_min_balance
+                    FROM interest_rate_history h
+                """
+                if width:
+                    # Last change per bucket; the subquery only reads the
+                    # (changed_at, id) index. History is append-only, so the
+                    # highest id in a bucket is its latest change.
+                    c.execute(columns + f"""
+                        JOIN (
+                            SELECT MAX(b.id) AS id FROM interest_rate_history b{where.format(t="b")}
+                            GROUP BY FLOOR(UNIX_TIMESTAMP(b.changed_at) / %s)
+                        ) last ON last.id = h.id
+                        ORDER BY h.changed_at {order.upper()} LIMIT %s
+                    """, params + [width, limit])
+                else:
+                    c.execute(columns + where.format(t="h")
+                              + f" ORDER BY h.changed_at {order.upper()} LIMIT %s", params + [limit])
                 rows = c.fetchall()
                 
                 for r in rows:
@@ -229,422 +647,158 @@ def api_interest_history():
         print(f"❌ Error: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.get("/api/races")
-def get_races():
+# -------------------- CHARTS --------------------
+SERIES_DEFAULT_SPAN = {"hour": timedelta(hours=48), "day": timedelta(days=30)}
+
+@app.get("/api/series/<scope>")
+@etagged("rollups")
+def api_series(scope):
+    """
+    Chart points from the rollup tables (scripts/rollup_transactions.py):
+    /api/series/bank or /api/series/player?ign=, ?bucket=hour|day, ?from=&to=
+    (ISO, `to` exclusive; defaults to the last 48 hours / 30 days).
+    Only buckets with transactions are returned.
+    """
+    bucket = request.args.get("bucket", "day")
+    ign = request.args.get("ign", "")
+    if scope not in ("bank", "player"):
+        return jsonify({"error": "scope must be bank or player"}), 404
+    if bucket not in SERIES_DEFAULT_SPAN:
+        return jsonify({"error": "bucket must be hour or day"}), 400
+    if scope == "player" and not ign:
+        return jsonify({"error": "ign required"}), 400
+    try:
+        end = ledger_export.parse_time(request.args.get("to"), "to") or datetime.now()
+        start = (ledger_export.parse_time(request.args.get("from"), "from")
+                 or end - SERIES_DEFAULT_SPAN[bucket])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     try:
-        with db() as cx:
+        with db_read() as cx:
             with cx.cursor() as c:
-                c.execute("""
-                    SELECT r.id, COALESCE(r.name, r.race_name, 'Unnamed Race') AS name,
-                           r.prize_pool, r.starts_at AS scheduled_at, r.ends_at,
-                           r.winner1_id, r.winner2_id, r.winner3_id, r.created_at,
-                           CASE 
-                               WHEN r.ends_at IS NOT NULL AND r.ends_at <= NOW() THEN 'finished'
-                               WHEN r.starts_at IS NOT NULL AND r.starts_at <= NOW() AND (r.ends_at IS NULL OR r.ends_at > NOW()) THEN 'live'
-                               ELSE 'scheduled'
-                           END AS status,
-                           (SELECT COUNT(*) FROM horse_jockeys hj WHERE hj.race_id = r.id) AS jockey_count
-                    FROM horse_races r ORDER BY r.id DESC
-                """)
-                races = c.fetchall()
-                
-                for race in races:
-                    race_id = race['id']
-                    race['prize_pool'] = float(race['prize_pool'] or 0)
-                    
+                if scope == "player":
+                    ids = player_lookup.lookup(c, ign)
+                    if not ids or not ids[1]:
+                        return jsonify({"error": "No active account for that player"}), 404
+                    c.execute("""
+                        SELECT bucket_start, txns, net_delta, inflow, outflow,
+                               close_balance AS balance
+                        FROM account_rollups
+                        WHERE account_id=%s AND bucket=%s
+                          AND bucket_start >= %s AND bucket_start < %s
+                        ORDER BY bucket_start LIMIT %s
+                    """, (ids[1], bucket, start, end, SERIES_MAX_POINTS))
+                else:
                     c.execute("""
-                        SELECT p.ign FROM horse_jockeys hj
-                        JOIN players p ON p.id = hj.player_id
-                        WHERE hj.race_id = %s ORDER BY hj.joined_at
-                    """, (race_id,))
-                    race['jockeys'] = [j['ign'] for j in c.fetchall()]
-                    
-                    for i in range(1, 4):
-                        if race[f'winner{i}_id']:
-                            c.execute("SELECT ign FROM players WHERE id=%s", (race[f'winner{i}_id'],))
-                            w = c.fetchone()
-                            race[f'winner{i}'] = w['ign'] if w else None
-                        else:
-                            race[f'winner{i}'] = None
-                        race.pop(f'winner{i}_id', None)
-                    
-                    for field in ['scheduled_at', 'ends_at', 'created_at']:
-                        if race.get(field):
-                            race[field] = race[field].isoformat()
+                        SELECT bucket_start, txns, net_delta, deposits, payouts,
+                               interest, race_winnings, ledger_total
+                        FROM bank_rollups
+                        WHERE bucket=%s AND bucket_start >= %s AND bucket_start < %s
+                        ORDER BY bucket_start LIMIT %s
+                    """, (bucket, start, end, SERIES_MAX_POINTS))
+                points = c.fetchall()
+                c.execute("SELECT last_txn_id FROM rollup_state WHERE id=1")
+                state = c.fetchone()
         
-        return jsonify(races)
+        for p in points:
+            p['t'] = p.pop('bucket_start').isoformat()
+            for field, value in p.items():
+                if isinstance(value, Decimal):
+                    p[field] = float(value)
+        
+        return jsonify({
+            "scope": scope,
+            "ign": ign or None,
+            "bucket": bucket,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "points": points,
+            "truncated": len(points) == SERIES_MAX_POINTS,
+            "rolled_up_to_txn": state['last_txn_id'] if state else 0
+        })
     except Exception as e:
         print(f"❌ Error: {e}")
         return jsonify({"error": str(e)}), 500
 
 # -------------------- HORSE RACE ROUTES --------------------
+add_race_routes(app, db_write, require_api_key, etagged=etagged,
+                data_changed=data_changed, publish_txn=publish_txn, db_read_func=db_read)
 
-@app.post("/api/races/new")
-def create_race():
-    require_api_key()
-    data = request.json
-    
-    race_name = data.get("name", f"Imperial Race {datetime.now().strftime('%Y-%m-%d')}")
-    starts_at = data.get("starts_at")
-    
-    if not starts_at:
-        return jsonify({"error": "starts_at is required"}), 400
-    
+# -------------------- LIVE EVENTS --------------------
+
+@app.get("/api/stream")
+def api_stream():
     try:
-        starts_at_dt = datetime.fromisoformat(starts_at.replace('Z', '+00:00'))
-    except:
-        return jsonify({"error": "Invalid starts_at format"}), 400
+        q = hub.subscribe(request.headers.get("Last-Event-ID"))
+    except TooManyClients as e:
+        return jsonify({"error": str(e)}), 503
     
-    try:
-        with db() as cx:
-            with cx.cursor() as c:
-                c.execute("""
-                    INSERT INTO horse_races (name, race_name, prize_pool, starts_at)
-                    VALUES (%s, %s, 0.00, %s)
-                """, (race_name, race_name, starts_at_dt))
-                race_id = c.lastrowid
-                cx.commit()
-                
-                return jsonify({
-                    "success": True,
-                    "race_id": race_id,
-                    "name": race_name,
-                    "starts_at": starts_at_dt.isoformat()
-                })
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return jsonify({"error": str(e)}), 500
+    return Response(hub.stream(q), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
-@app.post("/api/races/enroll")
-def enroll_jockey():
-    require_api_key()
-    data = request.json
-    
-    player_name = data.get("player_name")
-    if not player_name:
-        return jsonify({"error": "player_name is required"}), 400
-    
+@app.get("/healthz")
+def health():
     try:
-        with db() as cx:
+        with db_primary() as cx:
             with cx.cursor() as c:
-                # Get latest active race
-                c.execute("""
-                    SELECT id, prize_pool, name
-                    FROM horse_races 
-                    WHERE ends_at IS NULL
-                    ORDER BY id DESC LIMIT 1
-                """)
-                race = c.fetchone()
-                if not race:
-                    return jsonify({"error": "No active race found"}), 404
-                
-                race_id = race['id']
-                
-                # Get player
-                c.execute("SELECT id FROM players WHERE ign=%s", (player_name,))
-                player = c.fetchone()
-                if not player:
-                    return jsonify({"error": f"Player {player_name} not found"}), 404
-                
-                player_id = player['id']
-                
-                # Check if already enrolled
-                c.execute("""
-                    SELECT id FROM horse_jockeys 
-                    WHERE race_id=%s AND player_id=%s
-                """, (race_id, player_id))
-                if c.fetchone():
-                    return jsonify({"error": f"{player_name} already enrolled"}), 400
-                
-                # Get account
-                c.execute("""
-                    SELECT id, balance FROM accounts 
-                    WHERE player_id=%s AND status='active'
-                """, (player_id,))
-                account = c.fetchone()
-                if not account:
-                    return jsonify({"error": f"No active account for {player_name}"}), 404
-                
-                # Get settings
-                c.execute("""
-                    SELECT entry_fee, imperial_cut_pct 
-                    FROM horse_race_settings WHERE id=1
-                """)
-                settings = c.fetchone()
-                
-                entry_fee = float(settings['entry_fee'] or 100)
-                imperial_cut_pct = float(settings['imperial_cut_pct'] or 10) / 100
-                
-                # Check balance
-                if float(account['balance']) < entry_fee:
-                    return jsonify({
-                        "error": f"Insufficient balance. Required: ${entry_fee:,.2f}"
-                    }), 400
-                
-                # Calculate amounts
-                imperial_cut = entry_fee * imperial_cut_pct
-                prize_contribution = entry_fee - imperial_cut
-                
-                # Create transaction
-                c.execute("""
-                    INSERT INTO transactions (account_id, txn_type, amount, note)
-                    VALUES (%s, 'payout', %s, %s)
-                """, (account['id'], entry_fee, f"Horse race entry - {race['name']}"))
-                
-                # Add jockey
-                c.execute("""
-                    INSERT INTO horse_jockeys (race_id, player_id)
-                    VALUES (%s, %s)
-                """, (race_id, player_id))
-                
-                # Update prize pool
-                new_prize_pool = float(race['prize_pool']) + prize_contribution
-                c.execute("""
-                    UPDATE horse_races SET prize_pool = %s WHERE id = %s
-                """, (new_prize_pool, race_id))
-                
-                cx.commit()
-                
-                return jsonify({
-                    "success": True,
-                    "player": player_name,
-                    "race_id": race_id,
-                    "entry_fee": entry_fee,
-                    "prize_pool": new_prize_pool,
-                    "imperial_cut": imperial_cut
-                })
+                c.execute("SELECT 1")
+        return jsonify({"ok": True, "database": DB_NAME, "pool": pool.stats(),
+                        "replicas": {"configured": len(read_replicas),
+                                     "healthy": read_replicas.healthy()}})
     except Exception as e:
-        print(f"❌ Error: {e}")
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"ok": False, "error": str(e), "pool": pool.stats()}), 500
 
-def _set_winner(player_name, position):
-    """Helper to set winner and award prize"""
-    try:
-        with db() as cx:
-            with cx.cursor() as c:
-                # Get latest race
-                c.execute("""
-                    SELECT r.id, r.prize_pool, r.name,
-                           r.winner1_id, r.winner2_id, r.winner3_id
-                    FROM horse_races r
-                    WHERE r.ends_at IS NULL
-                    ORDER BY r.id DESC LIMIT 1
-                """)
-                race = c.fetchone()
-                if not race:
-                    return jsonify({"error": "No active race found"}), 404
-                
-                # Get player
-                c.execute("SELECT id FROM players WHERE ign=%s", (player_name,))
-                player = c.fetchone()
-                if not player:
-                    return jsonify({"error": f"Player {player_name} not found"}), 404
-                
-                player_id = player['id']
-                
-                # Check if enrolled
-                c.execute("""
-                    SELECT id FROM horse_jockeys 
-                    WHERE race_id=%s AND player_id=%s
-                """, (race['id'], player_id))
-                if not c.fetchone():
-                    return jsonify({"error": f"{player_name} not enrolled in race"}), 400
-                
-                # Check if already a winner
-                for i in range(1, 4):
-                    if i != position and race[f'winner{i}_id'] == player_id:
-                        return jsonify({"error": f"{player_name} already winner {i}"}), 400
-                
-                # Get prize distribution
-                c.execute("""
-                    SELECT winner_cut_pct, second_cut_pct, third_cut_pct
-                    FROM horse_race_settings WHERE id=1
-                """)
-                settings = c.fetchone()
-                
-                prize_pool = float(race['prize_pool'] or 0)
-                pct_map = {
-                    1: float(settings['winner_cut_pct']),
-                    2: float(settings['second_cut_pct']),
-                    3: float(settings['third_cut_pct'])
-                }
-                prize_amount = prize_pool * (pct_map[position] / 100)
-                
-                # Get account
-                c.execute("""
-                    SELECT id FROM accounts 
-                    WHERE player_id=%s AND status='active'
-                """, (player_id,))
-                account = c.fetchone()
-                if not account:
-                    return jsonify({"error": f"No active account for {player_name}"}), 404
-                
-                # Set winner
-                c.execute(f"""
-                    UPDATE horse_races 
-                    SET winner{position}_id = %s 
-                    WHERE id = %s
-                """, (player_id, race['id']))
-                
-                # Award prize
-                c.execute("""
-                    INSERT INTO transactions (account_id, txn_type, amount, note)
-                    VALUES (%s, 'deposit', %s, %s)
-                """, (account['id'], prize_amount, f"Horse race - Position {position} - {race['name']}"))
-                
-                cx.commit()
-                
-                return jsonify({
-                    "success": True,
-                    "player": player_name,
-                    "position": position,
-                    "prize": prize_amount,
-                    "race_id": race['id']
-                })
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return jsonify({"error": str(e)}), 500
+@app.get("/api/stats")
+def api_stats():
+    return jsonify({
+        "pool": pool.stats(),
+        "replicas": read_replicas.stats(),
+        "counts": counts.stats(),
+        "settings_cache": settings_cache.stats(),
+        "player_lookup": player_lookup.stats(),
+        "ign_index": ign_index.stats(),
+        "leaderboard": leaderboard.stats(),
+        "metrics": metrics.stats(),
+        "slow_queries": slow_queries.stats(),
+        "events": hub.stats()
+    })
 
-@app.post("/api/races/winner1")
-def set_winner1():
+@app.post("/api/debug/slow-queries")
+def set_slow_query_threshold():
+    """Body {"threshold_ms": N}: log statements slower than N ms, 0 = off (this worker only)"""
     require_api_key()
-    data = request.json
-    player_name = data.get("player_name")
-    if not player_name:
-        return jsonify({"error": "player_name is required"}), 400
-    return _set_winner(player_name, 1)
-
-@app.post("/api/races/winner2")
-def set_winner2():
-    require_api_key()
-    data = request.json
-    player_name = data.get("player_name")
-    if not player_name:
-        return jsonify({"error": "player_name is required"}), 400
-    return _set_winner(player_name, 2)
-
-@app.post("/api/races/winner3")
-def set_winner3():
-    require_api_key()
-    data = request.json
-    player_name = data.get("player_name")
-    if not player_name:
-        return jsonify({"error": "player_name is required"}), 400
-    return _set_winner(player_name, 3)
-
-@app.get("/api/races/info")
-def race_info():
+    data = request.get_json(silent=True) or {}
     try:
-        with db() as cx:
-            with cx.cursor() as c:
-                c.execute("""
-                    SELECT r.id, COALESCE(r.name, r.race_name, 'Unnamed Race') AS name,
-                           r.prize_pool, r.starts_at, r.ends_at,
-                           r.winner1_id, r.winner2_id, r.winner3_id,
-                           (SELECT COUNT(*) FROM horse_jockeys hj WHERE hj.race_id = r.id) AS jockey_count
-                    FROM horse_races r ORDER BY r.id DESC LIMIT 1
-                """)
-                race = c.fetchone()
-                if not race:
-                    return jsonify({"error": "No races found"}), 404
-                
-                race_id = race['id']
-                
-                # Get jockeys
-                c.execute("""
-                    SELECT p.ign FROM horse_jockeys hj
-                    JOIN players p ON p.id = hj.player_id
-                    WHERE hj.race_id = %s ORDER BY hj.joined_at
-                """, (race_id,))
-                jockeys = [j['ign'] for j in c.fetchall()]
-                
-                # Get winners
-                winners = {}
-                for i in range(1, 4):
-                    if race[f'winner{i}_id']:
-                        c.execute("SELECT ign FROM players WHERE id=%s", (race[f'winner{i}_id'],))
-                        w = c.fetchone()
-                        winners[f'winner{i}'] = w['ign'] if w else None
-                    else:
-                        winners[f'winner{i}'] = None
-                
-                # Get prize distribution
-                c.execute("""
-                    SELECT winner_cut_pct, second_cut_pct, third_cut_pct
-                    FROM horse_race_settings WHERE id=1
-                """)
-                settings = c.fetchone()
-                
-                prize_pool = float(race['prize_pool'] or 0)
-                
-                return jsonify({
-                    "race_id": race_id,
-                    "name": race['name'],
-                    "prize_pool": prize_pool,
-                    "starts_at": race['starts_at'].isoformat() if race['starts_at'] else None,
-                    "ends_at": race['ends_at'].isoformat() if race['ends_at'] else None,
-                    "jockey_count": race['jockey_count'],
-                    "jockeys": jockeys,
-                    **winners,
-                    "prize_distribution": {
-                        "winner1": prize_pool * (float(settings['winner_cut_pct']) / 100),
-                        "winner2": prize_pool * (float(settings['second_cut_pct']) / 100),
-                        "winner3": prize_pool * (float(settings['third_cut_pct']) / 100)
-                    }
-                })
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return jsonify({"error": str(e)}), 500
+        ms = float(data["threshold_ms"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "threshold_ms must be a number"}), 400
+    if ms < 0:
+        return jsonify({"error": "threshold_ms must be >= 0"}), 400
+    slow_queries.set_threshold(ms)
+    return jsonify(slow_queries.stats())
 
-@app.post("/api/races/end")
-def end_race():
-    require_api_key()
-    
-    try:
-        with db() as cx:
-            with cx.cursor() as c:
-                c.execute("""
-                    SELECT id, winner1_id FROM horse_races 
-                    WHERE ends_at IS NULL
-                    ORDER BY id DESC LIMIT 1
-                """)
-                race = c.fetchone()
-                if not race:
-                    return jsonify({"error": "No active race found"}), 404
-                
-                if not race['winner1_id']:
-                    return jsonify({"error": "Must set winner1 before ending race"}), 400
-                
-                c.execute("""
-                    UPDATE horse_races SET ends_at = NOW() WHERE id = %s
-                """, (race['id'],))
-                cx.commit()
-                
-                return jsonify({
-                    "success": True,
-                    "race_id": race['id'],
-                    "ended_at": datetime.now().isoformat()
-                })
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return jsonify({"error": str(e)}), 500
+POOL_GAUGES = ("size", "open", "in_use", "idle")
 
-@app.get("/healthz")
-def health():
-    try:
-        with db() as cx:
-            with cx.cursor() as c:
-                c.execute("SELECT 1")
-        return jsonify({"ok": True, "database": DB_NAME})
-    except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+@app.get("/metrics")
+def prometheus_metrics():
+    pool_stats = pool.stats()
+    gauges = {f"bank_db_pool_{k}": pool_stats[k] for k in POOL_GAUGES}
+    gauges["bank_sse_clients"] = hub.stats()["clients"]
+    gauges["bank_db_replicas_healthy"] = read_replicas.healthy()
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
 
 # -------------------- MAIN --------------------
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "8085"))
     print(f"🌐 Server: http://0.0.0.0:{port}")
+    print(f"⚠️  Development server - use serve.py for production")
     print(f"🔗 Endpoints:")
     print(f"   - http://localhost:{port}/healthz")
+    print(f"   - http://localhost:{port}/api/stats")
+    print(f"   - http://localhost:{port}/metrics")
     print(f"   - http://localhost:{port}/api/players")
     print(f"   - http://localhost:{port}/api/races")
     print(f"   - http://localhost:{port}/api/races/info")
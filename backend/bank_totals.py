@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Dashboard totals kept by triggers in bank_totals (migration 005)
+Total debt, active/premium account counts and open prize pools are summed
+from 32 counter slots instead of aggregating every account per request.
+recompute() and reconcile() rebuild them from the base tables.
+"""
+
+FIELDS = ("total_debt", "active_accounts", "premium_accounts", "open_races", "open_prize_pools")
+AMOUNTS = ("total_debt", "open_prize_pools")
+
+_READ_SQL = """
+    SELECT COALESCE(SUM(total_debt), 0) AS total_debt,
+           COALESCE(SUM(active_accounts), 0) AS active_accounts,
+           COALESCE(SUM(premium_accounts), 0) AS premium_accounts,
+           COALESCE(SUM(open_races), 0) AS open_races,
+           COALESCE(SUM(open_prize_pools), 0) AS open_prize_pools
+    FROM bank_totals
+"""
+
+_RECOMPUTE_SQL = """
+    SELECT acc.total_debt, acc.active_accounts, acc.premium_accounts,
+           r.open_races, r.open_prize_pools
+    FROM (
+        SELECT COALESCE(SUM(a.balance), 0) AS total_debt,
+               COUNT(*) AS active_accounts,
+               COALESCE(SUM(a.balance >= COALESCE(s.premium_min_balance, 1000000000.00)), 0)
+                   AS premium_accounts
+        FROM accounts a
+        LEFT JOIN settings s ON s.id = 1
+        WHERE a.status = 'active'
+    ) acc
+    CROSS JOIN (
+        SELECT COUNT(*) AS open_races, COALESCE(SUM(prize_pool), 0) AS open_prize_pools
+        FROM horse_races WHERE ends_at IS NULL
+    ) r
+"""
+
+
+def read(c):
+    """Current totals as {field: value} (Decimals for amounts, ints for counts)"""
+    c.execute(_READ_SQL)
+    return _totals(c.fetchone())
+
+
+def recompute(c):
+    """Totals aggregated from accounts, settings and horse_races"""
+    c.execute(_RECOMPUTE_SQL)
+    return _totals(c.fetchone())
+
+
+def _totals(row):
+    return {f: row[f] if f in AMOUNTS else int(row[f]) for f in FIELDS}
+
+
+def reconcile(c, fix=False):
+    """
+    Compare the maintained totals with a fresh aggregate inside the caller's
+    transaction; returns {field: (maintained, actual)} for fields that
+    differ. With fix=True the slots are rewritten to match (commit after).
+
+    The slots are locked first, so every writer that would change them
+    waits; the aggregate's snapshot is taken after that and therefore sees
+    exactly the changes already counted in the slots.
+    """
+    c.execute("SELECT slot FROM bank_totals FOR UPDATE")
+    c.fetchall()
+    maintained = read(c)
+    actual = recompute(c)
+    drift = {f: (maintained[f], actual[f]) for f in FIELDS if maintained[f] != actual[f]}
+    if drift and fix:
+        c.execute("""
+            UPDATE bank_totals
+            SET total_debt = 0, active_accounts = 0, premium_accounts = 0,
+                open_races = 0, open_prize_pools = 0
+        """)
+        c.execute("""
+            UPDATE bank_totals
+            SET total_debt = %(total_debt)s, active_accounts = %(active_accounts)s,
+                premium_accounts = %(premium_accounts)s, open_races = %(open_races)s,
+                open_prize_pools = %(open_prize_pools)s
+            WHERE slot = 0
+        """, actual)
+    return drift
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Cheap "has anything changed?" versions for the polled dashboard endpoints
+Write routes bump the tables they touch; a throttled probe of MAX(id)s picks
+up rows written by other processes (bot, interest job, other workers).
+"""
+import hashlib
+import heapq
+import math
+import os
+import threading
+import time
+
+PROBE_INTERVAL = float(os.getenv("BANK_VERSION_PROBE_INTERVAL", "5"))
+
+TABLES = ("transactions", "accounts", "races", "settings", "rollups")
+
+# probe column -> tables whose version it bumps
+_PROBE_MAP = {
+    "transactions": ("transactions", "accounts"),
+    "accounts": ("accounts",),
+    "races": ("races",),
+    "jockeys": ("races",),
+    "rates": ("settings",),
+    "rollups": ("rollups",),
+}
+
+_PROBE_SQL = """
+    SELECT (SELECT COALESCE(MAX(id), 0) FROM transactions) AS transactions,
+           (SELECT COALESCE(MAX(id), 0) FROM accounts) AS accounts,
+           (SELECT COALESCE(MAX(id), 0) FROM horse_races) AS races,
+           (SELECT COALESCE(MAX(id), 0) FROM horse_jockeys) AS jockeys,
+           (SELECT COALESCE(MAX(id), 0) FROM interest_rate_history) AS rates,
+           (SELECT COALESCE(MAX(version), 0) FROM rollup_state) AS rollups
+"""
+
+_lock = threading.Lock()
+_versions = dict.fromkeys(TABLES, 0)
+_fingerprint = None
+_probed_at = 0.0
+_deadlines = {}  # table -> heap of monotonic times at which its data goes stale on its own
+_listeners = []  # called with the set of tables a probe found changed
+# Counters are per process, so tags also carry a per-process epoch; a tag
+# issued by another worker never matches here and just costs a full 200.
+_epoch = os.urandom(8).hex()
+
+
+def bump(*tables):
+    with _lock:
+        for t in tables:
+            _versions[t] += 1
+
+
+def _fire(table, pending, now):
+    """Bump `table` once per deadline in `pending` that has passed; caller holds _lock"""
+    while pending and now >= pending[0]:
+        heapq.heappop(pending)
+        _versions[table] += 1
+
+
+def current(*tables):
+    now = time.monotonic()
+    with _lock:
+        for t in tables:
+            _fire(t, _deadlines.get(t), now)
+        return tuple(_versions[t] for t in tables)
+
+
+def expire_in(table, seconds):
+    """
+    Bump `table` once `seconds` pass, for data derived from NOW() (race
+    status) or read from a lagging replica. Every deadline fires, not just
+    the earliest. Deadlines are rounded up to the whole second, so the same
+    race's start asked for by every poll is only queued once.
+    """
+    now = time.monotonic()
+    when = math.ceil(now + max(0.0, seconds))
+    with _lock:
+        pending = _deadlines.setdefault(table, [])
+        _fire(table, pending, now)
+        if when not in pending:
+            heapq.heappush(pending, when)
+
+
+def on_change(callback):
+    """
+    Register `callback(tables)` to drop caches derived from `tables` when a
+    probe finds rows written outside this process. It runs before the
+    versions move, so no request can pair the new tag with a stale cache.
+    """
+    _listeners.append(callback)
+
+
+def maybe_probe(db_func):
+    """Refresh versions from the database at most once per PROBE_INTERVAL"""
+    global _fingerprint, _probed_at
+    now = time.monotonic()
+    with _lock:
+        if now - _probed_at < PROBE_INTERVAL:
+            return
+        _probed_at = now
+
+    try:
+        with db_func() as cx:
+            with cx.cursor() as c:
+                c.execute(_PROBE_SQL)
+                row = c.fetchone()
+    except Exception as e:
+        print(f"⚠️  Version probe failed: {e}")
+        return
+
+    with _lock:
+        previous, _fingerprint = _fingerprint, dict(row)
+    if previous is None:
+        return
+    changed = {t for col, tables in _PROBE_MAP.items()
+               if row[col] != previous[col] for t in tables}
+    if changed:
+        for callback in _listeners:
+            callback(changed)
+        bump(*changed)
+
+
+def etag(key, *tables):
+    raw = f"{_epoch}|{key}|{current(*tables)}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+
+def reset():
+    """Start a fresh epoch and probe state; called in each forked worker"""
+    global _lock, _epoch, _fingerprint, _probed_at
+    _lock = threading.Lock()
+    _epoch = os.urandom(8).hex()
+    _fingerprint = None
+    _probed_at = 0.0
+    _deadlines.clear()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Factions Bank MySQL connection pool
+Keeps a bounded set of open pymysql connections behind db_read()/db_write()
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the checkout timeout"""
+
+
+class PooledConnection:
+    """
+    A checked-out connection. Behaves like the pymysql connection it wraps,
+    but closing it (or leaving its `with` block) hands it back to the pool.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._pid = os.getpid()
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise AttributeError(f"connection already returned to pool ({name})")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        if self._pid != os.getpid():
+            # Checked out before a fork; the socket belongs to the parent
+            return
+        self._pool._release(raw, self._created_at)
+
+    def discard(self):
+        """
+        Close the underlying connection instead of handing it back, e.g. when
+        an unbuffered result is abandoned midway and would otherwise have to
+        be read to the end before the connection could be reused.
+        """
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        if self._pid != os.getpid():
+            return
+        self._pool._discard(raw)
+
+
+class ConnectionPool:
+    """
+    Thread-safe, bounded pool.
+      size          - max open connections (checked out + idle)
+      timeout       - seconds to wait for a free connection before PoolTimeout
+      max_idle      - idle connections older than this (seconds) are closed
+      max_lifetime  - connections older than this (seconds) are recycled
+      ping_interval - ping on checkout when idle longer than this (0 = always)
+    """
+
+    def __init__(self, connect, size=10, timeout=10, max_idle=300,
+                 max_lifetime=3600, ping_interval=5):
+        self._connect = connect
+        self.size = max(1, int(size))
+        self.timeout = float(timeout)
+        self.max_idle = float(max_idle)
+        self.max_lifetime = float(max_lifetime)
+        self.ping_interval = float(ping_interval)
+
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = deque()  # (raw, created_at, released_at)
+        self._open = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._ping_failures = 0
+        self._discarded = 0
+
+    # -------------------- CHECKOUT --------------------
+    def connection(self):
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+        start = time.monotonic()
+        waited = timed_out = False
+        stale = []
+        raw = created_at = released_at = None
+
+        with self._cond:
+            while True:
+                while self._idle:
+                    cand, c_at, r_at = self._idle.pop()
+                    if self._expired(c_at, r_at, time.monotonic()):
+                        stale.append(cand)
+                        self._open -= 1
+                        self._recycled += 1
+                        continue
+                    raw, created_at, released_at = cand, c_at, r_at
+                    break
+                if raw is not None or self._open < self.size:
+                    if raw is None:
+                        self._open += 1
+                    self._in_use += 1
+                    break
+
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    timed_out = True
+                    break
+                waited = True
+                self._cond.wait(remaining)
+
+            self._checkouts += 1
+            if waited:
+                waited_for = time.monotonic() - start
+                self._waits += 1
+                self._wait_total += waited_for
+                self._wait_max = max(self._wait_max, waited_for)
+
+        for s in stale:
+            _close_quietly(s)
+
+        if timed_out:
+            raise PoolTimeout(f"no database connection available after {self.timeout:.1f}s")
+
+        if raw is not None and time.monotonic() - released_at >= self.ping_interval:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._ping_failures += 1
+                _close_quietly(raw)
+                raw = None
+
+        if raw is None:
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            created_at = time.monotonic()
+            with self._cond:
+                self._created += 1
+
+        return PooledConnection(self, raw, created_at)
+
+    # -------------------- RELEASE --------------------
+    def _release(self, raw, created_at):
+        # Anything left uncommitted is discarded, same as closing a fresh connection
+        try:
+            raw.rollback()
+            healthy = raw.open
+        except Exception:
+            healthy = False
+
+        now = time.monotonic()
+        if healthy and now - created_at >= self.max_lifetime:
+            healthy = False
+            recycled = True
+        else:
+            recycled = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, created_at, now))
+            else:
+                self._open -= 1
+                if recycled:
+                    self._recycled += 1
+            self._cond.notify()
+
+        if not healthy:
+            _close_quietly(raw)
+
+    def _discard(self, raw):
+        with self._cond:
+            self._in_use -= 1
+            self._open -= 1
+            self._discarded += 1
+            self._cond.notify()
+        _close_quietly(raw)
+
+    def _expired(self, created_at, released_at, now):
+        return (now - released_at >= self.max_idle
+                or now - created_at >= self.max_lifetime)
+
+    # -------------------- ADMIN --------------------
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on release)"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for raw, _, _ in idle:
+            _close_quietly(raw)
+
+    def reset_after_fork(self):
+        """
+        Forget every connection inherited from the parent process. They are
+        dropped, not closed: sending COM_QUIT here would kill the parent's
+        session on the shared socket.
+        """
+        self._init_state()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_avg_ms": round(self._wait_total / self._waits * 1000, 3) if self._waits else 0.0,
+                "wait_time_max_ms": round(self._wait_max * 1000, 3),
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "ping_failures": self._ping_failures,
+                "discarded": self._discarded,
+            }
+
+
+def _close_quietly(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+In-process pub/sub hub behind the /api/stream Server-Sent Events endpoint
+Write routes publish small typed deltas; every connected dashboard gets them
+through its own bounded queue.
+
+Subscribers block on queue.Queue, so under a gevent worker (monkey-patched
+threading) an idle client is a parked greenlet, not an OS thread. The hub is
+per process: with several workers, a client only sees deltas published by
+the worker it is connected to and relies on its slow fallback poll for the rest.
+
+Event ids are "<epoch>-<seq>", the epoch being random per hub (and per
+forked worker). A reconnect whose Last-Event-ID can't be replayed in full
+(another epoch, older than the replay buffer, or more than a client queue
+holds) gets a `reset` event instead, and the dashboard refetches everything.
+"""
+import json
+import os
+import queue
+import threading
+from collections import deque
+
+QUEUE_SIZE = int(os.getenv("BANK_SSE_QUEUE_SIZE", "100"))
+MAX_CLIENTS = int(os.getenv("BANK_SSE_MAX_CLIENTS", "1000"))
+HEARTBEAT = float(os.getenv("BANK_SSE_HEARTBEAT", "15"))
+REPLAY_SIZE = 256
+
+_CLOSED = object()
+
+
+class TooManyClients(Exception):
+    """Raised when MAX_CLIENTS streams are already open"""
+
+
+class EventHub:
+    def __init__(self, queue_size=QUEUE_SIZE, max_clients=MAX_CLIENTS):
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._recent = deque(maxlen=REPLAY_SIZE)  # (seq, type, data) for Last-Event-ID replay
+        self._epoch = os.urandom(4).hex()
+        self._seq = 0
+        self._published = 0
+        self._dropped_clients = 0
+
+    def subscribe(self, last_event_id=None):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                raise TooManyClients(f"{self.max_clients} event streams already open")
+            self._clients.add(q)
+            backlog = self._replay_since(last_event_id)
+        for ev in backlog:
+            q.put_nowait(ev)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._clients.discard(q)
+
+    def publish(self, event_type, data):
+        with self._lock:
+            self._seq += 1
+            ev = (self._seq, event_type, data)
+            self._recent.append(ev)
+            self._published += 1
+            clients = list(self._clients)
+
+        for q in clients:
+            try:
+                q.put_nowait(ev)
+            except queue.Full:
+                # Too slow to keep up: cut it loose; it gets a reset and refetches
+                self.unsubscribe(q)
+                with self._lock:
+                    self._dropped_clients += 1
+                _force_put(q, _CLOSED)
+
+    def _replay_since(self, last_event_id):
+        """Events after last_event_id, or a lone reset when they can't all be replayed; caller holds _lock"""
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition("-")
+        try:
+            last = int(seq)
+        except ValueError:
+            last = None
+        reset = [(self._seq, "reset", {})]
+        if epoch != self._epoch or last is None or last > self._seq:
+            return reset
+        oldest = self._recent[0][0] if self._recent else self._seq + 1
+        if last < oldest - 1:
+            return reset
+        backlog = [ev for ev in self._recent if ev[0] > last]
+        return reset if len(backlog) > self.queue_size else backlog
+
+    def stream(self, q, heartbeat=HEARTBEAT):
+        """Generator of SSE frames for one subscriber; unsubscribes when closed"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    ev = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if ev is _CLOSED:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                seq, event_type, data = ev
+                yield (f"id: {self._epoch}-{seq}\nevent: {event_type}\n"
+                       f"data: {json.dumps(data, default=str)}\n\n")
+        finally:
+            self.unsubscribe(q)
+
+    def reset(self):
+        """
+        Drop subscribers, locks and the replay buffer inherited from a parent
+        process (after fork); the new epoch turns old ids into resets
+        """
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._recent.clear()
+        self._epoch = os.urandom(4).hex()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "max_clients": self.max_clients,
+                "published": self._published,
+                "dropped_clients": self._dropped_clients,
+                "last_event_id": f"{self._epoch}-{self._seq}",
+            }
+
+
+def _force_put(q, item):
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+hub = EventHub()
@@ -1,447 +1,864 @@
 #!/usr/bin/env python3
 """
-Imperial Horse Races Backend API
-Add these routes to app.py or import them
+Imperial Horse Races
+The one home of the race feature: its SQL, the row-to-JSON shaping and the
+/api/races routes. Query and service functions take a cursor and run inside
+the caller's transaction; app.py only registers the routes:
+
+    from horse_races import add_race_routes
+    add_race_routes(app, db, require_api_key, etagged=etagged,
+                    data_changed=data_changed, publish_txn=publish_txn)
 """
+import random
+import time
 from datetime import datetime
-from flask import request, jsonify, abort
+from flask import request, jsonify
 import pymysql
+import settings_cache
+import data_version
+import player_lookup
+from events import hub
+
+JOCKEY_BATCH = 1000
+MAX_BATCH = 200  # players per bulk enrolment request
+DEADLOCK_ERRORS = (1205, 1213)  # lock wait timeout, deadlock
+DUPLICATE_KEY = 1062
+MAX_RETRIES = 5
+
+class RaceError(Exception):
+    """
+    A request the race rules reject; carries the HTTP status to answer with
+    and, for bulk requests, the per-player results that explain it
+    """
+    def __init__(self, message, status=400, results=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.results = results
+
+def run_in_transaction(cx, work, retries=MAX_RETRIES):
+    """
+    Run work(cursor) and commit. Deadlocks and lock wait timeouts roll back
+    and retry with jittered exponential backoff; anything else rolls back
+    and propagates.
+    """
+    for attempt in range(1, retries + 1):
+        try:
+            with cx.cursor() as c:
+                result = work(c)
+            cx.commit()
+            return result
+        except pymysql.err.OperationalError as e:
+            cx.rollback()
+            if e.args[0] not in DEADLOCK_ERRORS or attempt == retries:
+                raise
+            time.sleep(min(1.0, 0.01 * 2 ** attempt) * random.uniform(0.5, 1.5))
+        except Exception:
+            cx.rollback()
+            raise
+
+# -------------------- QUERIES --------------------
+def _in(values):
+    return ", ".join(["%s"] * len(values))
+
+def latest_active_race(c):
+    """The newest race that hasn't ended, or None"""
+    c.execute("""
+        SELECT id, name, prize_pool, winner1_id, winner2_id, winner3_id
+        FROM horse_races
+        WHERE ends_at IS NULL
+        ORDER BY id DESC LIMIT 1
+    """)
+    return c.fetchone()
+
+def lock_race(c, race_id):
+    """Re-read a race FOR UPDATE, or None if it has ended meanwhile"""
+    c.execute("""
+        SELECT id, name, prize_pool, winner1_id, winner2_id, winner3_id
+        FROM horse_races WHERE id=%s AND ends_at IS NULL
+        FOR UPDATE
+    """, (race_id,))
+    return c.fetchone()
+
+def lock_account(c, ign):
+    """
+    Like lock_players for one IGN, but the ids come from the lookup cache
+    and the account is locked by primary key. A cached account that is no
+    longer active falls back to the uncached locking read.
+    """
+    ids = player_lookup.lookup(c, ign)
+    if not ids:
+        return None
+    player_id, account_id = ids
+    if account_id:
+        c.execute("""
+            SELECT balance FROM accounts
+            WHERE id=%s AND status='active'
+            FOR UPDATE
+        """, (account_id,))
+        row = c.fetchone()
+        if row:
+            return {"player_id": player_id, "ign": ign, "account_id": account_id,
+                    "balance": row['balance']}
+        player_lookup.invalidate(ign)
+    return lock_players(c, [ign]).get(ign.lower())
+
+def lock_players(c, names):
+    """
+    Players and their active accounts for `names`, {ign.lower(): row}, with
+    the account rows locked. Keys are lower-cased because the ign collation
+    is case-insensitive: "steve" finds the row stored as "Steve". Locks are
+    taken in account id order so two bulk requests over overlapping players
+    can't deadlock each other.
+    """
+    c.execute(f"""
+        SELECT p.id AS player_id, p.ign, a.id AS account_id, a.balance
+        FROM players p
+        LEFT JOIN accounts a ON a.player_id = p.id AND a.status='active'
+        WHERE p.ign IN ({_in(names)})
+        ORDER BY a.id
+        FOR UPDATE
+    """, names)
+    rows = {row['ign'].lower(): row for row in c.fetchall()}
+    for row in rows.values():
+        player_lookup.remember(row['ign'], row['player_id'], row['account_id'])
+    return rows
+
+def jockey_ids(c, race_id, player_ids, lock=""):
+    """
+    Which of `player_ids` ride in `race_id`. Pass lock="FOR UPDATE" or
+    "LOCK IN SHARE MODE" for a current read after taking account locks; a
+    plain SELECT would see the snapshot from before they were granted.
+    """
+    if not player_ids:
+        return set()
+    c.execute(f"""
+        SELECT player_id FROM horse_jockeys
+        WHERE race_id=%s AND player_id IN ({_in(player_ids)})
+        {lock}
+    """, [race_id, *player_ids])
+    return {row['player_id'] for row in c.fetchall()}
+
+_consecutive_ids = None
+
+def consecutive_ids(c):
+    """
+    Whether a multi-row INSERT's auto-increment ids run lastrowid,
+    lastrowid+1, ...: only with an increment of 1 and a lock mode that
+    reserves the statement's block up front (0 traditional, 1 consecutive).
+    Interleaved mode (2, the MySQL 8 default) and multi-primary setups
+    with auto_increment_increment > 1 break that. Read once per process.
+    """
+    global _consecutive_ids
+    if _consecutive_ids is None:
+        c.execute("SELECT @@auto_increment_increment AS step, @@innodb_autoinc_lock_mode AS mode")
+        row = c.fetchone()
+        _consecutive_ids = int(row['step']) == 1 and int(row['mode']) in (0, 1)
+    return _consecutive_ids
+
+def insert_transactions(c, txn_type, rows):
+    """
+    Insert [(account_id, amount, note)] and return the new transaction ids
+    in row order: one multi-row INSERT when the server hands out consecutive
+    ids, otherwise one INSERT per row so each id comes from its own lastrowid.
+    """
+    batch = len(rows) if len(rows) > 1 and consecutive_ids(c) else 1
+    ids = []
+    for i in range(0, len(rows), batch):
+        chunk = rows[i:i + batch]
+        c.execute(f"""
+            INSERT INTO transactions (account_id, txn_type, amount, note)
+            VALUES {", ".join(["(%s, %s, %s, %s)"] * len(chunk))}
+        """, [v for account_id, amount, note in chunk for v in (account_id, txn_type, amount, note)])
+        ids.extend(range(c.lastrowid, c.lastrowid + len(chunk)))
+    return ids
+
+def load_races(c, limit=None):
+    """
+    Load races newest-first with their jockey IGNs and winner IGNs attached.
+    One query for the races (winners joined in) plus one jockey query per
+    JOCKEY_BATCH races, instead of 1 + 4 queries per race.
+    """
+    sql = """
+        SELECT r.id, COALESCE(r.name, r.race_name, 'Unnamed Race') AS name,
+               r.prize_pool, r.starts_at, r.ends_at, r.created_at,
+               CASE
+                   WHEN r.ends_at IS NOT NULL AND r.ends_at <= NOW() THEN 'finished'
+                   WHEN r.starts_at IS NOT NULL AND r.starts_at <= NOW() AND (r.ends_at IS NULL OR r.ends_at > NOW()) THEN 'live'
+                   ELSE 'scheduled'
+               END AS status,
+               TIMESTAMPDIFF(SECOND, NOW(), r.starts_at) AS starts_in,
+               w1.ign AS winner1, w2.ign AS winner2, w3.ign AS winner3
+        FROM horse_races r
+        LEFT JOIN players w1 ON w1.id = r.winner1_id
+        LEFT JOIN players w2 ON w2.id = r.winner2_id
+        LEFT JOIN players w3 ON w3.id = r.winner3_id
+        ORDER BY r.id DESC
+    """
+    if limit is not None:
+        c.execute(sql + " LIMIT %s", (limit,))
+    else:
+        c.execute(sql)
+    races = c.fetchall()
+
+    by_id = {}
+    for race in races:
+        race['jockeys'] = []
+        race['jockey_count'] = 0
+        by_id[race['id']] = race
+
+    ids = list(by_id)
+    for i in range(0, len(ids), JOCKEY_BATCH):
+        batch = ids[i:i + JOCKEY_BATCH]
+        c.execute(f"""
+            SELECT hj.race_id, p.ign
+            FROM horse_jockeys hj
+            LEFT JOIN players p ON p.id = hj.player_id
+            WHERE hj.race_id IN ({_in(batch)})
+            ORDER BY hj.race_id, hj.joined_at, hj.id
+        """, batch)
+        for row in c.fetchall():
+            race = by_id[row['race_id']]
+            race['jockey_count'] += 1
+            if row['ign'] is not None:
+                race['jockeys'].append(row['ign'])
+
+    return races
+
+# -------------------- JSON SHAPING --------------------
+def race_json(race):
+    """A load_races row as an /api/races list item"""
+    race['prize_pool'] = float(race['prize_pool'] or 0)
+    race['scheduled_at'] = race.pop('starts_at')
+    race.pop('starts_in', None)
+    for field in ['scheduled_at', 'ends_at', 'created_at']:
+        if race.get(field):
+            race[field] = race[field].isoformat()
+    return race
+
+def prize_split(prize_pool, settings):
+    return {
+        1: prize_pool * (float(settings['winner_cut_pct']) / 100),
+        2: prize_pool * (float(settings['second_cut_pct']) / 100),
+        3: prize_pool * (float(settings['third_cut_pct']) / 100)
+    }
+
+def race_info_json(race, settings):
+    """A load_races row plus race settings as the /api/races/info body"""
+    prize_pool = float(race['prize_pool'] or 0)
+    split = prize_split(prize_pool, settings)
+    return {
+        "race_id": race['id'],
+        "name": race['name'],
+        "prize_pool": prize_pool,
+        "starts_at": race['starts_at'].isoformat() if race['starts_at'] else None,
+        "ends_at": race['ends_at'].isoformat() if race['ends_at'] else None,
+        "jockey_count": race['jockey_count'],
+        "jockeys": race['jockeys'],
+        "winner1": race['winner1'],
+        "winner2": race['winner2'],
+        "winner3": race['winner3'],
+        "prize_distribution": {
+            "winner1": split[1],
+            "winner2": split[2],
+            "winner3": split[3]
+        }
+    }
+
+# -------------------- SERVICE --------------------
+def create_race(c, name, starts_at):
+    c.execute("""
+        INSERT INTO horse_races (name, race_name, prize_pool, starts_at)
+        VALUES (%s, %s, 0.00, %s)
+    """, (name, name, starts_at))
+    return c.lastrowid
+
+def end_latest_race(c):
+    """Close the latest active race; it must have a winner1. Returns its id"""
+    race = latest_active_race(c)
+    if not race:
+        raise RaceError("No active race found", 404)
+    if not race['winner1_id']:
+        raise RaceError("Must set winner1 before ending race")
+
+    c.execute("UPDATE horse_races SET ends_at = NOW() WHERE id = %s", (race['id'],))
+    return race['id']
+
+def enroll_player(c, player_name):
+    """
+    Enroll a player in the latest active race inside the caller's transaction.
+    Lock order is always account row -> jockey row -> race row, so concurrent
+    enrolments queue on the account and the prize pool instead of deadlocking:
+      - the account is read FOR UPDATE, so the balance check holds until commit
+      - UNIQUE(race_id, player_id) rejects double enrolment
+      - the prize pool is incremented in SQL, never read-modify-written
+    """
+    race = latest_active_race(c)
+    if not race:
+        raise RaceError("No active race found", 404)
+
+    row = lock_account(c, player_name)
+    if not row:
+        raise RaceError(f"Player {player_name} not found", 404)
+    if not row['account_id']:
+        raise RaceError(f"No active account for {player_name}", 404)
+
+    settings = settings_cache.race_settings(c)
+    entry_fee = float(settings['entry_fee'] or 100)
+    imperial_cut_pct = float(settings['imperial_cut_pct'] or 10) / 100
+
+    if float(row['balance']) < entry_fee:
+        raise RaceError(f"Insufficient balance. Required: ${entry_fee:,.2f}")
+
+    imperial_cut = entry_fee * imperial_cut_pct
+    prize_contribution = entry_fee - imperial_cut
+
+    try:
+        c.execute("""
+            INSERT INTO horse_jockeys (race_id, player_id)
+            VALUES (%s, %s)
+        """, (race['id'], row['player_id']))
+    except pymysql.err.IntegrityError as e:
+        if e.args[0] == DUPLICATE_KEY:
+            raise RaceError(f"{player_name} already enrolled")
+        raise
+
+    note = f"Horse race entry - {race['name']}"
+    txn_id, = insert_transactions(c, "payout", [(row['account_id'], entry_fee, note)])
+
+    c.execute("""
+        UPDATE horse_races SET prize_pool = prize_pool + %s
+        WHERE id = %s AND ends_at IS NULL
+    """, (prize_contribution, race['id']))
+    if c.rowcount == 0:
+        raise RaceError("Race ended before enrolment completed", 409)
+
+    # Row is X-locked by the update, so this is our own post-increment value
+    c.execute("SELECT prize_pool FROM horse_races WHERE id=%s", (race['id'],))
+    prize_pool = float(c.fetchone()['prize_pool'])
+
+    return {
+        "player": player_name,
+        "player_id": row['player_id'],
+        "race_id": race['id'],
+        "race_name": race['name'],
+        "entry_fee": entry_fee,
+        "prize_pool": prize_pool,
+        "imperial_cut": imperial_cut,
+        "txn_id": txn_id,
+        "note": note
+    }
+
+def enroll_players(c, player_names):
+    """
+    Enroll many players in the latest active race inside the caller's
+    transaction: one lookup for all players, one multi-row insert each into
+    horse_jockeys and transactions, one prize pool increment. Players that
+    can't join get a per-player error; the rest are enrolled.
+    Same lock order as enroll_player: accounts -> jockeys -> race.
+    """
+    race = latest_active_race(c)
+    if not race:
+        raise RaceError("No active race found", 404)
+
+    # First spelling of each player, keyed like lock_players
+    names = {}
+    for name in player_names:
+        names.setdefault(name.lower(), name)
+    players = lock_players(c, list(names.values()))
+    enrolled = jockey_ids(c, race['id'], [p['player_id'] for p in players.values()],
+                          lock="FOR UPDATE")
+
+    settings = settings_cache.race_settings(c)
+    entry_fee = float(settings['entry_fee'] or 100)
+    imperial_cut_pct = float(settings['imperial_cut_pct'] or 10) / 100
+    imperial_cut = entry_fee * imperial_cut_pct
+    prize_contribution = entry_fee - imperial_cut
+
+    results = {}
+    joining = []
+    for key, name in names.items():
+        row = players.get(key)
+        if not row:
+            results[key] = (404, f"Player {name} not found")
+        elif not row['account_id']:
+            results[key] = (404, f"No active account for {name}")
+        elif row['player_id'] in enrolled:
+            results[key] = (400, f"{name} already enrolled")
+        elif float(row['balance']) < entry_fee:
+            results[key] = (400, f"Insufficient balance. Required: ${entry_fee:,.2f}")
+        else:
+            joining.append(row)
+
+    note = f"Horse race entry - {race['name']}"
+    txn_ids = []
+    if joining:
+        try:
+            c.execute(f"""
+                INSERT INTO horse_jockeys (race_id, player_id)
+                VALUES {", ".join(["(%s, %s)"] * len(joining))}
+            """, [v for row in joining for v in (race['id'], row['player_id'])])
+        except pymysql.err.IntegrityError as e:
+            if e.args[0] == DUPLICATE_KEY:
+                raise RaceError("Enrolment changed concurrently, retry", 409)
+            raise
+
+        txn_ids = insert_transactions(c, "payout", [
+            (row['account_id'], entry_fee, note) for row in joining
+        ])
+
+        c.execute("""
+            UPDATE horse_races SET prize_pool = prize_pool + %s
+            WHERE id = %s AND ends_at IS NULL
+        """, (prize_contribution * len(joining), race['id']))
+        if c.rowcount == 0:
+            raise RaceError("Race ended before enrolment completed", 409)
+
+    c.execute("SELECT prize_pool FROM horse_races WHERE id=%s", (race['id'],))
+    prize_pool = float(c.fetchone()['prize_pool'])
+
+    txn_by_key = {row['ign'].lower(): txn_id for row, txn_id in zip(joining, txn_ids)}
+    out = []
+    for name in player_names:
+        key = name.lower()
+        if key in txn_by_key:
+            out.append({"player": name, "success": True, "txn_id": txn_by_key.pop(key)})
+        elif key in results:
+            status, error = results.pop(key)
+            out.append({"player": name, "success": False, "status": status, "error": error})
+        else:
+            out.append({"player": name, "success": False, "status": 400,
+                        "error": f"{name} listed more than once"})
+
+    return {
+        "race_id": race['id'],
+        "race_name": race['name'],
+        "entry_fee": entry_fee,
+        "imperial_cut": imperial_cut,
+        "prize_pool": prize_pool,
+        "enrolled": [row['ign'] for row in joining],
+        "note": note,
+        "results": out
+    }
+
+def set_winner(c, player_name, position):
+    """Set one placing on the latest active race and pay its prize"""
+    race = latest_active_race(c)
+    if not race:
+        raise RaceError("No active race found", 404)
+
+    # Locked and re-checked active, like enrolment: the cached account may
+    # have been closed since it was looked up
+    row = lock_account(c, player_name)
+    if not row:
+        raise RaceError(f"Player {player_name} not found", 404)
+    player_id, account_id = row['player_id'], row['account_id']
+
+    if player_id not in jockey_ids(c, race['id'], [player_id]):
+        raise RaceError(f"{player_name} not enrolled in race")
+
+    for i in range(1, 4):
+        if i != position and race[f'winner{i}_id'] == player_id:
+            raise RaceError(f"{player_name} already winner {i}")
+
+    settings = settings_cache.race_settings(c)
+    prize_amount = prize_split(float(race['prize_pool'] or 0), settings)[position]
+
+    if not account_id:
+        raise RaceError(f"No active account for {player_name}", 404)
+
+    c.execute(f"""
+        UPDATE horse_races
+        SET winner{position}_id = %s
+        WHERE id = %s
+    """, (player_id, race['id']))
+
+    note = f"Horse race - Position {position} - {race['name']}"
+    txn_id, = insert_transactions(c, "deposit", [(account_id, prize_amount, note)])
+
+    return {
+        "race_id": race['id'],
+        "player": player_name,
+        "position": position,
+        "prize": prize_amount,
+        "txn_id": txn_id,
+        "note": note
+    }
+
+def settle_race(c, placings, end=False):
+    """
+    Set the latest active race's winners and pay their prizes in the
+    caller's transaction. `placings` maps position (1-3) to IGN; position 1
+    is required. All-or-nothing: if any placing is invalid, RaceError
+    carries the per-position results and nothing is written. A position
+    already held by the same player is left alone, so retrying a settle
+    never pays twice. With `end`, the race is closed in the same transaction.
+    """
+    if not placings.get(1):
+        raise RaceError("winner1 is required")
+
+    race = latest_active_race(c)
+    if not race:
+        raise RaceError("No active race found", 404)
+
+    names = list(dict.fromkeys(placings.values()))
+    players = lock_players(c, names)
+    enrolled = jockey_ids(c, race['id'], [p['player_id'] for p in players.values()],
+                          lock="LOCK IN SHARE MODE")
+
+    # Race row last, matching the enrolment lock order
+    race = lock_race(c, race['id'])
+    if not race:
+        raise RaceError("Race ended before settlement", 409)
+
+    settings = settings_cache.race_settings(c)
+    prize_pool = float(race['prize_pool'] or 0)
+    split = prize_split(prize_pool, settings)
+
+    results = []
+    awards = []
+    failed = False
+    for position in sorted(placings):
+        name = placings[position]
+        row = players.get(name.lower())
+        error = None
+        if [n.lower() for n in placings.values()].count(name.lower()) > 1:
+            error = (400, f"{name} placed more than once")
+        elif not row:
+            error = (404, f"Player {name} not found")
+        elif row['player_id'] not in enrolled:
+            error = (400, f"{name} not enrolled in race")
+        elif not row['account_id']:
+            error = (404, f"No active account for {name}")
+        else:
+            for i in range(1, 4):
+                if i != position and race[f'winner{i}_id'] == row['player_id'] and i not in placings:
+                    error = (400, f"{name} already winner {i}")
+            current = race[f'winner{position}_id']
+            if not error and current and current != row['player_id']:
+                error = (409, f"winner{position} is already set")
+
+        if error:
+            failed = True
+            results.append({"position": position, "player": name, "success": False,
+                            "status": error[0], "error": error[1]})
+        elif race[f'winner{position}_id'] == row['player_id']:
+            results.append({"position": position, "player": name, "success": True,
+                            "prize": 0.0, "already_set": True})
+        else:
+            note = f"Horse race - Position {position} - {race['name']}"
+            awards.append((position, row, split[position], note))
+            results.append({"position": position, "player": name, "success": True,
+                            "prize": split[position]})
+
+    if failed:
+        raise RaceError("Settlement rejected", 400, results)
+
+    if awards:
+        c.execute(f"""
+            UPDATE horse_races
+            SET {", ".join(f"winner{position}_id = %s" for position, *_ in awards)}
+            WHERE id = %s
+        """, [row['player_id'] for _, row, *_ in awards] + [race['id']])
 
-def add_race_routes(app, db_func, require_api_key_func):
+    txn_ids = insert_transactions(c, "deposit", [
+        (row['account_id'], prize, note) for _, row, prize, note in awards
+    ])
+    txn_by_position = {position: txn_id for (position, *_), txn_id in zip(awards, txn_ids)}
+    for r in results:
+        if r['position'] in txn_by_position:
+            r['txn_id'] = txn_by_position[r['position']]
+
+    if end:
+        c.execute("UPDATE horse_races SET ends_at = NOW() WHERE id = %s", (race['id'],))
+
+    return {
+        "race_id": race['id'],
+        "race_name": race['name'],
+        "prize_pool": prize_pool,
+        "ended": end,
+        "awards": [
+            {"position": position, "player": row['ign'], "prize": prize,
+             "note": note, "txn_id": txn_id}
+            for (position, row, prize, note), txn_id in zip(awards, txn_ids)
+        ],
+        "results": results
+    }
+
+# -------------------- ROUTES --------------------
+def _no_etag(*tables):
+    return lambda view: view
+
+def add_race_routes(app, db_func, require_api_key_func, etagged=_no_etag,
+                    data_changed=lambda *tables: None, publish_txn=lambda *args: None,
+                    db_read_func=None):
     """
-    Add horse race routes to Flask app
-    Usage in app.py:
-        from horse_races import add_race_routes
-        add_race_routes(app, db, require_api_key)
+    Register the /api/races routes on a Flask app. The hooks let the host
+    app keep its cross-cutting behaviour: `etagged(*tables)` decorates the
+    GETs, `data_changed(*tables)` runs after every committed write and
+    `publish_txn(txn_id, ign, txn_type, amount, note)` announces new
+    transactions on the event stream. Writes use `db_func`; the GETs use
+    `db_read_func` when given (e.g. a replica), else `db_func`.
     """
-    
-    # Create new race
+    read_db = db_read_func or db_func
+
+    def run(work):
+        with db_func() as cx:
+            return run_in_transaction(cx, work)
+
+    def error_response(e):
+        body = {"error": e.message}
+        if e.results is not None:
+            body["results"] = e.results
+        return jsonify(body), e.status
+
+    @app.get("/api/races")
+    @etagged("races")
+    def get_races():
+        try:
+            with read_db() as cx:
+                with cx.cursor() as c:
+                    races = load_races(c)
+
+            for race in races:
+                if race['status'] == 'scheduled' and race['starts_in'] is not None:
+                    # status flips to 'live' on its own, so the ETag must too
+                    data_version.expire_in("races", race['starts_in'] + 1)
+            return jsonify([race_json(race) for race in races])
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.get("/api/races/info")
+    @etagged("races", "settings")
+    def race_info():
+        try:
+            with read_db() as cx:
+                with cx.cursor() as c:
+                    races = load_races(c, limit=1)
+                    if not races:
+                        return jsonify({"error": "No races found"}), 404
+                    settings = settings_cache.race_settings(c)
+
+            return jsonify(race_info_json(races[0], settings))
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return jsonify({"error": str(e)}), 500
+
     @app.post("/api/races/new")
-    def create_race():
+    def new_race():
         require_api_key_func()
         data = request.json
-        
+
         race_name = data.get("name", f"Imperial Race {datetime.now().strftime('%Y-%m-%d')}")
-        starts_at = data.get("starts_at")  # ISO datetime string
-        
+        starts_at = data.get("starts_at")
+
         if not starts_at:
             return jsonify({"error": "starts_at is required"}), 400
-        
+
         try:
             starts_at_dt = datetime.fromisoformat(starts_at.replace('Z', '+00:00'))
         except:
-            return jsonify({"error": "Invalid starts_at format. Use ISO 8601"}), 400
-        
-        print(f"🏇 Creating new race: {race_name} at {starts_at}")
-        
+            return jsonify({"error": "Invalid starts_at format"}), 400
+
         try:
-            with db_func() as cx:
-                with cx.cursor() as c:
-                    c.execute("""
-                        INSERT INTO horse_races (name, race_name, prize_pool, starts_at)
-                        VALUES (%s, %s, 0.00, %s)
-                    """, (race_name, race_name, starts_at_dt))
-                    
-                    race_id = c.lastrowid
-                    cx.commit()
-                    
-                    print(f"✅ Race created with ID: {race_id}")
-                    
-                    return jsonify({
-                        "success": True,
-                        "race_id": race_id,
-                        "name": race_name,
-                        "starts_at": starts_at_dt.isoformat()
-                    })
-        
+            race_id = run(lambda c: create_race(c, race_name, starts_at_dt))
         except Exception as e:
-            print(f"❌ Error creating race: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"❌ Error: {e}")
             return jsonify({"error": str(e)}), 500
-    
-    # Enroll jockey in latest race
+
+        data_changed("races")
+        hub.publish("race.created", {
+            "id": race_id,
+            "name": race_name,
+            "scheduled_at": starts_at_dt.isoformat()
+        })
+
+        return jsonify({
+            "success": True,
+            "race_id": race_id,
+            "name": race_name,
+            "starts_at": starts_at_dt.isoformat()
+        })
+
     @app.post("/api/races/enroll")
     def enroll_jockey():
         require_api_key_func()
         data = request.json
-        
+
         player_name = data.get("player_name")
         if not player_name:
             return jsonify({"error": "player_name is required"}), 400
-        
-        print(f"🏇 Enrolling {player_name} in latest race")
-        
+
         try:
-            with db_func() as cx:
-                with cx.cursor() as c:
-                    # Get latest race that hasn't ended
-                    c.execute("""
-                        SELECT id, prize_pool, name
-                        FROM horse_races 
-                        WHERE ends_at IS NULL
-                        ORDER BY id DESC 
-                        LIMIT 1
-                    """)
-                    race = c.fetchone()
-                    
-                    if not race:
-                        return jsonify({"error": "No active race found"}), 404
-                    
-                    race_id = race['id']
-                    
-                    # Get player
-                    c.execute("SELECT id FROM players WHERE ign=%s", (player_name,))
-                    player = c.fetchone()
-                    
-                    if not player:
-                        return jsonify({"error": f"Player {player_name} not found"}), 404
-                    
-                    player_id = player['id']
-                    
-                    # Check if already enrolled
-                    c.execute("""
-                        SELECT id FROM horse_jockeys 
-                        WHERE race_id=%s AND player_id=%s
-                    """, (race_id, player_id))
-                    
-                    if c.fetchone():
-                        return jsonify({"error": f"{player_name} is already enrolled in this race"}), 400
-                    
-                    # Get account
-                    c.execute("""
-                        SELECT id, balance 
-                        FROM accounts 
-                        WHERE player_id=%s AND status='active'
-                    """, (player_id,))
-                    account = c.fetchone()
-                    
-                    if not account:
-                        return jsonify({"error": f"No active account for {player_name}"}), 404
-                    
-                    # Get entry fee and imperial cut
-                    c.execute("""
-                        SELECT entry_fee, imperial_cut_pct 
-                        FROM horse_race_settings 
-                        WHERE id=1
-                    """)
-                    settings = c.fetchone()
-                    
-                    entry_fee = float(settings['entry_fee'] or 100)
-                    imperial_cut_pct = float(settings['imperial_cut_pct'] or 10) / 100
-                    
-                    # Check balance
-                    if float(account['balance']) < entry_fee:
-                        return jsonify({
-                            "error": f"Insufficient balance. Required: ${entry_fee:,.2f}, Available: ${float(account['balance']):,.2f}"
-                        }), 400
-                    
-                    # Calculate amounts
-                    imperial_cut = entry_fee * imperial_cut_pct
-                    prize_contribution = entry_fee - imperial_cut
-                    
-                    # Create transaction for entry fee
-                    c.execute("""
-                        INSERT INTO transactions (account_id, txn_type, amount, note)
-                        VALUES (%s, 'payout', %s, %s)
-                    """, (account['id'], entry_fee, f"Horse race entry fee - {race['name']}"))
-                    
-                    # Add jockey to race
-                    c.execute("""
-                        INSERT INTO horse_jockeys (race_id, player_id)
-                        VALUES (%s, %s)
-                    """, (race_id, player_id))
-                    
-                    # Update prize pool
-                    new_prize_pool = float(race['prize_pool']) + prize_contribution
-                    c.execute("""
-                        UPDATE horse_races 
-                        SET prize_pool = %s 
-                        WHERE id = %s
-                    """, (new_prize_pool, race_id))
-                    
-                    cx.commit()
-                    
-                    print(f"✅ {player_name} enrolled! Prize pool: ${new_prize_pool:,.2f}")
-                    
-                    return jsonify({
-                        "success": True,
-                        "player": player_name,
-                        "race_id": race_id,
-                        "entry_fee": entry_fee,
-                        "prize_pool": new_prize_pool,
-                        "imperial_cut": imperial_cut
-                    })
-        
+            result = run(lambda c: enroll_player(c, player_name))
+        except RaceError as e:
+            return error_response(e)
         except Exception as e:
-            print(f"❌ Error enrolling jockey: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"❌ Error: {e}")
             return jsonify({"error": str(e)}), 500
-    
-    # Set winner 1
-    @app.post("/api/races/winner1")
-    def set_winner1():
+
+        data_changed("transactions", "accounts", "races")
+        publish_txn(result['txn_id'], player_name, "payout", result['entry_fee'], result['note'])
+        hub.publish("race.enrolled", {
+            "race_id": result['race_id'],
+            "player": player_name,
+            "prize_pool": result['prize_pool']
+        })
+
+        return jsonify({
+            "success": True,
+            "player": player_name,
+            "race_id": result['race_id'],
+            "entry_fee": result['entry_fee'],
+            "prize_pool": result['prize_pool'],
+            "imperial_cut": result['imperial_cut']
+        })
+
+    @app.post("/api/races/enroll/batch")
+    def enroll_jockeys_batch():
+        require_api_key_func()
+        data = request.json or {}
+
+        names = data.get("player_names")
+        if not names or not isinstance(names, list) or not all(isinstance(n, str) and n for n in names):
+            return jsonify({"error": "player_names must be a non-empty list of names"}), 400
+        if len(names) > MAX_BATCH:
+            return jsonify({"error": f"At most {MAX_BATCH} players per batch"}), 400
+
+        try:
+            result = run(lambda c: enroll_players(c, names))
+        except RaceError as e:
+            return error_response(e)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return jsonify({"error": str(e)}), 500
+
+        if result['enrolled']:
+            data_changed("transactions", "accounts", "races")
+            for r in result['results']:
+                if r['success']:
+                    publish_txn(r['txn_id'], r['player'], "payout", result['entry_fee'], result['note'])
+                    hub.publish("race.enrolled", {
+                        "race_id": result['race_id'],
+                        "player": r['player'],
+                        "prize_pool": result['prize_pool']
+                    })
+
+        return jsonify({
+            "success": True,
+            "race_id": result['race_id'],
+            "enrolled": len(result['enrolled']),
+            "failed": len(result['results']) - len(result['enrolled']),
+            "entry_fee": result['entry_fee'],
+            "prize_pool": result['prize_pool'],
+            "imperial_cut": result['imperial_cut'],
+            "results": result['results']
+        })
+
+    def award(position):
         require_api_key_func()
         data = request.json
-        
         player_name = data.get("player_name")
         if not player_name:
             return jsonify({"error": "player_name is required"}), 400
-        
-        return _set_winner(player_name, 1, db_func)
-    
-    # Set winner 2
+
+        try:
+            result = run(lambda c: set_winner(c, player_name, position))
+        except RaceError as e:
+            return error_response(e)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return jsonify({"error": str(e)}), 500
+
+        data_changed("transactions", "accounts", "races")
+        publish_txn(result['txn_id'], player_name, "deposit", result['prize'], result['note'])
+        hub.publish("race.winner_set", {
+            "race_id": result['race_id'],
+            "position": position,
+            "player": player_name,
+            "prize": result['prize']
+        })
+
+        return jsonify({
+            "success": True,
+            "player": player_name,
+            "position": position,
+            "prize": result['prize'],
+            "race_id": result['race_id']
+        })
+
+    @app.post("/api/races/winner1")
+    def set_winner1():
+        return award(1)
+
     @app.post("/api/races/winner2")
     def set_winner2():
-        require_api_key_func()
-        data = request.json
-        
-        player_name = data.get("player_name")
-        if not player_name:
-            return jsonify({"error": "player_name is required"}), 400
-        
-        return _set_winner(player_name, 2, db_func)
-    
-    # Set winner 3
+        return award(2)
+
     @app.post("/api/races/winner3")
     def set_winner3():
+        return award(3)
+
+    @app.post("/api/races/settle")
+    def settle():
         require_api_key_func()
-        data = request.json
-        
-        player_name = data.get("player_name")
-        if not player_name:
-            return jsonify({"error": "player_name is required"}), 400
-        
-        return _set_winner(player_name, 3, db_func)
-    
-    # Get latest race info
-    @app.get("/api/races/info")
-    def race_info():
-        print(f"📥 GET /api/races/info")
-        
+        data = request.json or {}
+
+        placings = {i: data.get(f"winner{i}") for i in range(1, 4) if data.get(f"winner{i}")}
+        if 1 not in placings:
+            return jsonify({"error": "winner1 is required"}), 400
+        end = bool(data.get("end", False))
+
         try:
-            with db_func() as cx:
-                with cx.cursor() as c:
-                    c.execute("""
-                        SELECT r.id, COALESCE(r.name, r.race_name, 'Unnamed Race') AS name,
-                               r.prize_pool, r.starts_at, r.ends_at,
-                               r.winner1_id, r.winner2_id, r.winner3_id,
-                               (SELECT COUNT(*) FROM horse_jockeys hj WHERE hj.race_id = r.id) AS jockey_count
-                        FROM horse_races r
-                        ORDER BY r.id DESC
-                        LIMIT 1
-                    """)
-                    race = c.fetchone()
-                    
-                    if not race:
-                        return jsonify({"error": "No races found"}), 404
-                    
-                    race_id = race['id']
-                    
-                    # Get jockeys
-                    c.execute("""
-                        SELECT p.ign 
-                        FROM horse_jockeys hj
-                        JOIN players p ON p.id = hj.player_id
-                        WHERE hj.race_id = %s
-                        ORDER BY hj.joined_at
-                    """, (race_id,))
-                    jockeys = [j['ign'] for j in c.fetchall()]
-                    
-                    # Get winners
-                    winners = {}
-                    for i, winner_id_col in enumerate(['winner1_id', 'winner2_id', 'winner3_id'], 1):
-                        if race[winner_id_col]:
-                            c.execute("SELECT ign FROM players WHERE id=%s", (race[winner_id_col],))
-                            w = c.fetchone()
-                            winners[f'winner{i}'] = w['ign'] if w else None
-                        else:
-                            winners[f'winner{i}'] = None
-                    
-                    # Get prize distribution
-                    c.execute("""
-                        SELECT winner_cut_pct, second_cut_pct, third_cut_pct
-                        FROM horse_race_settings WHERE id=1
-                    """)
-                    settings = c.fetchone()
-                    
-                    prize_pool = float(race['prize_pool'] or 0)
-                    
-                    return jsonify({
-                        "race_id": race_id,
-                        "name": race['name'],
-                        "prize_pool": prize_pool,
-                        "starts_at": race['starts_at'].isoformat() if race['starts_at'] else None,
-                        "ends_at": race['ends_at'].isoformat() if race['ends_at'] else None,
-                        "jockey_count": race['jockey_count'],
-                        "jockeys": jockeys,
-                        "winner1": winners['winner1'],
-                        "winner2": winners['winner2'],
-                        "winner3": winners['winner3'],
-                        "prize_distribution": {
-                            "winner1": prize_pool * (float(settings['winner_cut_pct']) / 100),
-                            "winner2": prize_pool * (float(settings['second_cut_pct']) / 100),
-                            "winner3": prize_pool * (float(settings['third_cut_pct']) / 100)
-                        }
-                    })
-        
+            result = run(lambda c: settle_race(c, placings, end))
+        except RaceError as e:
+            return error_response(e)
         except Exception as e:
-            print(f"❌ Error getting race info: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"❌ Error: {e}")
             return jsonify({"error": str(e)}), 500
-    
-    # End race
+
+        if result['awards'] or end:
+            data_changed("transactions", "accounts", "races")
+        for a in result['awards']:
+            publish_txn(a['txn_id'], a['player'], "deposit", a['prize'], a['note'])
+            hub.publish("race.winner_set", {
+                "race_id": result['race_id'],
+                "position": a['position'],
+                "player": a['player'],
+                "prize": a['prize']
+            })
+        ended_at = None
+        if end:
+            ended_at = datetime.now().isoformat()
+            hub.publish("race.ended", {"race_id": result['race_id'], "ended_at": ended_at})
+
+        return jsonify({
+            "success": True,
+            "race_id": result['race_id'],
+            "prize_pool": result['prize_pool'],
+            "ended_at": ended_at,
+            "results": result['results']
+        })
+
     @app.post("/api/races/end")
     def end_race():
         require_api_key_func()
-        
-        print(f"🏁 Ending latest race")
-        
+
         try:
-            with db_func() as cx:
-                with cx.cursor() as c:
-                    # Get latest race
-                    c.execute("""
-                        SELECT id, winner1_id, winner2_id, winner3_id
-                        FROM horse_races 
-                        WHERE ends_at IS NULL
-                        ORDER BY id DESC 
-                        LIMIT 1
-                    """)
-                    race = c.fetchone()
-                    
-                    if not race:
-                        return jsonify({"error": "No active race found"}), 404
-                    
-                    if not race['winner1_id']:
-                        return jsonify({"error": "Cannot end race without setting winner1"}), 400
-                    
-                    # End race
-                    c.execute("""
-                        UPDATE horse_races 
-                        SET ends_at = NOW() 
-                        WHERE id = %s
-                    """, (race['id'],))
-                    
-                    cx.commit()
-                    
-                    print(f"✅ Race {race['id']} ended")
-                    
-                    return jsonify({
-                        "success": True,
-                        "race_id": race['id'],
-                        "ended_at": datetime.now().isoformat()
-                    })
-        
+            race_id = run(end_latest_race)
+        except RaceError as e:
+            return error_response(e)
         except Exception as e:
-            print(f"❌ Error ending race: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"❌ Error: {e}")
             return jsonify({"error": str(e)}), 500
 
+        data_changed("races")
+        ended_at = datetime.now().isoformat()
+        hub.publish("race.ended", {"race_id": race_id, "ended_at": ended_at})
 
-def _set_winner(player_name, position, db_func):
-    """Helper function to set a winner"""
-    print(f"🏆 Setting winner {position}: {player_name}")
-    
-    try:
-        with db_func() as cx:
-            with cx.cursor() as c:
-                # Get latest race
-                c.execute("""
-                    SELECT r.id, r.prize_pool, r.name,
-                           r.winner1_id, r.winner2_id, r.winner3_id
-                    FROM horse_races r
-                    WHERE r.ends_at IS NULL
-                    ORDER BY r.id DESC 
-                    LIMIT 1
-                """)
-                race = c.fetchone()
-                
-                if not race:
-                    return jsonify({"error": "No active race found"}), 404
-                
-                race_id = race['id']
-                
-                # Get player
-                c.execute("SELECT id FROM players WHERE ign=%s", (player_name,))
-                player = c.fetchone()
-                
-                if not player:
-                    return jsonify({"error": f"Player {player_name} not found"}), 404
-                
-                player_id = player['id']
-                
-                # Check if player is a jockey in this race
-                c.execute("""
-                    SELECT id FROM horse_jockeys 
-                    WHERE race_id=%s AND player_id=%s
-                """, (race_id, player_id))
-                
-                if not c.fetchone():
-                    return jsonify({"error": f"{player_name} is not enrolled in this race"}), 400
-                
-                # Check if already set as another position
-                for i in range(1, 4):
-                    if i != position and race[f'winner{i}_id'] == player_id:
-                        return jsonify({"error": f"{player_name} is already set as winner {i}"}), 400
-                
-                # Get prize distribution
-                c.execute("""
-                    SELECT winner_cut_pct, second_cut_pct, third_cut_pct
-                    FROM horse_race_settings WHERE id=1
-                """)
-                settings = c.fetchone()
-                
-                prize_pool = float(race['prize_pool'] or 0)
-                
-                pct_map = {
-                    1: float(settings['winner_cut_pct']),
-                    2: float(settings['second_cut_pct']),
-                    3: float(settings['third_cut_pct'])
-                }
-                
-                prize_amount = prize_pool * (pct_map[position] / 100)
-                
-                # Get player account
-                c.execute("""
-                    SELECT id FROM accounts 
-                    WHERE player_id=%s AND status='active'
-                """, (player_id,))
-                account = c.fetchone()
-                
-                if not account:
-                    return jsonify({"error": f"No active account for {player_name}"}), 404
-                
-                # Update winner
-                c.execute(f"""
-                    UPDATE horse_races 
-                    SET winner{position}_id = %s 
-                    WHERE id = %s
-                """, (player_id, race_id))
-                
-                # Add prize to account
-                c.execute("""
-                    INSERT INTO transactions (account_id, txn_type, amount, note)
-                    VALUES (%s, 'deposit', %s, %s)
-                """, (account['id'], prize_amount, f"Horse race prize - Position {position} - {race['name']}"))
-                
-                cx.commit()
-                
-                print(f"✅ {player_name} set as winner {position} and awarded ${prize_amount:,.2f}")
-                
-                return jsonify({
-                    "success": True,
-                    "player": player_name,
-                    "position": position,
-                    "prize": prize_amount,
-                    "race_id": race_id
-                })
-    
-    except Exception as e:
-        print(f"❌ Error setting winner: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({
+            "success": True,
+            "race_id": race_id,
+            "ended_at": ended_at
+        })
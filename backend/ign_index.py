@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+In-memory IGN search index
+IGN searches used LIKE '%q%', which no B-tree index can serve, so every
+keystroke in the dashboard scanned players. This index answers substring
+queries from trigram posting lists, 1- and 2-character queries from posting
+lists of every short substring, and prefix queries from a sorted list; the
+SQL then filters on the resulting player ids, which are indexed.
+
+The index is per process. It loads every player once, picks up new players
+(by id) every BANK_IGN_INDEX_REFRESH seconds, or on the next search after
+mark_stale(), and rebuilds from scratch every BANK_IGN_INDEX_REBUILD
+seconds, which also catches renames and deletions. Matching is
+case-insensitive and takes `_` and `%` literally.
+"""
+import bisect
+import os
+import threading
+import time
+
+REFRESH = float(os.getenv("BANK_IGN_INDEX_REFRESH", "5"))
+REBUILD = float(os.getenv("BANK_IGN_INDEX_REBUILD", "3600"))
+# Searches matching more players than this use the LIKE scan instead
+MAX_IDS = int(os.getenv("BANK_IGN_INDEX_MAX_IDS", "1000"))
+# New players are read from id > (highest seen - OVERLAP), so ids that
+# commit out of order are still picked up
+OVERLAP = 200
+
+_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def _init_state():
+    global _names, _igns, _sorted, _grams, _short, _max_id, _synced_at, _built_at
+    global _searches, _suggests, _too_broad, _syncs, _rebuilds
+    _names = {}      # player_id -> lowercased ign
+    _igns = {}       # player_id -> ign as stored
+    _sorted = []     # [(lowercased ign, player_id)] for prefix lookups
+    _grams = {}      # trigram -> [player_id]
+    _short = {}      # 1- or 2-character substring -> [player_id]
+    _max_id = 0
+    _synced_at = 0.0
+    _built_at = None
+    _searches = _suggests = _too_broad = _syncs = _rebuilds = 0
+
+
+_init_state()
+
+
+def _trigrams(s):
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _short_grams(s):
+    return set(s) | {s[i:i + 2] for i in range(len(s) - 1)}
+
+
+def _candidates(low):
+    """Player ids that may contain `low`: a superset for trigram queries, exact below that"""
+    if len(low) >= 3:
+        # The rarest trigram's posting list
+        return min((_grams.get(g, ()) for g in _trigrams(low)), key=len)
+    return _short.get(low, ())
+
+
+def _add(player_id, ign):
+    """Index one player; caller holds _lock"""
+    global _max_id
+    old = _names.get(player_id)
+    low = ign.lower()
+    if old == low:
+        _igns[player_id] = ign
+        return
+    if old is not None:
+        _remove(player_id, old)
+    _names[player_id] = low
+    _igns[player_id] = ign
+    bisect.insort(_sorted, (low, player_id))
+    for g in _trigrams(low):
+        _grams.setdefault(g, []).append(player_id)
+    for g in _short_grams(low):
+        _short.setdefault(g, []).append(player_id)
+    _max_id = max(_max_id, player_id)
+
+
+def _remove(player_id, low):
+    i = bisect.bisect_left(_sorted, (low, player_id))
+    if i < len(_sorted) and _sorted[i] == (low, player_id):
+        del _sorted[i]
+    for index, grams in ((_grams, _trigrams(low)), (_short, _short_grams(low))):
+        for g in grams:
+            ids = index.get(g)
+            if ids and player_id in ids:
+                ids.remove(player_id)
+
+
+# -------------------- SYNC --------------------
+def due():
+    """True when the next search should call refresh() first"""
+    now = time.monotonic()
+    return (_built_at is None or now - _built_at >= REBUILD
+            or now - _synced_at >= REFRESH)
+
+
+def refresh(c, force=False):
+    """
+    Load new players (or everything, when a rebuild is due) with cursor c.
+    Only one thread syncs at a time; the others search the current index,
+    except before the first build, when they wait for it.
+    """
+    if not force and not due():
+        return
+    if not _sync_lock.acquire(blocking=force or _built_at is None):
+        return
+    try:
+        if force or due():
+            _sync(c, force)
+    finally:
+        _sync_lock.release()
+
+
+def _sync(c, force):
+    """refresh() once it holds _sync_lock"""
+    global _names, _igns, _sorted, _grams, _short, _max_id, _synced_at, _built_at
+    global _syncs, _rebuilds
+    now = time.monotonic()
+    rebuild = force or _built_at is None or now - _built_at >= REBUILD
+
+    if rebuild:
+        c.execute("SELECT id, ign FROM players")
+        rows = c.fetchall()
+        names, igns, grams, short = {}, {}, {}, {}
+        for r in rows:
+            low = r['ign'].lower()
+            names[r['id']] = low
+            igns[r['id']] = r['ign']
+            for g in _trigrams(low):
+                grams.setdefault(g, []).append(r['id'])
+            for g in _short_grams(low):
+                short.setdefault(g, []).append(r['id'])
+        ordered = sorted((low, pid) for pid, low in names.items())
+        with _lock:
+            _names, _igns, _grams, _short, _sorted = names, igns, grams, short, ordered
+            _max_id = max(names, default=0)
+            _built_at = _synced_at = now
+            _rebuilds += 1
+        return
+
+    c.execute("SELECT id, ign FROM players WHERE id > %s ORDER BY id",
+              (max(0, _max_id - OVERLAP),))
+    rows = c.fetchall()
+    with _lock:
+        for r in rows:
+            _add(r['id'], r['ign'])
+        _synced_at = now
+        _syncs += 1
+
+
+def mark_stale():
+    """Players were created elsewhere: pick up new ids on the next search"""
+    global _synced_at
+    with _lock:
+        _synced_at = 0.0
+
+
+def invalidate():
+    """Rebuild on the next search"""
+    global _built_at
+    with _lock:
+        _built_at = None
+
+
+# -------------------- QUERIES --------------------
+def search(q):
+    """
+    Ids of players whose IGN contains q, or None when more than MAX_IDS
+    match (the caller should fall back to LIKE)
+    """
+    global _searches, _too_broad
+    low = q.lower()
+    with _lock:
+        _searches += 1
+        if not low:
+            candidates = _names
+        else:
+            candidates = _candidates(low)
+        if len(low) < 3 and len(candidates) > MAX_IDS:
+            # Short posting lists are exact: too broad without a scan
+            _too_broad += 1
+            return None
+        ids = [pid for pid in candidates if low in _names[pid]]
+        if len(ids) > MAX_IDS:
+            _too_broad += 1
+            return None
+        return ids
+
+
+def suggest(q, limit=10):
+    """Up to `limit` IGNs for an autocomplete box: prefix matches first, then substring"""
+    global _suggests
+    low = q.lower()
+    out = []
+    with _lock:
+        _suggests += 1
+        i = bisect.bisect_left(_sorted, (low,))
+        while i < len(_sorted) and len(out) < limit and _sorted[i][0].startswith(low):
+            out.append(_sorted[i][1])
+            i += 1
+        if len(out) < limit and low:
+            seen = set(out)
+            candidates = _candidates(low)
+            extra = sorted((_names[pid], pid) for pid in candidates
+                           if pid not in seen and low in _names[pid])
+            out.extend(pid for _, pid in extra[:limit - len(out)])
+        return [_igns[pid] for pid in out]
+
+
+def reset_after_fork():
+    # Fresh locks: a thread of the parent may have held either at fork time
+    global _lock, _sync_lock
+    _lock = threading.Lock()
+    _sync_lock = threading.Lock()
+    _init_state()
+
+
+def stats():
+    with _lock:
+        return {
+            "players": len(_names),
+            "trigrams": len(_grams),
+            "short_grams": len(_short),
+            "searches": _searches,
+            "suggests": _suggests,
+            "too_broad": _too_broad,
+            "syncs": _syncs,
+            "rebuilds": _rebuilds,
+            "age_s": round(time.monotonic() - _built_at, 1) if _built_at is not None else None,
+        }
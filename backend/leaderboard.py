@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+In-memory leaderboard behind /api/players
+Active accounts are kept in a sorted list ordered like the old SQL
+(balance DESC, player_id DESC), so a page, a count, a player's rank or the
+players around them is a bisect and a slice instead of a sort in MySQL.
+
+Balances are only ever changed by the transactions trigger, so the board
+follows the ledger: every BANK_LEADERBOARD_REFRESH seconds it re-reads the
+accounts touched by transactions newer than the last one it saw (plus any
+new accounts), and write routes mark it stale through mark_stale() so their
+own changes show up on the next read. Every BANK_LEADERBOARD_RESYNC seconds
+it reloads everything to correct drift (closed accounts, edits made outside
+the ledger). The board is per process.
+
+Syncs always read the primary through their own connection: a lagging
+replica could move balances and marks backwards, or reload the board
+before an account closure has reached it.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+
+REFRESH = float(os.getenv("BANK_LEADERBOARD_REFRESH", "2"))
+RESYNC = float(os.getenv("BANK_LEADERBOARD_RESYNC", "300"))
+# Transactions can commit out of id order; re-read this many ids back
+OVERLAP = 200
+# Changes beyond this share of the board are applied by re-sorting
+RESORT_SHARE = 0.05
+
+_COLUMNS = """
+    SELECT a.id AS account_id, a.player_id, a.status, a.balance,
+           a.last_compounded_at, p.ign, p.created_at
+    FROM accounts a
+    JOIN players p ON p.id = a.player_id
+"""
+
+_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def _init_state():
+    global _entries, _order, _by_player, _txn_mark, _account_mark
+    global _synced_at, _resynced_at, _stale, _resync_pending
+    global _refreshes, _resyncs, _applied, _drift
+    _entries = {}    # account_id -> (player_id, ign, balance, last_compounded_at, created_at)
+    _order = []      # [(-balance, -player_id, -account_id)] ascending = leaderboard order
+    _by_player = {}  # player_id -> account_id
+    _txn_mark = _account_mark = 0
+    _synced_at = 0.0
+    _resynced_at = None
+    _stale = _resync_pending = False
+    _refreshes = _resyncs = _applied = _drift = 0
+
+
+_init_state()
+
+
+def _key(account_id, entry):
+    return (-entry[2], -entry[0], -account_id)
+
+
+def _entry(r):
+    return (r['player_id'], r['ign'], r['balance'] or 0, r['last_compounded_at'], r['created_at'])
+
+
+# -------------------- SYNC --------------------
+def due():
+    now = time.monotonic()
+    return (_resynced_at is None or _stale or _resync_pending
+            or now - _synced_at >= REFRESH or now - _resynced_at >= RESYNC)
+
+
+def refresh(db_func):
+    """
+    Bring the board up to date from a db_func() connection when it is due.
+    Call it before taking a request connection: only one thread syncs at a
+    time, and the others keep serving the current board, except before the
+    first load, when they wait for it.
+    """
+    if not due():
+        return
+    if not _sync_lock.acquire(blocking=_resynced_at is None):
+        return
+    try:
+        if not due():
+            return
+        with db_func() as cx:
+            with cx.cursor() as c:
+                now = time.monotonic()
+                if _resynced_at is None or _resync_pending or now - _resynced_at >= RESYNC:
+                    _resync(c, now)
+                else:
+                    _refresh(c, now)
+    finally:
+        _sync_lock.release()
+
+
+def _marks(c):
+    c.execute("""
+        SELECT (SELECT COALESCE(MAX(id), 0) FROM transactions) AS txn,
+               (SELECT COALESCE(MAX(id), 0) FROM accounts) AS account
+    """)
+    row = c.fetchone()
+    return row['txn'], row['account']
+
+
+def _resync(c, now):
+    global _entries, _order, _by_player, _txn_mark, _account_mark
+    global _synced_at, _resynced_at, _stale, _resync_pending, _resyncs, _drift
+    txn_mark, account_mark = _marks(c)
+    c.execute(_COLUMNS + " WHERE a.status = 'active'")
+    entries = {r['account_id']: _entry(r) for r in c.fetchall()}
+    order = sorted(_key(aid, e) for aid, e in entries.items())
+    by_player = {e[0]: aid for aid, e in entries.items()}
+
+    with _lock:
+        if _resynced_at is not None:
+            _drift += (sum(1 for aid, e in entries.items() if _entries.get(aid) != e)
+                       + sum(1 for aid in _entries if aid not in entries))
+        _entries, _order, _by_player = entries, order, by_player
+        _txn_mark, _account_mark = txn_mark, account_mark
+        _synced_at = _resynced_at = now
+        _stale = _resync_pending = False
+        _resyncs += 1
+
+
+def _refresh(c, now):
+    global _txn_mark, _account_mark, _synced_at, _stale, _refreshes, _applied, _order
+    txn_mark, account_mark = _marks(c)
+    c.execute(_COLUMNS + """
+        WHERE a.id IN (SELECT account_id FROM transactions WHERE id > %s)
+        UNION
+    """ + _COLUMNS + " WHERE a.id > %s", (max(0, _txn_mark - OVERLAP), _account_mark))
+    rows = c.fetchall()
+
+    with _lock:
+        resort = len(rows) > RESORT_SHARE * max(len(_order), 1)
+        for r in rows:
+            aid = r['account_id']
+            old = _entries.pop(aid, None)
+            if old is not None:
+                if _by_player.get(old[0]) == aid:
+                    del _by_player[old[0]]
+                if not resort:
+                    i = bisect.bisect_left(_order, _key(aid, old))
+                    del _order[i]
+            if r['status'] == 'active':
+                e = _entries[aid] = _entry(r)
+                _by_player[e[0]] = aid
+                if not resort:
+                    bisect.insort(_order, _key(aid, e))
+        if resort:
+            _order = sorted(_key(aid, e) for aid, e in _entries.items())
+        _txn_mark, _account_mark = txn_mark, account_mark
+        _synced_at = now
+        _stale = False
+        _refreshes += 1
+        _applied += len(rows)
+
+
+def mark_stale():
+    """A write committed: sync before the next read"""
+    global _stale
+    _stale = True
+
+
+def invalidate():
+    """Reload everything before the next read (accounts opened/closed outside the ledger)"""
+    global _resync_pending
+    _resync_pending = True
+
+
+# -------------------- QUERIES --------------------
+def _keys(player_ids, needle):
+    """Board keys in order, limited to player_ids and/or IGNs containing needle; caller holds _lock"""
+    if player_ids is None and needle is None:
+        return _order
+    if player_ids is not None:
+        keys = sorted(_key(_by_player[pid], _entries[_by_player[pid]])
+                      for pid in player_ids if pid in _by_player)
+    else:
+        keys = _order
+    if needle is not None:
+        low = needle.lower()
+        keys = [k for k in keys if low in _entries[-k[2]][1].lower()]
+    return keys
+
+
+def _row(key):
+    player_id, ign, balance, last_compounded_at, created_at = _entries[-key[2]]
+    return {
+        "player_id": player_id,
+        "ign": ign,
+        "balance": balance,
+        "last_compounded_at": last_compounded_at,
+        "created_at": created_at,
+    }
+
+
+def page(limit, offset=0, after=None, player_ids=None, needle=None):
+    """
+    Up to `limit` rows from `offset`, or after the (balance, player_id)
+    keyset cursor `after`, optionally filtered as in count()
+    """
+    with _lock:
+        keys = _keys(player_ids, needle)
+        if after:
+            start = bisect.bisect_right(keys, (-after[0], -after[1], math.inf))
+        else:
+            start = offset
+        return [_row(k) for k in keys[start:start + limit]]
+
+
+def count(player_ids=None, needle=None):
+    """Active accounts, or those of player_ids / with IGNs containing needle"""
+    with _lock:
+        return len(_keys(player_ids, needle))
+
+
+def rank(player_id, around=0):
+    """
+    (rank, rows) for a player: 1-based rank and the `around` players either
+    side of them, themselves included. None when they have no active account.
+    """
+    with _lock:
+        aid = _by_player.get(player_id)
+        if aid is None:
+            return None
+        i = bisect.bisect_left(_order, _key(aid, _entries[aid]))
+        rows = [_row(k) for k in _order[max(0, i - around):i + around + 1]]
+        return i + 1, rows
+
+
+def reset_after_fork():
+    # Fresh locks: a thread of the parent may have held either at fork time
+    global _lock, _sync_lock
+    _lock = threading.Lock()
+    _sync_lock = threading.Lock()
+    _init_state()
+
+
+def stats():
+    with _lock:
+        return {
+            "accounts": len(_order),
+            "refreshes": _refreshes,
+            "resyncs": _resyncs,
+            "rows_applied": _applied,
+            "drift_corrected": _drift,
+            "age_s": round(time.monotonic() - _resynced_at, 1) if _resynced_at is not None else None,
+        }
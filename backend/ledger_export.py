@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Streaming transaction ledger export behind /api/transactions/export
+Rows come off an unbuffered server-side cursor (SSDictCursor) in small
+batches and are written straight to the response, so memory stays flat
+however large the ledger is. Rows are sent in ascending id order: a client
+whose download breaks off resumes with after_id=<last id it received>.
+"""
+import csv
+import io
+import json
+import os
+import threading
+from datetime import datetime
+
+import pymysql.cursors
+
+BATCH = int(os.getenv("BANK_EXPORT_BATCH", "500"))
+MAX_EXPORTS = int(os.getenv("BANK_EXPORT_MAX_CONCURRENT", "2"))
+# How long MySQL waits on us while a slow client holds up the stream
+NET_WRITE_TIMEOUT = int(os.getenv("BANK_EXPORT_NET_WRITE_TIMEOUT", "600"))
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+COLUMNS = ["id", "created_at", "ign", "account_id", "txn_type", "amount", "fee_pct",
+           "effective_delta", "balance_after", "before_balance", "note"]
+
+_slots = threading.BoundedSemaphore(MAX_EXPORTS)
+
+
+class ExportBusy(Exception):
+    """Raised when MAX_EXPORTS exports are already streaming"""
+
+
+def parse_time(value, name):
+    """ISO-8601 date or datetime from a query arg; None when absent"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO-8601 date or datetime")
+
+
+def build_query(start=None, end=None, ign=None, after_id=None):
+    """
+    SELECT for the export: created_at in [start, end), an exact IGN and/or
+    id > after_id, walked along the primary key in ascending order.
+    """
+    sql = """
+        SELECT t.id, t.created_at, p.ign, t.account_id, t.txn_type, t.amount,
+               t.fee_pct, t.effective_delta, t.balance_after,
+               (t.balance_after - t.effective_delta) AS before_balance, t.note
+        FROM transactions t
+        JOIN accounts a ON a.id = t.account_id
+        JOIN players p ON p.id = a.player_id
+    """
+    where, params = [], []
+    if after_id:
+        where.append("t.id > %s")
+        params.append(after_id)
+    if start:
+        where.append("t.created_at >= %s")
+        params.append(start)
+    if end:
+        where.append("t.created_at < %s")
+        params.append(end)
+    if ign:
+        where.append("p.ign = %s")
+        params.append(ign)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY t.id ASC", params
+
+
+def _plain(row):
+    for field in ('amount', 'effective_delta', 'balance_after', 'before_balance'):
+        row[field] = float(row[field] or 0)
+    if row['fee_pct'] is not None:
+        row['fee_pct'] = float(row['fee_pct'])
+    if row['created_at']:
+        row['created_at'] = row['created_at'].isoformat()
+    return row
+
+
+def _ndjson(rows):
+    return "".join(json.dumps(_plain(r), separators=(",", ":")) + "\n" for r in rows)
+
+
+def _csv(rows):
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    for r in rows:
+        r = _plain(r)
+        w.writerow(["" if r[col] is None else r[col] for col in COLUMNS])
+    return buf.getvalue()
+
+
+class LedgerExport:
+    """
+    Iterable response body. Takes an export slot and runs the query up
+    front, so a busy server or a bad query is still reported with a proper
+    status; the connection is held until the WSGI server closes the body.
+    A finished export hands its connection back to the pool, an abandoned
+    one discards it rather than reading the remaining rows off the wire.
+    """
+
+    def __init__(self, db_func, fmt, sql, params, batch=BATCH):
+        if not _slots.acquire(blocking=False):
+            raise ExportBusy(f"{MAX_EXPORTS} exports already running")
+        self.fmt = fmt
+        self.batch = batch
+        self.rows = 0
+        self.finished = False
+        self._closed = False
+        self._cx = None
+        try:
+            self._cx = db_func()
+            self._c = self._cx.cursor(pymysql.cursors.SSDictCursor)
+            self._c.execute("SET SESSION net_write_timeout = %s", (NET_WRITE_TIMEOUT,))
+            self._c.execute(sql, params)
+        except Exception:
+            self.close()
+            raise
+
+    def __iter__(self):
+        encode = _csv if self.fmt == "csv" else _ndjson
+        if self.fmt == "csv":
+            yield ",".join(COLUMNS) + "\n"
+        while True:
+            rows = self._c.fetchmany(self.batch)
+            if not rows:
+                break
+            self.rows += len(rows)
+            yield encode(rows)
+        self.finished = True
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._cx is not None:
+                if self.finished:
+                    self._c.execute("SET SESSION net_write_timeout = @@GLOBAL.net_write_timeout")
+                    self._cx.close()
+                    print(f"📤 Exported {self.rows} transactions ({self.fmt})")
+                else:
+                    self._cx.discard()
+                    print(f"⚠️  Export abandoned after {self.rows} transactions")
+        except Exception as e:
+            print(f"❌ Export cleanup failed: {e}")
+            self._cx.discard()
+        finally:
+            _slots.release()
+
+
+def reset_after_fork():
+    global _slots
+    _slots = threading.BoundedSemaphore(MAX_EXPORTS)
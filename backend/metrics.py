@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Request and database instrumentation behind /metrics
+init_app() times every request per route (Flask URL rule, so ids in the
+path don't explode label cardinality) and instrument() wraps the
+connections db_read()/db_write() hand out so each cursor counts its
+queries, fetched rows and time spent in MySQL against the current request,
+and passes every statement on to slow_queries. render() writes it all in the Prometheus
+text format; every response also carries a Server-Timing header with its
+own db and total time.
+
+Metrics are per process: with several gunicorn workers each scrape sees
+the worker that answered it.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+
+import slow_queries
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OUTSIDE_REQUEST = "-"  # route label for DB work done after a response (streams, hooks)
+
+_lock = threading.Lock()
+
+
+def _init_state():
+    global _latency, _statuses, _db, _in_flight
+    _latency = {}    # (route, method) -> [bucket counts..., +Inf count, sum]
+    _statuses = {}   # (route, method, status) -> count
+    _db = {}         # route -> [queries, rows, seconds]
+    _in_flight = 0
+
+
+_init_state()
+
+
+# -------------------- DATABASE --------------------
+class TimedCursor:
+    """A pymysql cursor that reports queries, rows and time to the current request"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _timed(self, fn, args, queries=0):
+        start = time.perf_counter()
+        result = None
+        try:
+            result = fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            if fn.__name__ == "fetchone":
+                rows = 0 if result is None else 1
+            elif fn.__name__.startswith("fetch"):
+                rows = len(result or ())
+            else:
+                rows = 0
+            _record_db(queries, rows, elapsed)
+            if queries:
+                slow_queries.observe(args[0], args[1], elapsed, result,
+                                     many=fn.__name__ == "executemany")
+        return result
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, (query, args), queries=1)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, (query, args), queries=1)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone, ())
+
+    def fetchmany(self, size=None):
+        return self._timed(self._cursor.fetchmany, (size,) if size else ())
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall, ())
+
+
+class InstrumentedConnection:
+    """Wraps a pooled connection so its cursors are TimedCursors"""
+
+    def __init__(self, cx):
+        self._cx = cx
+
+    def __getattr__(self, name):
+        return getattr(self._cx, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cx.close()
+
+    def cursor(self, *args):
+        return TimedCursor(self._cx.cursor(*args))
+
+
+def instrument(cx):
+    return InstrumentedConnection(cx)
+
+
+def _record_db(queries, rows, seconds):
+    if has_request_context():
+        acc = g.setdefault("_db_metrics", [0, 0, 0.0])
+        acc[0] += queries
+        acc[1] += rows
+        acc[2] += seconds
+        return
+    with _lock:
+        acc = _db.setdefault(OUTSIDE_REQUEST, [0, 0, 0.0])
+        acc[0] += queries
+        acc[1] += rows
+        acc[2] += seconds
+
+
+# -------------------- REQUESTS --------------------
+def init_app(app):
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
+
+
+def _before():
+    global _in_flight
+    g._metrics_start = time.perf_counter()
+    with _lock:
+        _in_flight += 1
+
+
+def _after(response):
+    start = g.get("_metrics_start")
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    queries, rows, db_seconds = g.get("_db_metrics", (0, 0, 0.0))
+
+    with _lock:
+        h = _latency.setdefault((route, request.method), [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+        h[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        h[-1] += elapsed
+        key = (route, request.method, response.status_code)
+        _statuses[key] = _statuses.get(key, 0) + 1
+        acc = _db.setdefault(route, [0, 0, 0.0])
+        acc[0] += queries
+        acc[1] += rows
+        acc[2] += db_seconds
+
+    response.headers["Server-Timing"] = (
+        f'db;dur={db_seconds * 1000:.2f};desc="{queries} queries, {rows} rows", '
+        f"total;dur={elapsed * 1000:.2f}"
+    )
+    return response
+
+
+def _teardown(exc):
+    global _in_flight
+    if g.pop("_metrics_start", None) is not None:
+        with _lock:
+            _in_flight -= 1
+
+
+# -------------------- EXPOSITION --------------------
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def render(gauges=None):
+    """Prometheus text exposition; `gauges` adds {name: value} process gauges"""
+    out = []
+    with _lock:
+        out.append("# HELP bank_http_request_duration_seconds Request latency by route")
+        out.append("# TYPE bank_http_request_duration_seconds histogram")
+        for (route, method), h in sorted(_latency.items()):
+            running = 0
+            for le, n in zip(LATENCY_BUCKETS + ("+Inf",), h[:-1]):
+                running += n
+                out.append(f"bank_http_request_duration_seconds_bucket"
+                           f"{_labels(route=route, method=method, le=le)} {running}")
+            out.append(f"bank_http_request_duration_seconds_sum{_labels(route=route, method=method)} {h[-1]:.6f}")
+            out.append(f"bank_http_request_duration_seconds_count{_labels(route=route, method=method)} {running}")
+
+        out.append("# HELP bank_http_requests_total Responses by route and status")
+        out.append("# TYPE bank_http_requests_total counter")
+        for (route, method, status), n in sorted(_statuses.items()):
+            out.append(f"bank_http_requests_total{_labels(route=route, method=method, status=status)} {n}")
+
+        out.append("# HELP bank_http_requests_in_flight Requests being handled")
+        out.append("# TYPE bank_http_requests_in_flight gauge")
+        out.append(f"bank_http_requests_in_flight {_in_flight}")
+
+        for name, i, help_text in (("queries", 0, "SQL statements executed"),
+                                   ("rows_fetched", 1, "Rows fetched"),
+                                   ("seconds", 2, "Time spent in execute/fetch")):
+            out.append(f"# HELP bank_db_{name}_total {help_text}, by route")
+            out.append(f"# TYPE bank_db_{name}_total counter")
+            for route, acc in sorted(_db.items()):
+                value = f"{acc[i]:.6f}" if i == 2 else acc[i]
+                out.append(f"bank_db_{name}_total{_labels(route=route)} {value}")
+
+    for name, value in sorted((gauges or {}).items()):
+        out.append(f"# TYPE {name} gauge")
+        out.append(f"{name} {value}")
+    return "\n".join(out) + "\n"
+
+
+def reset_after_fork():
+    # Fresh lock: a thread of the parent may have held it at fork time
+    global _lock
+    _lock = threading.Lock()
+    _init_state()
+
+
+def stats():
+    with _lock:
+        return {
+            "in_flight": _in_flight,
+            "requests": sum(_statuses.values()),
+            "routes": len({route for route, _ in _latency}),
+            "db_queries": sum(acc[0] for acc in _db.values()),
+        }
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Keyset pagination helpers
+Cursors are opaque url-safe tokens wrapping the sort key of the last row served
+"""
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+
+
+class BadCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def encode_cursor(*key):
+    raw = json.dumps([str(k) if isinstance(k, Decimal) else k for k in key],
+                     separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, *types):
+    """
+    Decode a cursor into a tuple, converting each part with the matching type.
+    An empty token means "first page" and decodes to None.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        parts = json.loads(raw)
+        if not isinstance(parts, list) or len(parts) != len(types):
+            raise BadCursor("invalid cursor")
+        return tuple(t(p) for t, p in zip(types, parts))
+    except (ValueError, TypeError, InvalidOperation) as e:
+        raise BadCursor("invalid cursor") from e
+
+
+def page(rows, limit, key):
+    """
+    Trim a limit+1 result set down to `limit` rows and build next_cursor
+    from the last row kept (None when there are no more rows).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Cached IGN -> (player_id, account_id) lookups
+Write paths resolve a player and their active account with one joined query
+on a miss and none on a hit. Only players with an active account are
+cached, so a player or account created moments later is always found;
+anything that closes or opens an account calls invalidate(ign).
+"""
+import os
+from ttl_cache import TTLCache
+
+LOOKUP_TTL = float(os.getenv("BANK_LOOKUP_TTL", "300"))
+LOOKUP_SIZE = int(os.getenv("BANK_LOOKUP_SIZE", "10000"))
+
+_cache = TTLCache(maxsize=LOOKUP_SIZE, ttl=LOOKUP_TTL)
+
+
+def lookup(c, ign):
+    """
+    (player_id, account_id) for `ign`, account_id None when the player has
+    no active account; None when there is no such player
+    """
+    ids = _cache.get(ign)
+    if ids is not None:
+        return ids
+
+    c.execute("""
+        SELECT p.id AS player_id, a.id AS account_id
+        FROM players p
+        LEFT JOIN accounts a ON a.player_id = p.id AND a.status='active'
+        WHERE p.ign=%s
+        LIMIT 1
+    """, (ign,))
+    row = c.fetchone()
+    if not row:
+        return None
+    ids = (row['player_id'], row['account_id'])
+    if ids[1]:
+        _cache.set(ign, ids)
+    return ids
+
+
+def remember(ign, player_id, account_id):
+    """Seed the cache from rows a caller already read (e.g. a bulk lookup)"""
+    if account_id:
+        _cache.set(ign, (player_id, account_id))
+
+
+def invalidate(ign=None):
+    """Forget one IGN, or everything when ign is None"""
+    if ign is None:
+        _cache.clear()
+    else:
+        _cache.pop(ign)
+
+
+def reset_after_fork():
+    _cache.reset_after_fork()
+
+
+def stats():
+    return _cache.stats()
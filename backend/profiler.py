@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+On-demand request profiler behind ?profile=1
+start() installs a deterministic profiler (sys.setprofile) on the request's
+thread and finish() replaces the response with the collapsed stacks it
+recorded, one "frame;frame;frame weight" line per stack with the weight in
+microseconds of self time, ready for flamegraph.pl or speedscope.
+
+Stacks start at the view dispatch. A streamed body (exports, /api/stream)
+runs after the response is handed back and is not covered; under gevent,
+greenlets that run while the request waits on I/O show up in its stacks.
+"""
+import os
+import sys
+import time
+
+from flask import Response, g
+
+
+class _Tracer:
+    def __init__(self):
+        self.stack = []    # [label, started, time spent in children]
+        self.totals = {}   # "a;b;c" -> self seconds
+        self.started = time.perf_counter()
+
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == "call":
+            self.stack.append([_label(frame.f_code, frame.f_globals.get("__name__")), now, 0.0])
+        elif event == "c_call":
+            self.stack.append([_label(arg, getattr(arg, "__module__", None) or "builtins"), now, 0.0])
+        elif self.stack:
+            # return / c_return / c_exception; returns from frames entered
+            # before start() find an empty stack and are ignored
+            self._pop(now)
+
+    def _pop(self, now):
+        label, started, children = self.stack[-1]
+        elapsed = now - started
+        key = ";".join(f[0] for f in self.stack)
+        self.totals[key] = self.totals.get(key, 0.0) + elapsed - children
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def close(self):
+        now = time.perf_counter()
+        while self.stack:
+            self._pop(now)
+
+
+def _label(code, module):
+    name = (getattr(code, "co_qualname", None) or getattr(code, "__qualname__", None)
+            or getattr(code, "co_name", "?"))
+    if hasattr(code, "co_filename"):
+        return f"{module}.{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return f"{module}.{name}"
+
+
+def start():
+    g._profiler = tracer = _Tracer()
+    sys.setprofile(tracer)
+
+
+def finish(response):
+    """after_request: the collapsed stacks in place of the response, if profiling"""
+    tracer = g.pop("_profiler", None)
+    if tracer is None:
+        return response
+    sys.setprofile(None)
+    tracer.close()
+    total = time.perf_counter() - tracer.started
+    lines = [f"{key} {round(s * 1e6)}" for key, s in sorted(tracer.totals.items())
+             if round(s * 1e6) > 0]
+    profiled = Response("\n".join(lines) + "\n", mimetype="text/plain")
+    profiled.headers["X-Profile-Status"] = str(response.status_code)
+    profiled.headers["X-Profile-Total-Us"] = str(round(total * 1e6))
+    profiled.headers["Cache-Control"] = "no-store"
+    return profiled
+
+
+def abandon(exc=None):
+    """teardown_request: never leave the profiler installed on a pooled thread"""
+    if g.pop("_profiler", None) is not None:
+        sys.setprofile(None)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Factions Bank production server
+Runs app.py under gunicorn instead of Flask's debug dev server.
+
+Usage:
+    python serve.py                          # gthread workers, settings from env
+    python serve.py --workers 4 --threads 8
+    python serve.py --worker-class gevent    # many idle /api/stream clients
+
+Every flag has an env var (BANK_WORKERS, BANK_THREADS, ...) so the same
+command works from a systemd unit or container. SIGTERM drains in-flight
+requests for --graceful-timeout seconds before workers are killed.
+
+An open /api/stream holds a gthread thread for as long as it is connected,
+so thread workers admit fewer streams than they have threads and answer the
+rest with 503; the dashboard then falls back to polling. A sync worker
+admits none. gevent workers only pay a greenlet per stream.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+
+def _env(name, default):
+    return os.getenv(name, str(default))
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Run the Factions Bank API under gunicorn")
+    p.add_argument("--bind", default=_env("BANK_BIND", f"0.0.0.0:{_env('PORT', 8085)}"),
+                   help="host:port to listen on (BANK_BIND, default 0.0.0.0:$PORT)")
+    p.add_argument("--workers", type=int,
+                   default=int(_env("BANK_WORKERS", multiprocessing.cpu_count() * 2 + 1)),
+                   help="worker processes (BANK_WORKERS, default 2*CPU+1)")
+    p.add_argument("--threads", type=int, default=int(_env("BANK_THREADS", 4)),
+                   help="threads per gthread worker (BANK_THREADS)")
+    p.add_argument("--worker-class", default=_env("BANK_WORKER_CLASS", "gthread"),
+                   choices=["sync", "gthread", "gevent"],
+                   help="gunicorn worker class (BANK_WORKER_CLASS)")
+    p.add_argument("--worker-connections", type=int,
+                   default=int(_env("BANK_WORKER_CONNECTIONS", 1000)),
+                   help="max concurrent clients per gevent worker (BANK_WORKER_CONNECTIONS)")
+    p.add_argument("--sse-clients", type=int,
+                   default=int(_env("BANK_SSE_MAX_CLIENTS", -1)),
+                   help="open /api/stream clients per worker (BANK_SSE_MAX_CLIENTS); "
+                        "gthread default threads/2, always below --threads")
+    p.add_argument("--keepalive", type=int, default=int(_env("BANK_KEEPALIVE", 5)),
+                   help="seconds to hold idle keep-alive connections (BANK_KEEPALIVE)")
+    p.add_argument("--timeout", type=int, default=int(_env("BANK_TIMEOUT", 30)),
+                   help="kill a worker silent for this many seconds (BANK_TIMEOUT)")
+    p.add_argument("--graceful-timeout", type=int, default=int(_env("BANK_GRACEFUL_TIMEOUT", 30)),
+                   help="seconds to finish in-flight requests on shutdown (BANK_GRACEFUL_TIMEOUT)")
+    p.add_argument("--max-requests", type=int, default=int(_env("BANK_MAX_REQUESTS", 0)),
+                   help="recycle a worker after this many requests, 0 = never (BANK_MAX_REQUESTS)")
+    return p.parse_args(argv)
+
+
+def sse_client_limit(worker_class, threads, requested=-1):
+    """Streams one worker may hold open; -1 asks for the default"""
+    if worker_class == "sync":
+        return 0
+    if worker_class == "gthread":
+        # Leave at least one thread for ordinary API requests
+        wanted = threads // 2 if requested < 0 else requested
+        return max(0, min(wanted, threads - 1))
+    return 1000 if requested < 0 else requested
+
+
+def _post_fork(server, worker):
+    # Only matters if the app was imported before the fork. Importing it here
+    # would load it ahead of gevent's monkey-patching, so don't.
+    bank_app = sys.modules.get("app")
+    if bank_app is not None:
+        bank_app.reset_after_fork()
+
+
+def _worker_exit(server, worker):
+    bank_app = sys.modules.get("app")
+    if bank_app is not None:
+        bank_app.pool.close_all()
+        bank_app.read_replicas.close_all()
+
+
+class BankServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Imported in the worker (preload is off), after gevent has patched
+        # the stdlib and after fork, so the pool starts empty in every worker
+        from app import app
+        return app
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sse_clients = sse_client_limit(args.worker_class, args.threads, args.sse_clients)
+    # Read by events.py when the worker imports the app
+    os.environ["BANK_SSE_MAX_CLIENTS"] = str(sse_clients)
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": args.worker_class,
+        "threads": args.threads,
+        "worker_connections": args.worker_connections,
+        "keepalive": args.keepalive,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10,
+        "preload_app": False,
+        "post_fork": _post_fork,
+        "worker_exit": _worker_exit,
+        "accesslog": _env("BANK_ACCESS_LOG", "-"),
+    }
+    print(f"🚀 Serving Factions Bank on {args.bind} "
+          f"({args.workers} x {args.worker_class}, {args.threads} threads, "
+          f"{sse_clients} event streams per worker)")
+    BankServer(options).run()
+
+
+if __name__ == "__main__":
+    main()
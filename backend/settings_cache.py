@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Cached access to the singleton settings rows
+`settings` and `horse_race_settings` (id=1) are read through here so a
+request never queries the same row twice and most requests don't query it at all
+"""
+import os
+import threading
+from flask import g, has_request_context
+from ttl_cache import TTLCache
+
+SETTINGS_TTL = float(os.getenv("BANK_SETTINGS_TTL", "60"))
+
+_QUERIES = {
+    "bank": """
+        SELECT payout_fee_pct, interest_rate_per_period,
+               premium_interest_rate_per_period, premium_min_balance
+        FROM settings WHERE id=1
+    """,
+    "race": """
+        SELECT winner_cut_pct, second_cut_pct, third_cut_pct,
+               entry_fee, imperial_cut_pct, rules
+        FROM horse_race_settings WHERE id=1
+    """,
+}
+
+_cache = TTLCache(maxsize=len(_QUERIES), ttl=SETTINGS_TTL)
+_lock = threading.Lock()
+_memo_hits = 0
+
+
+def _load(c, name):
+    global _memo_hits
+    memo = None
+    if has_request_context():
+        memo = g.setdefault("_settings_memo", {})
+        if name in memo:
+            with _lock:
+                _memo_hits += 1
+            row = memo[name]
+            return dict(row) if row else None
+
+    def query():
+        c.execute(_QUERIES[name])
+        return c.fetchone()
+
+    row = _cache.get_or_load(name, query)
+    if memo is not None:
+        memo[name] = row
+    return dict(row) if row else None
+
+
+def bank_settings(c):
+    """The `settings` row, or None when it doesn't exist"""
+    return _load(c, "bank")
+
+
+def race_settings(c):
+    """The `horse_race_settings` row, or None when it doesn't exist"""
+    return _load(c, "race")
+
+
+def invalidate():
+    """Drop cached rows; call after anything writes to either settings table"""
+    _cache.clear()
+    if has_request_context():
+        g.pop("_settings_memo", None)
+
+
+def reset_after_fork():
+    global _lock
+    _lock = threading.Lock()
+    _cache.reset_after_fork()
+
+
+def stats():
+    out = _cache.stats()
+    with _lock:
+        out["request_memo_hits"] = _memo_hits
+    return out
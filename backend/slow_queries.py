@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Slow-query log
+Every statement run through an instrumented cursor (see metrics.py) that
+takes at least BANK_SLOW_QUERY_MS milliseconds is written as one JSON line
+to BANK_SLOW_QUERY_LOG: normalized SQL, the shape of its parameters (types
+only, never values), route and duration. 0 turns the log off, which is the
+default; set_threshold() changes it at runtime.
+
+The file rotates at BANK_SLOW_QUERY_LOG_BYTES keeping
+BANK_SLOW_QUERY_LOG_BACKUPS old files. Rotation is not safe across
+processes, so with several workers put {pid} in the path.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+
+from flask import has_request_context, request
+
+THRESHOLD_MS = float(os.getenv("BANK_SLOW_QUERY_MS", "0"))
+LOG_PATH = os.getenv("BANK_SLOW_QUERY_LOG", "slow_queries.log")
+LOG_BYTES = int(os.getenv("BANK_SLOW_QUERY_LOG_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("BANK_SLOW_QUERY_LOG_BACKUPS", "5"))
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \(\s*%s(?:\s*,\s*%s)+\s*\)", re.IGNORECASE)
+
+_lock = threading.Lock()
+
+
+def _init_state():
+    global _threshold, _logger, _logged
+    _threshold = THRESHOLD_MS / 1000
+    _logger = None
+    _logged = 0
+
+
+_init_state()
+
+
+def normalize(sql):
+    """One-line SQL with literals replaced by ? and placeholder lists folded"""
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _IN_LIST.sub("IN (%s, ...)", sql)
+
+
+def _types(values):
+    """Type names with runs folded: ['str', 'int x 40']"""
+    out = []
+    for v in values:
+        name = type(v).__name__
+        if out and out[-1][0] == name:
+            out[-1][1] += 1
+        else:
+            out.append([name, 1])
+    return [name if n == 1 else f"{name} x {n}" for name, n in out]
+
+
+def shape(args, many=False):
+    if args is None:
+        return None
+    if many:
+        args = list(args)
+        return {"rows": len(args), "row": shape(args[0]) if args else None}
+    if isinstance(args, dict):
+        return {k: type(v).__name__ for k, v in args.items()}
+    if isinstance(args, (list, tuple)):
+        return _types(args)
+    return type(args).__name__
+
+
+def _get_logger():
+    """Caller holds _lock; the file is opened on the first slow query"""
+    global _logger
+    if _logger is None:
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_PATH.format(pid=os.getpid()), maxBytes=LOG_BYTES,
+            backupCount=LOG_BACKUPS, delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _logger = logging.getLogger(f"bank.slow_queries.{os.getpid()}")
+        _logger.propagate = False
+        _logger.setLevel(logging.INFO)
+        _logger.handlers = [handler]
+    return _logger
+
+
+def observe(sql, args, seconds, rows=None, many=False):
+    """Called for every statement; logs it when over the threshold"""
+    global _logged
+    if not _threshold or seconds < _threshold:
+        return
+    record = {
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ms": round(seconds * 1000, 3),
+        "route": request.url_rule.rule if has_request_context() and request.url_rule else None,
+        "method": request.method if has_request_context() else None,
+        "sql": normalize(sql),
+        "params": shape(args, many),
+        "rowcount": rows,
+        "pid": os.getpid(),
+    }
+    try:
+        line = json.dumps(record, default=str)
+        with _lock:
+            _get_logger().info(line)
+            _logged += 1
+    except Exception as e:
+        print(f"❌ Slow query log error: {e}")
+
+
+def set_threshold(ms):
+    """Log statements slower than ms milliseconds from now on; 0 turns logging off"""
+    global _threshold
+    _threshold = max(0.0, float(ms)) / 1000
+
+
+def reset_after_fork():
+    # Fresh lock: a thread of the parent may have held it at fork time
+    global _lock
+    _lock = threading.Lock()
+    if _logger is not None:
+        for h in _logger.handlers:
+            h.close()
+    _init_state()
+
+
+def stats():
+    return {
+        "threshold_ms": round(_threshold * 1000, 3),
+        "path": LOG_PATH.format(pid=os.getpid()),
+        "logged": _logged,
+    }
@@ -0,0 +1,4 @@
+"""
+Factions Bank benchmarks
+Run from the repository root, e.g. `python -m benchmarks.http_bench --help`
+"""
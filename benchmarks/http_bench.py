@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Closed-loop HTTP load generator (stdlib only)
+N client threads, each on its own keep-alive connection, hit one URL for a
+fixed duration and report requests/second and latency percentiles.
+
+Usage:
+    python -m benchmarks.http_bench http://127.0.0.1:8085/api/players -c 32 -d 30
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def summarize(latencies, errors, elapsed):
+    lat = sorted(latencies)
+    return {
+        "requests": len(lat),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(lat) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(lat, 50) * 1000, 2),
+        "p95_ms": round(percentile(lat, 95) * 1000, 2),
+        "p99_ms": round(percentile(lat, 99) * 1000, 2),
+        "max_ms": round(lat[-1] * 1000, 2) if lat else 0.0,
+    }
+
+
+def _connect(parts, timeout):
+    cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    return cls(parts.hostname, parts.port, timeout=timeout)
+
+
+def run(url, concurrency=16, duration=10.0, warmup=2.0, headers=None, timeout=10.0):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    headers = headers or {}
+
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    start_at = time.monotonic() + warmup
+    stop_at = start_at + duration
+
+    def worker():
+        conn = _connect(parts, timeout)
+        mine, my_errors = [], 0
+        while True:
+            t0 = time.monotonic()
+            if t0 >= stop_at:
+                break
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = _connect(parts, timeout)
+            t1 = time.monotonic()
+            if t0 >= start_at:
+                if ok:
+                    mine.append(t1 - t0)
+                else:
+                    my_errors += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += my_errors
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors[0], duration)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("url")
+    p.add_argument("-c", "--concurrency", type=int, default=16)
+    p.add_argument("-d", "--duration", type=float, default=10.0)
+    p.add_argument("-w", "--warmup", type=float, default=2.0)
+    p.add_argument("-H", "--header", action="append", default=[],
+                   help="extra header, e.g. -H 'X-API-Key: ...'")
+    args = p.parse_args(argv)
+
+    headers = dict(h.split(":", 1) for h in args.header)
+    headers = {k.strip(): v.strip() for k, v in headers.items()}
+    result = run(args.url, args.concurrency, args.duration, args.warmup, headers)
+    print(json.dumps({"url": args.url, "concurrency": args.concurrency, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
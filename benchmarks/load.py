@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Dashboard + bot load driver (stdlib only)
+--dashboards threads replay the dashboard's loadData() poll: settings and
+interest history, then either the bank view (players, transactions and
+both counts, plus suggestions while searching) or the races view, sending
+If-None-Match like cachedGet. --bots threads run the bot's write traffic
+against the same server: one opens a race, enrols the field, sets the three
+winners and ends it, over and over; the rest enrol players into whatever
+race is open. Players come from /api/players, so seed the database first
+(benchmarks.seed).
+
+Reports requests, rps and p50/p95/p99 per endpoint as JSON. Write
+rejections the bot expects (already enrolled, race already ended, ...) are
+counted as "rejected", not errors.
+
+--save-baseline writes the report to a file; --baseline compares against one
+and exits 1 when an endpoint's p50/p95/p99 grew by more than --threshold
+(and more than --min-delta-ms), its rps fell by more than --threshold, or it
+started failing. Endpoints with fewer than --min-requests baseline samples
+are only checked for errors. Baselines are only comparable on the same host, data set
+and flags.
+
+Usage:
+    python -m benchmarks.load --url http://127.0.0.1:8085 -d 60 --save-baseline base.json
+    python -m benchmarks.load --url http://127.0.0.1:8085 -d 60 --baseline base.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, urlsplit
+
+from benchmarks.http_bench import summarize
+
+PLAYER_LIMIT = 15
+TXN_LIMIT = 20
+HISTORY_POINTS = 300
+
+
+class Recorder:
+    """Latencies per endpoint, counted only inside the measured window"""
+
+    def __init__(self, start_at, stop_at):
+        self.start_at, self.stop_at = start_at, stop_at
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.rejected = {}
+
+    def running(self):
+        return time.monotonic() < self.stop_at
+
+    def record(self, endpoint, t0, seconds, outcome):
+        if t0 < self.start_at or t0 >= self.stop_at:
+            return
+        with self.lock:
+            if outcome == "ok":
+                self.latencies.setdefault(endpoint, []).append(seconds)
+            else:
+                bucket = self.errors if outcome == "error" else self.rejected
+                bucket[endpoint] = bucket.get(endpoint, 0) + 1
+
+    def report(self, duration):
+        endpoints = {}
+        for ep in sorted(set(self.latencies) | set(self.errors) | set(self.rejected)):
+            endpoints[ep] = summarize(self.latencies.get(ep, []), self.errors.get(ep, 0), duration)
+            endpoints[ep]["rejected"] = self.rejected.get(ep, 0)
+        everything = [s for lat in self.latencies.values() for s in lat]
+        endpoints["ALL"] = summarize(everything, sum(self.errors.values()), duration)
+        endpoints["ALL"]["rejected"] = sum(self.rejected.values())
+        return endpoints
+
+
+class Client:
+    """One keep-alive connection with a per-client ETag cache"""
+
+    def __init__(self, base, recorder, api_key=None, etags=True):
+        self.parts = urlsplit(base)
+        self.recorder = recorder
+        self.api_key = api_key
+        self.etags = {} if etags else None
+        self.conn = self._connect()
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.parts.scheme == "https" else http.client.HTTPConnection
+        return cls(self.parts.hostname, self.parts.port, timeout=30)
+
+    def call(self, method, path, body=None, expect_rejects=False):
+        """(status, parsed JSON or None); status 0 on a transport error"""
+        endpoint = f"{method} {path.split('?', 1)[0]}"
+        headers = {}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            headers["X-API-Key"] = self.api_key or ""
+        cached = self.etags.get(path) if self.etags is not None and method == "GET" else None
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        t0 = time.monotonic()
+        try:
+            self.conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+            resp = self.conn.getresponse()
+            raw = resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = self._connect()
+            self.recorder.record(endpoint, t0, time.monotonic() - t0, "error")
+            return 0, None
+        elapsed = time.monotonic() - t0
+
+        if status < 400:
+            outcome = "ok"
+        elif expect_rejects and status < 500:
+            outcome = "rejected"
+        else:
+            outcome = "error"
+        self.recorder.record(endpoint, t0, elapsed, outcome)
+
+        if status == 304 and cached:
+            return 200, cached[1]
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        etag = resp.getheader("ETag")
+        if etag and self.etags is not None and status == 200:
+            self.etags[path] = (etag, data)
+        return status, data
+
+    def close(self):
+        self.conn.close()
+
+
+# -------------------- DASHBOARDS --------------------
+def dashboard(client, rng, igns, think):
+    """Replay App.jsx loadData() until the run ends"""
+    while client.recorder.running():
+        view = "bank" if rng.random() < 0.8 else "races"
+        search = ""
+        if igns and rng.random() < 0.3:
+            ign = rng.choice(igns)
+            search = quote(ign[:rng.randint(2, min(5, len(ign)))])
+        player_offset = PLAYER_LIMIT * (0 if rng.random() < 0.8 else rng.randint(1, 3))
+        txn_offset = TXN_LIMIT * (0 if rng.random() < 0.8 else rng.randint(1, 3))
+
+        client.call("GET", "/api/settings")
+        client.call("GET", f"/api/interest/history?order=desc&bucket=auto&points={HISTORY_POINTS}")
+        if view == "bank":
+            if search:
+                client.call("GET", f"/api/players/suggest?q={search}&limit=8")
+            client.call("GET", f"/api/players?q={search}&limit={PLAYER_LIMIT}&offset={player_offset}")
+            client.call("GET", f"/api/transactions?ign={search}&limit={TXN_LIMIT}&offset={txn_offset}")
+            client.call("GET", f"/api/players/count?q={search}")
+            client.call("GET", f"/api/transactions/count?ign={search}")
+        else:
+            client.call("GET", "/api/races")
+        if think:
+            time.sleep(think)
+
+
+# -------------------- BOTS --------------------
+class RaceState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = False
+        self.enrolled = []
+
+
+def race_master(client, rng, igns, state, field, think):
+    """Open a race, wait for (or enrol) the field, set winners, end it"""
+    while client.recorder.running():
+        starts_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        status, _ = client.call("POST", "/api/races/new",
+                                {"name": f"Bench {rng.randint(0, 1 << 30)}", "starts_at": starts_at})
+        if status != 200:
+            time.sleep(1)
+            continue
+        with state.lock:
+            state.open, state.enrolled = True, []
+
+        deadline = time.monotonic() + 30
+        while client.recorder.running() and time.monotonic() < deadline:
+            with state.lock:
+                if len(state.enrolled) >= field:
+                    break
+            enrol(client, rng, igns, state)
+            if think:
+                time.sleep(think)
+
+        with state.lock:
+            state.open = False
+            winners = rng.sample(state.enrolled, min(3, len(state.enrolled)))
+        for position, ign in enumerate(winners, 1):
+            client.call("POST", f"/api/races/winner{position}", {"player_name": ign},
+                        expect_rejects=True)
+        client.call("POST", "/api/races/end", {}, expect_rejects=True)
+
+
+def enrol(client, rng, igns, state):
+    ign = rng.choice(igns)
+    status, _ = client.call("POST", "/api/races/enroll", {"player_name": ign}, expect_rejects=True)
+    if status == 200:
+        with state.lock:
+            state.enrolled.append(ign)
+
+
+def enroller(client, rng, igns, state, think):
+    while client.recorder.running():
+        with state.lock:
+            race_open = state.open
+        if race_open:
+            enrol(client, rng, igns, state)
+        else:
+            time.sleep(0.05)
+        if think:
+            time.sleep(think)
+
+
+# -------------------- BASELINES --------------------
+def compare(current, baseline, threshold, min_delta_ms, min_requests):
+    """Regressions of current against baseline, as printable lines"""
+    problems = []
+    for ep, base in sorted(baseline["endpoints"].items()):
+        cur = current["endpoints"].get(ep)
+        if cur is None:
+            print(f"⚠️  {ep}: in the baseline but not exercised in this run", file=sys.stderr)
+            continue
+        if cur["errors"] and not base["errors"]:
+            problems.append(f"{ep}: {cur['errors']} errors (baseline had none)")
+        if base["requests"] < min_requests:
+            # Too few samples for percentiles or a rate to mean anything
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if (cur[metric] > base[metric] * (1 + threshold)
+                    and cur[metric] - base[metric] > min_delta_ms):
+                problems.append(f"{ep}: {metric} {base[metric]} -> {cur[metric]}")
+        if cur["rps"] < base["rps"] * (1 - threshold):
+            problems.append(f"{ep}: rps {base['rps']} -> {cur['rps']}")
+    return problems
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Replay dashboard polling and bot writes against the API")
+    p.add_argument("--url", default=os.getenv("BANK_API_URL", "http://127.0.0.1:8085"))
+    p.add_argument("--key", default=os.getenv("BANK_API_KEY"), help="API key for the bot writes")
+    p.add_argument("--dashboards", type=int, default=16, help="concurrent dashboard clients")
+    p.add_argument("--bots", type=int, default=2, help="bot writer threads, 0 for read-only")
+    p.add_argument("--field", type=int, default=12, help="entrants per bot race")
+    p.add_argument("--think", type=float, default=0.0,
+                   help="seconds between a client's rounds (0 = closed loop)")
+    p.add_argument("--no-etags", action="store_true", help="never send If-None-Match")
+    p.add_argument("-d", "--duration", type=float, default=30.0)
+    p.add_argument("-w", "--warmup", type=float, default=5.0)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--save-baseline", metavar="PATH", help="write the report here")
+    p.add_argument("--baseline", metavar="PATH", help="fail on regressions against this report")
+    p.add_argument("--threshold", type=float, default=0.20,
+                   help="allowed relative regression (default 0.20)")
+    p.add_argument("--min-delta-ms", type=float, default=2.0,
+                   help="ignore latency regressions smaller than this (default 2 ms)")
+    p.add_argument("--min-requests", type=int, default=30,
+                   help="only check latency/rps of endpoints with this many baseline requests")
+    args = p.parse_args(argv)
+    if args.bots and not args.key:
+        sys.exit("❌ --key or BANK_API_KEY is required for --bots (or pass --bots 0)")
+
+    start_at = time.monotonic() + args.warmup
+    recorder = Recorder(start_at, start_at + args.duration)
+    setup = Client(args.url, Recorder(0, 0))
+    _, players = setup.call("GET", "/api/players?limit=500")
+    setup.close()
+    igns = [pl['ign'] for pl in players or []]
+    if not igns:
+        sys.exit("❌ no players on the server; load some with benchmarks.seed")
+
+    state = RaceState()
+    jobs = []
+    for i in range(args.dashboards):
+        jobs.append((dashboard, (random.Random(args.seed + i), igns, args.think)))
+    for i in range(args.bots):
+        rng = random.Random(args.seed + 10000 + i)
+        if i == 0:
+            jobs.append((race_master, (rng, igns, state, args.field, args.think)))
+        else:
+            jobs.append((enroller, (rng, igns, state, args.think)))
+
+    def run(fn, fn_args):
+        client = Client(args.url, recorder, args.key, etags=not args.no_etags)
+        try:
+            fn(client, *fn_args)
+        finally:
+            client.close()
+
+    print(f"🏁 {args.dashboards} dashboards, {args.bots} bots against {args.url} "
+          f"for {args.duration:g}s (+{args.warmup:g}s warmup)", file=sys.stderr)
+    threads = [threading.Thread(target=run, args=job, daemon=True) for job in jobs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    report = {
+        "meta": {
+            "url": args.url,
+            "dashboards": args.dashboards,
+            "bots": args.bots,
+            "field": args.field,
+            "think": args.think,
+            "etags": not args.no_etags,
+            "duration": args.duration,
+            "seed": args.seed,
+            "host": platform.node(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "endpoints": recorder.report(args.duration),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("dashboards", "bots", "field", "think", "etags", "duration"):
+            if baseline["meta"].get(key) != report["meta"][key]:
+                print(f"⚠️  {key} differs from the baseline "
+                      f"({baseline['meta'].get(key)} vs {report['meta'][key]})", file=sys.stderr)
+        problems = compare(report, baseline, args.threshold, args.min_delta_ms, args.min_requests)
+        if problems:
+            for line in problems:
+                print(f"❌ {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Seeded synthetic data set for benchmarks
+Fills a database created from database/schema.sql with N players (one
+account each), M ledger transactions, R finished horse races with jockeys,
+winners and the matching entry/prize transactions, and a run of interest
+rate changes. The same --seed and sizes always produce the same rows; only
+timestamps move, since they are laid out over the --days before now.
+
+The ledger is replayed in Python in time order, so every transaction has a
+correct effective_delta/balance_after and each account's balance matches
+its last one. Rows go in with executemany, which pymysql sends as
+multi-row INSERTs, and with the balance trigger switched off for the
+session (like copy_data.sql); the bank_totals triggers still run.
+
+Usage:
+    mysql factions_bank_bench < database/schema.sql
+    BANK_DB_NAME=factions_bank_bench python -m benchmarks.seed --players 10000 --transactions 500000
+    BANK_DB_NAME=factions_bank_bench python scripts/rollup_transactions.py
+
+--reset empties the data tables first; without it the target must have no
+players yet.
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import pymysql
+
+DB_HOST = os.getenv("BANK_DB_HOST", "127.0.0.1")
+DB_USER = os.getenv("BANK_DB_USER", "factions_test")
+DB_PASS = os.getenv("BANK_DB_PASS", "SuperSecureTestPass123")
+DB_NAME = os.getenv("BANK_DB_NAME", "factions_bank")
+
+BATCH = 5000
+CENT = Decimal("0.01")
+# Defaults from schema.sql (settings / horse_race_settings id=1)
+PAYOUT_FEE = Decimal("0.07")
+ENTRY_FEE = Decimal("100.00")
+IMPERIAL_CUT = Decimal("0.10")
+PRIZE_CUTS = {1: Decimal("0.50"), 2: Decimal("0.30"), 3: Decimal("0.20")}
+# Interest is paid on at most this much, so whales don't compound past DECIMAL(20, 2)
+INTEREST_BASE_CAP = Decimal("1000000000.00")
+
+SYLLABLES = ["ka", "zu", "mi", "ro", "xen", "dra", "vo", "li", "thor", "ne", "sky", "bl",
+             "az", "qu", "ish", "fer", "mo", "tal", "gri", "pex"]
+
+DATA_TABLES = ["horse_jockeys", "horse_races", "transactions", "accounts", "players",
+               "account_rollups", "bank_rollups", "rollup_gaps", "interest_run_shards", "interest_runs",
+               "interest_rate_history"]
+
+
+def connect(database):
+    return pymysql.connect(
+        host=DB_HOST, user=DB_USER, password=DB_PASS, database=database,
+        autocommit=False, cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def money(x):
+    return Decimal(x).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+# -------------------- GENERATION --------------------
+def make_igns(rng, n):
+    """n unique Minecraft-style names (3-16 chars of [A-Za-z0-9_])"""
+    seen, out = set(), []
+    while len(out) < n:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.5:
+            name += str(rng.randint(0, 9999))
+        if rng.random() < 0.3:
+            name = name.capitalize()
+        if rng.random() < 0.1:
+            name = name[:8] + "_" + name[8:]
+        name = name[:16]
+        if len(name) >= 3 and name.lower() not in seen:
+            seen.add(name.lower())
+            out.append(name)
+    return out
+
+
+def generate(rng, players, transactions, races, jockeys, days, rate_changes, now):
+    start = now - timedelta(days=days)
+    span = days * 86400
+
+    def at(fraction):
+        return start + timedelta(seconds=int(fraction * span))
+
+    igns = make_igns(rng, players)
+    joined = sorted(rng.random() * 0.5 for _ in range(players))
+    player_rows = [(i + 1, igns[i], at(joined[i])) for i in range(players)]
+    closed = {i + 1 for i in range(players) if rng.random() < 0.03}
+    # A few heavy accounts and a long tail, as on the live server
+    cum_weights = list(itertools.accumulate(rng.paretovariate(1.2) for _ in range(players)))
+
+    # (time fraction, kind, payload), replayed in order
+    events = [(rng.uniform(0.5, 1.0), "txn", None) for _ in range(transactions)]
+    events += [(0.5 + 0.5 * (r + 1) / (races + 1), "race", r + 1) for r in range(races)]
+    events.sort(key=lambda e: e[0])
+
+    balances = [Decimal("0.00")] * (players + 1)
+    txn_rows, race_rows, jockey_rows = [], [], []
+    account_ids = list(range(1, players + 1))
+
+    def ledger(account_id, txn_type, amount, fee_pct, note, when):
+        delta = -(amount + money(amount * (fee_pct or 0))) if txn_type == "payout" else amount
+        balances[account_id] += delta
+        txn_rows.append((account_id, txn_type, amount, fee_pct, delta,
+                         balances[account_id], note, when))
+
+    for fraction, kind, payload in events:
+        when = at(fraction)
+        if kind == "txn":
+            aid = rng.choices(account_ids, cum_weights=cum_weights)[0]
+            if aid in closed and rng.random() < 0.9:
+                aid = rng.randint(1, players)
+            roll = rng.random()
+            amount = money(min(rng.lognormvariate(9, 2), 1e9))
+            if roll < 0.25 and balances[aid] >= amount * (1 + PAYOUT_FEE):
+                ledger(aid, "payout", amount, PAYOUT_FEE, "Payout", when)
+            elif roll < 0.45 and balances[aid] > 0:
+                base = min(balances[aid], INTEREST_BASE_CAP)
+                interest = money(base * Decimal(str(round(rng.uniform(0.0005, 0.005), 5))))
+                if interest > 0:
+                    ledger(aid, "interest", interest, None, "Hourly interest", when)
+            else:
+                ledger(aid, "deposit", amount, None, "Deposit", when)
+            continue
+
+        race_id = payload
+        name = f"Imperial Race {race_id}"
+        field = [aid for aid in rng.sample(account_ids, min(players, jockeys * 3))
+                 if aid not in closed and balances[aid] >= ENTRY_FEE][:jockeys]
+        pool = Decimal("0.00")
+        for k, aid in enumerate(field):
+            ledger(aid, "payout", ENTRY_FEE, None, f"Horse race entry - {name}", when)
+            jockey_rows.append((race_id, aid, when + timedelta(seconds=k)))
+            pool += ENTRY_FEE - money(ENTRY_FEE * IMPERIAL_CUT)
+        winners = rng.sample(field, min(3, len(field)))
+        ended = when + timedelta(minutes=30)
+        for position, aid in enumerate(winners, 1):
+            ledger(aid, "deposit", money(pool * PRIZE_CUTS[position]), None,
+                   f"Horse race - Position {position} - {name}", ended)
+        winners += [None] * (3 - len(winners))
+        race_rows.append((race_id, name, name, pool, when - timedelta(minutes=5), ended,
+                          *winners, when - timedelta(hours=1)))
+
+    account_rows = [
+        (aid, aid, "closed" if aid in closed else "active", balances[aid],
+         now - timedelta(minutes=rng.randint(0, 59)), player_rows[aid - 1][2],
+         now if aid in closed else None)
+        for aid in account_ids
+    ]
+
+    rate = Decimal("0.05000000")
+    rate_rows = []
+    for i in range(rate_changes):
+        rate = max(Decimal("0.00100000"), rate + Decimal(str(round(rng.uniform(-0.005, 0.005), 8))))
+        rate_rows.append((at(i / max(rate_changes, 1)), rate, rate + Decimal("0.01"),
+                          Decimal("1000000000.00")))
+
+    return {
+        "players": player_rows,
+        "accounts": account_rows,
+        "transactions": txn_rows,
+        "horse_races": race_rows,
+        "horse_jockeys": jockey_rows,
+        "interest_rate_history": rate_rows,
+    }
+
+
+# -------------------- LOADING --------------------
+INSERTS = {
+    "players": "INSERT INTO players (id, ign, created_at) VALUES (%s, %s, %s)",
+    "accounts": """INSERT INTO accounts (id, player_id, status, balance, last_compounded_at,
+                                         created_at, closed_at)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+    "transactions": """INSERT INTO transactions (account_id, txn_type, amount, fee_pct,
+                                                 effective_delta, balance_after, note, created_at)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+    "horse_races": """INSERT INTO horse_races (id, name, race_name, prize_pool, starts_at, ends_at,
+                                               winner1_id, winner2_id, winner3_id, created_at)
+                      VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+    "horse_jockeys": "INSERT INTO horse_jockeys (race_id, player_id, joined_at) VALUES (%s, %s, %s)",
+    "interest_rate_history": """INSERT INTO interest_rate_history (changed_at, normal_rate, premium_rate,
+                                                                   premium_min_balance)
+                                VALUES (%s, %s, %s, %s)""",
+}
+
+
+def reset(c):
+    c.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in DATA_TABLES:
+        c.execute(f"TRUNCATE TABLE {table}")
+    c.execute("SET FOREIGN_KEY_CHECKS = 1")
+    c.execute("""
+        UPDATE bank_totals SET total_debt = 0, active_accounts = 0, premium_accounts = 0,
+                               open_races = 0, open_prize_pools = 0
+    """)
+    c.execute("UPDATE rollup_state SET last_txn_id = 0, ledger_total = 0 WHERE id = 1")
+
+
+def load(cx, data):
+    with cx.cursor() as c:
+        c.execute("SET @bank_skip_balance_trigger = 1")
+        for table, sql in INSERTS.items():
+            rows = data[table]
+            started = time.monotonic()
+            for i in range(0, len(rows), BATCH):
+                c.executemany(sql, rows[i:i + BATCH])
+            print(f"   {table}: {len(rows)} rows in {time.monotonic() - started:.2f}s")
+        c.execute("SET @bank_skip_balance_trigger = NULL")
+    cx.commit()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Load a seeded synthetic data set for benchmarks")
+    p.add_argument("--database", default=DB_NAME, help="target database (BANK_DB_NAME)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--players", type=int, default=10000)
+    p.add_argument("--transactions", type=int, default=200000,
+                   help="ledger transactions besides race entries and prizes")
+    p.add_argument("--races", type=int, default=200)
+    p.add_argument("--jockeys", type=int, default=12, help="entrants per race")
+    p.add_argument("--rate-changes", type=int, default=100, help="interest_rate_history rows")
+    p.add_argument("--days", type=int, default=90, help="history spread over this many days")
+    p.add_argument("--reset", action="store_true", help="empty the data tables first")
+    args = p.parse_args(argv)
+
+    started = time.monotonic()
+    data = generate(random.Random(args.seed), args.players, args.transactions, args.races,
+                    args.jockeys, args.days, args.rate_changes,
+                    datetime.now().replace(microsecond=0))
+    print(f"🎲 Generated seed {args.seed} in {time.monotonic() - started:.2f}s")
+
+    with connect(args.database) as cx:
+        with cx.cursor() as c:
+            if args.reset:
+                reset(c)
+                cx.commit()
+            else:
+                c.execute("SELECT COUNT(*) AS n FROM players")
+                if c.fetchone()['n']:
+                    sys.exit(f"❌ {args.database} already has players; use --reset to replace them")
+        print(f"📥 Loading into {args.database}")
+        load(cx, data)
+
+    print(f"✅ Seeded {args.players} players, {len(data['transactions'])} transactions, "
+          f"{args.races} races in {time.monotonic() - started:.2f}s")
+    print("   Run scripts/rollup_transactions.py to fill the chart rollups")
+
+
+if __name__ == "__main__":
+    main()
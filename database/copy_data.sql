@@ -0,0 +1,75 @@
+-- Copy an existing deployment's data into a database created from schema.sql.
+--
+--   mysql factions_bank < database/copy_data.sql
+--
+-- Reads from the old database `factions_bank_old` on the same server; edit
+-- the name (or sed it) to match. Ids are preserved so foreign keys, race
+-- winners and transaction history line up. The balance trigger is switched
+-- off for the session: transactions are copied with the effective_delta and
+-- balance_after they already had, and account balances are copied as-is
+-- rather than replayed. The load fails (and rolls back) on the UNIQUE
+-- constraints if the old data has duplicate IGNs or duplicate race entries.
+-- The bank_totals triggers do run, so settings are copied before accounts
+-- (premium_accounts depends on premium_min_balance).
+
+SET @bank_skip_balance_trigger = 1;
+SET FOREIGN_KEY_CHECKS = 0;
+START TRANSACTION;
+
+REPLACE INTO settings (id, payout_fee_pct, interest_rate_per_period,
+                       premium_interest_rate_per_period, premium_min_balance)
+SELECT id, payout_fee_pct, interest_rate_per_period,
+       premium_interest_rate_per_period, premium_min_balance
+FROM factions_bank_old.settings WHERE id = 1;
+
+INSERT INTO players (id, ign, created_at)
+SELECT id, ign, COALESCE(created_at, NOW())
+FROM factions_bank_old.players;
+
+INSERT INTO accounts (id, player_id, status, balance, last_compounded_at, created_at)
+SELECT id, player_id, status, COALESCE(balance, 0), last_compounded_at, NOW()
+FROM factions_bank_old.accounts;
+
+INSERT INTO transactions (id, account_id, txn_type, amount, fee_pct,
+                          effective_delta, balance_after, note, created_at)
+SELECT id, account_id, txn_type, amount, fee_pct,
+       COALESCE(effective_delta, 0), COALESCE(balance_after, 0), note,
+       COALESCE(created_at, NOW())
+FROM factions_bank_old.transactions;
+
+-- schema.sql seeds one history row from the defaults; the old history replaces it
+DELETE FROM interest_rate_history;
+INSERT INTO interest_rate_history (id, changed_at, normal_rate, premium_rate, premium_min_balance)
+SELECT id, changed_at, normal_rate, premium_rate, premium_min_balance
+FROM factions_bank_old.interest_rate_history;
+
+REPLACE INTO horse_race_settings (id, winner_cut_pct, second_cut_pct, third_cut_pct,
+                                  entry_fee, imperial_cut_pct, rules)
+SELECT id, winner_cut_pct, second_cut_pct, third_cut_pct,
+       entry_fee, imperial_cut_pct, rules
+FROM factions_bank_old.horse_race_settings WHERE id = 1;
+
+INSERT INTO horse_races (id, name, race_name, prize_pool, starts_at, ends_at,
+                         winner1_id, winner2_id, winner3_id, created_at)
+SELECT id, name, race_name, COALESCE(prize_pool, 0), starts_at, ends_at,
+       winner1_id, winner2_id, winner3_id, COALESCE(created_at, NOW())
+FROM factions_bank_old.horse_races;
+
+INSERT INTO horse_jockeys (id, race_id, player_id, joined_at)
+SELECT id, race_id, player_id, COALESCE(joined_at, NOW())
+FROM factions_bank_old.horse_jockeys;
+
+COMMIT;
+SET FOREIGN_KEY_CHECKS = 1;
+SET @bank_skip_balance_trigger = NULL;
+
+-- Sanity check: every active balance should equal its latest balance_after
+SELECT a.id, a.balance, t.balance_after
+FROM accounts a
+JOIN transactions t ON t.id = (SELECT MAX(id) FROM transactions WHERE account_id = a.id)
+WHERE a.status = 'active' AND a.balance <> t.balance_after
+LIMIT 20;
+
+-- ...and the maintained totals should match: python scripts/reconcile_totals.py
+-- Chart rollups start from an empty watermark: python scripts/rollup_transactions.py
+-- backfills them from the copied ledger.
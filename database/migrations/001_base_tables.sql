@@ -0,0 +1,96 @@
+-- 001: tables the API, the race routes and the interest job read and write.
+-- Keys here are only the ones the data model needs (primary keys, the IGN
+-- natural key, foreign keys); query-tuned indexes are in 003.
+
+CREATE TABLE players (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    ign VARCHAR(32) NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_players_ign (ign)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE accounts (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    player_id BIGINT NOT NULL,
+    status ENUM('active', 'closed') NOT NULL DEFAULT 'active',
+    balance DECIMAL(20, 2) NOT NULL DEFAULT 0.00,
+    last_compounded_at DATETIME NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    closed_at DATETIME NULL,
+    CONSTRAINT fk_accounts_player FOREIGN KEY (player_id) REFERENCES players (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- effective_delta and balance_after are filled in by the insert trigger (002);
+-- writers only supply account_id, txn_type, amount, note and optionally fee_pct
+CREATE TABLE transactions (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    account_id BIGINT NOT NULL,
+    txn_type ENUM('deposit', 'payout', 'interest', 'horse_race_win') NOT NULL,
+    amount DECIMAL(20, 2) NOT NULL,
+    fee_pct DECIMAL(9, 6) NULL,
+    effective_delta DECIMAL(20, 2) NOT NULL DEFAULT 0.00,
+    balance_after DECIMAL(20, 2) NOT NULL DEFAULT 0.00,
+    note VARCHAR(255) NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_transactions_account FOREIGN KEY (account_id) REFERENCES accounts (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Singleton rows (id=1); rates are fractions per period (hour)
+CREATE TABLE settings (
+    id TINYINT NOT NULL PRIMARY KEY,
+    payout_fee_pct DECIMAL(9, 6) NOT NULL DEFAULT 0.070000,
+    interest_rate_per_period DECIMAL(12, 8) NOT NULL DEFAULT 0.05000000,
+    premium_interest_rate_per_period DECIMAL(12, 8) NOT NULL DEFAULT 0.06000000,
+    premium_min_balance DECIMAL(20, 2) NOT NULL DEFAULT 1000000000.00,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE interest_rate_history (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    normal_rate DECIMAL(12, 8) NOT NULL,
+    premium_rate DECIMAL(12, 8) NOT NULL,
+    premium_min_balance DECIMAL(20, 2) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Percentages here are whole percents (50.00 = half the pool)
+CREATE TABLE horse_race_settings (
+    id TINYINT NOT NULL PRIMARY KEY,
+    winner_cut_pct DECIMAL(5, 2) NOT NULL DEFAULT 50.00,
+    second_cut_pct DECIMAL(5, 2) NOT NULL DEFAULT 30.00,
+    third_cut_pct DECIMAL(5, 2) NOT NULL DEFAULT 20.00,
+    entry_fee DECIMAL(20, 2) NOT NULL DEFAULT 100.00,
+    imperial_cut_pct DECIMAL(5, 2) NOT NULL DEFAULT 10.00,
+    rules TEXT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE horse_races (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(128) NULL,
+    race_name VARCHAR(128) NULL,
+    prize_pool DECIMAL(20, 2) NOT NULL DEFAULT 0.00,
+    starts_at DATETIME NULL,
+    ends_at DATETIME NULL,
+    winner1_id BIGINT NULL,
+    winner2_id BIGINT NULL,
+    winner3_id BIGINT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_races_winner1 FOREIGN KEY (winner1_id) REFERENCES players (id),
+    CONSTRAINT fk_races_winner2 FOREIGN KEY (winner2_id) REFERENCES players (id),
+    CONSTRAINT fk_races_winner3 FOREIGN KEY (winner3_id) REFERENCES players (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE horse_jockeys (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    race_id BIGINT NOT NULL,
+    player_id BIGINT NOT NULL,
+    joined_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_jockeys_race FOREIGN KEY (race_id) REFERENCES horse_races (id),
+    CONSTRAINT fk_jockeys_player FOREIGN KEY (player_id) REFERENCES players (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO settings (id) VALUES (1);
+INSERT INTO horse_race_settings (id, rules) VALUES (1, 'No rules set');
+INSERT INTO interest_rate_history (normal_rate, premium_rate, premium_min_balance)
+SELECT interest_rate_per_period, premium_interest_rate_per_period, premium_min_balance
+FROM settings WHERE id = 1;
@@ -0,0 +1,39 @@
+-- 002: the ledger is the source of truth for balances. Every inserted
+-- transaction gets its signed effective_delta and the resulting
+-- balance_after, and the account balance moves with it, so writers never
+-- touch accounts.balance themselves.
+--
+-- Payouts cost amount plus an optional fee (fee_pct is a fraction); every
+-- other type credits the amount. Bulk loads (copy_data.sql) set
+-- @bank_skip_balance_trigger = 1 to insert history rows as-is.
+
+DELIMITER //
+
+CREATE TRIGGER transactions_before_insert
+BEFORE INSERT ON transactions
+FOR EACH ROW
+BEGIN
+    DECLARE bal DECIMAL(20, 2);
+    IF @bank_skip_balance_trigger IS NULL THEN
+        SELECT balance INTO bal FROM accounts WHERE id = NEW.account_id FOR UPDATE;
+        IF bal IS NULL THEN
+            SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'transactions.account_id has no account';
+        END IF;
+        SET NEW.effective_delta = CASE NEW.txn_type
+            WHEN 'payout' THEN -(NEW.amount + ROUND(NEW.amount * COALESCE(NEW.fee_pct, 0), 2))
+            ELSE NEW.amount
+        END;
+        SET NEW.balance_after = bal + NEW.effective_delta;
+    END IF;
+END//
+
+CREATE TRIGGER transactions_after_insert
+AFTER INSERT ON transactions
+FOR EACH ROW
+BEGIN
+    IF @bank_skip_balance_trigger IS NULL THEN
+        UPDATE accounts SET balance = NEW.balance_after WHERE id = NEW.account_id;
+    END IF;
+END//
+
+DELIMITER ;
@@ -0,0 +1,35 @@
+-- 003: indexes for the API's hot queries. Each one names the statement it
+-- serves; scripts/explain_check.py fails if a plan regresses to a full scan
+-- or filesort.
+
+-- "already enrolled" is enforced by the database (horse_races.enroll_player
+-- relies on the duplicate-key error). Fails if duplicates already exist:
+--   SELECT race_id, player_id, COUNT(*) FROM horse_jockeys
+--   GROUP BY race_id, player_id HAVING COUNT(*) > 1;
+-- The unique index also answers jockey_ids() (race_id + player_id IN ...).
+ALTER TABLE horse_jockeys
+    ADD UNIQUE KEY uq_jockeys_race_player (race_id, player_id),
+    -- load_races: WHERE race_id IN (...) ORDER BY race_id, joined_at, id
+    -- (InnoDB appends the primary key, so the index order is exactly that)
+    ADD KEY idx_jockeys_race_joined (race_id, joined_at);
+
+ALTER TABLE accounts
+    -- player_lookup.lookup / lock_players joins:
+    -- accounts a ON a.player_id = p.id AND a.status = 'active'
+    ADD KEY idx_accounts_player_status (player_id, status),
+    -- /api/players: active accounts ORDER BY balance DESC, player_id DESC,
+    -- keyset (balance, player_id) < (?, ?); covering, read backwards.
+    -- Also covers SUM(balance) WHERE status='active' for /api/settings.
+    ADD KEY idx_accounts_status_balance (status, balance, player_id, last_compounded_at);
+
+-- latest_active_race: WHERE ends_at IS NULL ORDER BY id DESC LIMIT 1
+ALTER TABLE horse_races
+    ADD KEY idx_races_open (ends_at, id);
+
+-- /api/interest/history: ORDER BY changed_at LIMIT n
+ALTER TABLE interest_rate_history
+    ADD KEY idx_rate_history_changed (changed_at);
+
+-- transactions needs nothing extra: /api/transactions walks the primary key
+-- newest-first, and the implicit fk_transactions_account index is
+-- effectively (account_id, id) for per-account reads.
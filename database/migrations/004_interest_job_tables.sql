@@ -0,0 +1,27 @@
+-- 004: checkpoint tables for scripts/hourly_interest.py (the job also
+-- creates them on first run; this makes them part of the versioned schema)
+
+CREATE TABLE IF NOT EXISTS interest_runs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    status ENUM('running', 'done') NOT NULL DEFAULT 'running',
+    as_of DATETIME NOT NULL,
+    min_id BIGINT NOT NULL,
+    max_id BIGINT NOT NULL,
+    chunk_size INT NOT NULL,
+    normal_rate DECIMAL(12, 8) NOT NULL,
+    premium_rate DECIMAL(12, 8) NOT NULL,
+    premium_min_balance DECIMAL(20, 2) NOT NULL,
+    started_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME NULL,
+    KEY idx_interest_runs_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS interest_run_shards (
+    run_id BIGINT NOT NULL,
+    lo BIGINT NOT NULL,
+    hi BIGINT NOT NULL,
+    accounts INT NOT NULL,
+    interest DECIMAL(20, 2) NOT NULL,
+    finished_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, lo)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,153 @@
+-- 005: dashboard totals maintained by triggers instead of a SUM over every
+-- account per request. bank_totals holds 32 slots; each trigger adds its
+-- delta to slot CONNECTION_ID() % 32, so concurrent transactions (API
+-- workers, interest job workers) mostly update different rows and don't
+-- queue on one hot counter. Readers SUM the slots.
+--
+-- The triggers fire on any change to accounts or horse_races, however it is
+-- made, and ignore @bank_skip_balance_trigger: they follow whatever balance
+-- ends up stored. premium_accounts uses settings.premium_min_balance at the
+-- time of the change; changing the threshold recounts it.
+--
+-- scripts/reconcile_totals.py recomputes everything and reports or fixes
+-- drift (e.g. changes that raced this migration's backfill).
+
+CREATE TABLE bank_totals (
+    slot TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+    total_debt DECIMAL(24, 2) NOT NULL DEFAULT 0.00,
+    active_accounts INT NOT NULL DEFAULT 0,
+    premium_accounts INT NOT NULL DEFAULT 0,
+    open_races INT NOT NULL DEFAULT 0,
+    open_prize_pools DECIMAL(24, 2) NOT NULL DEFAULT 0.00
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO bank_totals (slot) VALUES
+    (0), (1), (2), (3), (4), (5), (6), (7), (8), (9), (10), (11), (12), (13), (14), (15),
+    (16), (17), (18), (19), (20), (21), (22), (23), (24), (25), (26), (27), (28), (29), (30), (31);
+
+DELIMITER //
+
+CREATE TRIGGER accounts_totals_insert
+AFTER INSERT ON accounts
+FOR EACH ROW
+BEGIN
+    DECLARE premium_min DECIMAL(20, 2) DEFAULT 1000000000.00;
+    IF NEW.status = 'active' THEN
+        SELECT premium_min_balance INTO premium_min FROM settings WHERE id = 1;
+        UPDATE bank_totals
+        SET total_debt = total_debt + NEW.balance,
+            active_accounts = active_accounts + 1,
+            premium_accounts = premium_accounts + (NEW.balance >= premium_min)
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER accounts_totals_update
+AFTER UPDATE ON accounts
+FOR EACH ROW
+BEGIN
+    DECLARE premium_min DECIMAL(20, 2) DEFAULT 1000000000.00;
+    IF NOT (OLD.balance <=> NEW.balance AND OLD.status <=> NEW.status) THEN
+        SELECT premium_min_balance INTO premium_min FROM settings WHERE id = 1;
+        UPDATE bank_totals
+        SET total_debt = total_debt
+                + IF(NEW.status = 'active', NEW.balance, 0)
+                - IF(OLD.status = 'active', OLD.balance, 0),
+            active_accounts = active_accounts
+                + (NEW.status = 'active') - (OLD.status = 'active'),
+            premium_accounts = premium_accounts
+                + (NEW.status = 'active' AND NEW.balance >= premium_min)
+                - (OLD.status = 'active' AND OLD.balance >= premium_min)
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER accounts_totals_delete
+AFTER DELETE ON accounts
+FOR EACH ROW
+BEGIN
+    DECLARE premium_min DECIMAL(20, 2) DEFAULT 1000000000.00;
+    IF OLD.status = 'active' THEN
+        SELECT premium_min_balance INTO premium_min FROM settings WHERE id = 1;
+        UPDATE bank_totals
+        SET total_debt = total_debt - OLD.balance,
+            active_accounts = active_accounts - 1,
+            premium_accounts = premium_accounts - (OLD.balance >= premium_min)
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER settings_totals_update
+AFTER UPDATE ON settings
+FOR EACH ROW
+BEGIN
+    IF NEW.id = 1 AND NOT (OLD.premium_min_balance <=> NEW.premium_min_balance) THEN
+        UPDATE bank_totals SET premium_accounts = 0;
+        UPDATE bank_totals
+        SET premium_accounts = (SELECT COUNT(*) FROM accounts
+                                WHERE status = 'active' AND balance >= NEW.premium_min_balance)
+        WHERE slot = 0;
+    END IF;
+END//
+
+CREATE TRIGGER races_totals_insert
+AFTER INSERT ON horse_races
+FOR EACH ROW
+BEGIN
+    IF NEW.ends_at IS NULL THEN
+        UPDATE bank_totals
+        SET open_races = open_races + 1,
+            open_prize_pools = open_prize_pools + NEW.prize_pool
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER races_totals_update
+AFTER UPDATE ON horse_races
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.prize_pool <=> NEW.prize_pool AND (OLD.ends_at IS NULL) = (NEW.ends_at IS NULL)) THEN
+        UPDATE bank_totals
+        SET open_races = open_races + (NEW.ends_at IS NULL) - (OLD.ends_at IS NULL),
+            open_prize_pools = open_prize_pools
+                + IF(NEW.ends_at IS NULL, NEW.prize_pool, 0)
+                - IF(OLD.ends_at IS NULL, OLD.prize_pool, 0)
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER races_totals_delete
+AFTER DELETE ON horse_races
+FOR EACH ROW
+BEGIN
+    IF OLD.ends_at IS NULL THEN
+        UPDATE bank_totals
+        SET open_races = open_races - 1,
+            open_prize_pools = open_prize_pools - OLD.prize_pool
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+DELIMITER ;
+
+-- Backfill (writes that land between here and the triggers above are
+-- caught by the next reconcile)
+UPDATE bank_totals t
+JOIN (
+    SELECT COALESCE(SUM(a.balance), 0) AS total_debt,
+           COUNT(*) AS active_accounts,
+           COALESCE(SUM(a.balance >= COALESCE(s.premium_min_balance, 1000000000.00)), 0) AS premium_accounts
+    FROM accounts a
+    LEFT JOIN settings s ON s.id = 1
+    WHERE a.status = 'active'
+) acc
+JOIN (
+    SELECT COUNT(*) AS open_races, COALESCE(SUM(prize_pool), 0) AS open_prize_pools
+    FROM horse_races WHERE ends_at IS NULL
+) r
+SET t.total_debt = acc.total_debt,
+    t.active_accounts = acc.active_accounts,
+    t.premium_accounts = acc.premium_accounts,
+    t.open_races = r.open_races,
+    t.open_prize_pools = r.open_prize_pools
+WHERE t.slot = 0;
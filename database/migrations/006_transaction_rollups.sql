@@ -0,0 +1,47 @@
+-- 006: hourly and daily rollups of the ledger for charts, filled in
+-- incrementally by scripts/rollup_transactions.py and served by
+-- /api/series/{bank|player}. Only buckets with transactions have rows;
+-- a chart carries close_balance / ledger_total forward across gaps.
+--
+-- rollup_state.last_txn_id is the watermark: every transaction with
+-- id <= it is counted exactly once, because each chunk's upserts and the
+-- watermark move commit together. ledger_total is SUM(effective_delta)
+-- over those transactions, i.e. every balance per the ledger, closed
+-- accounts included.
+
+CREATE TABLE account_rollups (
+    account_id BIGINT NOT NULL,
+    bucket ENUM('hour', 'day') NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    txns INT NOT NULL,
+    net_delta DECIMAL(24, 2) NOT NULL,
+    inflow DECIMAL(24, 2) NOT NULL,
+    outflow DECIMAL(24, 2) NOT NULL,
+    close_balance DECIMAL(20, 2) NOT NULL,
+    last_txn_id BIGINT NOT NULL,
+    -- /api/series/player: account_id = ? AND bucket = ? AND bucket_start range
+    PRIMARY KEY (account_id, bucket, bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE bank_rollups (
+    bucket ENUM('hour', 'day') NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    txns INT NOT NULL,
+    net_delta DECIMAL(24, 2) NOT NULL,
+    deposits DECIMAL(24, 2) NOT NULL,
+    payouts DECIMAL(24, 2) NOT NULL,
+    interest DECIMAL(24, 2) NOT NULL,
+    race_winnings DECIMAL(24, 2) NOT NULL,
+    ledger_total DECIMAL(24, 2) NOT NULL,
+    last_txn_id BIGINT NOT NULL,
+    PRIMARY KEY (bucket, bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE rollup_state (
+    id TINYINT NOT NULL PRIMARY KEY,
+    last_txn_id BIGINT NOT NULL DEFAULT 0,
+    ledger_total DECIMAL(24, 2) NOT NULL DEFAULT 0.00,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO rollup_state (id) VALUES (1);
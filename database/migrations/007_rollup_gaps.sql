@@ -0,0 +1,15 @@
+-- 007: late commits for the chart rollups. Ids are handed out at insert
+-- time, so a transaction can commit after a higher id has already been
+-- rolled up. scripts/rollup_transactions.py records every id it passed
+-- over without seeing a row in rollup_gaps and folds the row in on a
+-- later run once it shows up; gaps further than --gap-window ids behind
+-- the watermark are dropped (rolled-back inserts never fill in).
+--
+-- rollup_state.version goes up with every committed chunk or gap fill;
+-- it is what /api/series ETags on.
+
+CREATE TABLE rollup_gaps (
+    txn_id BIGINT NOT NULL PRIMARY KEY
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+ALTER TABLE rollup_state ADD COLUMN version BIGINT NOT NULL DEFAULT 0 AFTER ledger_total;
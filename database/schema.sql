@@ -0,0 +1,340 @@
+-- Factions Bank schema, current as of migration 007.
+-- Fresh install:   mysql factions_bank < database/schema.sql
+-- Existing install: python scripts/migrate.py (an install that predates
+--                   migrations is stamped at 001 first; see --baseline)
+-- Any change here ships as a new database/migrations/NNN_*.sql as well.
+
+CREATE TABLE players (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    ign VARCHAR(32) NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_players_ign (ign)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE accounts (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    player_id BIGINT NOT NULL,
+    status ENUM('active', 'closed') NOT NULL DEFAULT 'active',
+    balance DECIMAL(20, 2) NOT NULL DEFAULT 0.00,
+    last_compounded_at DATETIME NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    closed_at DATETIME NULL,
+    -- player_lookup.lookup / lock_players: a.player_id = p.id AND a.status = 'active'
+    KEY idx_accounts_player_status (player_id, status),
+    -- /api/players ORDER BY balance DESC, player_id DESC (+ keyset), covering;
+    -- also SUM(balance) WHERE status='active'
+    KEY idx_accounts_status_balance (status, balance, player_id, last_compounded_at),
+    CONSTRAINT fk_accounts_player FOREIGN KEY (player_id) REFERENCES players (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- effective_delta / balance_after are set by transactions_before_insert
+CREATE TABLE transactions (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    account_id BIGINT NOT NULL,
+    txn_type ENUM('deposit', 'payout', 'interest', 'horse_race_win') NOT NULL,
+    amount DECIMAL(20, 2) NOT NULL,
+    fee_pct DECIMAL(9, 6) NULL,
+    effective_delta DECIMAL(20, 2) NOT NULL DEFAULT 0.00,
+    balance_after DECIMAL(20, 2) NOT NULL DEFAULT 0.00,
+    note VARCHAR(255) NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_transactions_account FOREIGN KEY (account_id) REFERENCES accounts (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Singleton rows (id=1); rates are fractions per period (hour)
+CREATE TABLE settings (
+    id TINYINT NOT NULL PRIMARY KEY,
+    payout_fee_pct DECIMAL(9, 6) NOT NULL DEFAULT 0.070000,
+    interest_rate_per_period DECIMAL(12, 8) NOT NULL DEFAULT 0.05000000,
+    premium_interest_rate_per_period DECIMAL(12, 8) NOT NULL DEFAULT 0.06000000,
+    premium_min_balance DECIMAL(20, 2) NOT NULL DEFAULT 1000000000.00,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE interest_rate_history (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    normal_rate DECIMAL(12, 8) NOT NULL,
+    premium_rate DECIMAL(12, 8) NOT NULL,
+    premium_min_balance DECIMAL(20, 2) NOT NULL,
+    -- /api/interest/history ORDER BY changed_at LIMIT n
+    KEY idx_rate_history_changed (changed_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Percentages here are whole percents (50.00 = half the pool)
+CREATE TABLE horse_race_settings (
+    id TINYINT NOT NULL PRIMARY KEY,
+    winner_cut_pct DECIMAL(5, 2) NOT NULL DEFAULT 50.00,
+    second_cut_pct DECIMAL(5, 2) NOT NULL DEFAULT 30.00,
+    third_cut_pct DECIMAL(5, 2) NOT NULL DEFAULT 20.00,
+    entry_fee DECIMAL(20, 2) NOT NULL DEFAULT 100.00,
+    imperial_cut_pct DECIMAL(5, 2) NOT NULL DEFAULT 10.00,
+    rules TEXT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE horse_races (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(128) NULL,
+    race_name VARCHAR(128) NULL,
+    prize_pool DECIMAL(20, 2) NOT NULL DEFAULT 0.00,
+    starts_at DATETIME NULL,
+    ends_at DATETIME NULL,
+    winner1_id BIGINT NULL,
+    winner2_id BIGINT NULL,
+    winner3_id BIGINT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- latest_active_race: WHERE ends_at IS NULL ORDER BY id DESC LIMIT 1
+    KEY idx_races_open (ends_at, id),
+    CONSTRAINT fk_races_winner1 FOREIGN KEY (winner1_id) REFERENCES players (id),
+    CONSTRAINT fk_races_winner2 FOREIGN KEY (winner2_id) REFERENCES players (id),
+    CONSTRAINT fk_races_winner3 FOREIGN KEY (winner3_id) REFERENCES players (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE horse_jockeys (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    race_id BIGINT NOT NULL,
+    player_id BIGINT NOT NULL,
+    joined_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- one entry per player per race; also answers jockey_ids()
+    UNIQUE KEY uq_jockeys_race_player (race_id, player_id),
+    -- load_races: race_id IN (...) ORDER BY race_id, joined_at, id
+    KEY idx_jockeys_race_joined (race_id, joined_at),
+    CONSTRAINT fk_jockeys_race FOREIGN KEY (race_id) REFERENCES horse_races (id),
+    CONSTRAINT fk_jockeys_player FOREIGN KEY (player_id) REFERENCES players (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- scripts/hourly_interest.py checkpoints
+CREATE TABLE interest_runs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    status ENUM('running', 'done') NOT NULL DEFAULT 'running',
+    as_of DATETIME NOT NULL,
+    min_id BIGINT NOT NULL,
+    max_id BIGINT NOT NULL,
+    chunk_size INT NOT NULL,
+    normal_rate DECIMAL(12, 8) NOT NULL,
+    premium_rate DECIMAL(12, 8) NOT NULL,
+    premium_min_balance DECIMAL(20, 2) NOT NULL,
+    started_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME NULL,
+    KEY idx_interest_runs_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE interest_run_shards (
+    run_id BIGINT NOT NULL,
+    lo BIGINT NOT NULL,
+    hi BIGINT NOT NULL,
+    accounts INT NOT NULL,
+    interest DECIMAL(20, 2) NOT NULL,
+    finished_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, lo)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Dashboard totals, summed over 32 trigger-maintained slots: see
+-- migrations/005_bank_totals.sql and scripts/reconcile_totals.py
+CREATE TABLE bank_totals (
+    slot TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+    total_debt DECIMAL(24, 2) NOT NULL DEFAULT 0.00,
+    active_accounts INT NOT NULL DEFAULT 0,
+    premium_accounts INT NOT NULL DEFAULT 0,
+    open_races INT NOT NULL DEFAULT 0,
+    open_prize_pools DECIMAL(24, 2) NOT NULL DEFAULT 0.00
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Chart rollups, filled in by scripts/rollup_transactions.py: see
+-- migrations/006_transaction_rollups.sql and 007_rollup_gaps.sql
+CREATE TABLE account_rollups (
+    account_id BIGINT NOT NULL,
+    bucket ENUM('hour', 'day') NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    txns INT NOT NULL,
+    net_delta DECIMAL(24, 2) NOT NULL,
+    inflow DECIMAL(24, 2) NOT NULL,
+    outflow DECIMAL(24, 2) NOT NULL,
+    close_balance DECIMAL(20, 2) NOT NULL,
+    last_txn_id BIGINT NOT NULL,
+    -- /api/series/player: account_id = ? AND bucket = ? AND bucket_start range
+    PRIMARY KEY (account_id, bucket, bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE bank_rollups (
+    bucket ENUM('hour', 'day') NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    txns INT NOT NULL,
+    net_delta DECIMAL(24, 2) NOT NULL,
+    deposits DECIMAL(24, 2) NOT NULL,
+    payouts DECIMAL(24, 2) NOT NULL,
+    interest DECIMAL(24, 2) NOT NULL,
+    race_winnings DECIMAL(24, 2) NOT NULL,
+    ledger_total DECIMAL(24, 2) NOT NULL,
+    last_txn_id BIGINT NOT NULL,
+    PRIMARY KEY (bucket, bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE rollup_state (
+    id TINYINT NOT NULL PRIMARY KEY,
+    last_txn_id BIGINT NOT NULL DEFAULT 0,
+    ledger_total DECIMAL(24, 2) NOT NULL DEFAULT 0.00,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE rollup_gaps (
+    txn_id BIGINT NOT NULL PRIMARY KEY
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Balances follow the ledger: see migrations/002_transactions_trigger.sql
+DELIMITER //
+
+CREATE TRIGGER transactions_before_insert
+BEFORE INSERT ON transactions
+FOR EACH ROW
+BEGIN
+    DECLARE bal DECIMAL(20, 2);
+    IF @bank_skip_balance_trigger IS NULL THEN
+        SELECT balance INTO bal FROM accounts WHERE id = NEW.account_id FOR UPDATE;
+        IF bal IS NULL THEN
+            SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'transactions.account_id has no account';
+        END IF;
+        SET NEW.effective_delta = CASE NEW.txn_type
+            WHEN 'payout' THEN -(NEW.amount + ROUND(NEW.amount * COALESCE(NEW.fee_pct, 0), 2))
+            ELSE NEW.amount
+        END;
+        SET NEW.balance_after = bal + NEW.effective_delta;
+    END IF;
+END//
+
+CREATE TRIGGER transactions_after_insert
+AFTER INSERT ON transactions
+FOR EACH ROW
+BEGIN
+    IF @bank_skip_balance_trigger IS NULL THEN
+        UPDATE accounts SET balance = NEW.balance_after WHERE id = NEW.account_id;
+    END IF;
+END//
+
+CREATE TRIGGER accounts_totals_insert
+AFTER INSERT ON accounts
+FOR EACH ROW
+BEGIN
+    DECLARE premium_min DECIMAL(20, 2) DEFAULT 1000000000.00;
+    IF NEW.status = 'active' THEN
+        SELECT premium_min_balance INTO premium_min FROM settings WHERE id = 1;
+        UPDATE bank_totals
+        SET total_debt = total_debt + NEW.balance,
+            active_accounts = active_accounts + 1,
+            premium_accounts = premium_accounts + (NEW.balance >= premium_min)
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER accounts_totals_update
+AFTER UPDATE ON accounts
+FOR EACH ROW
+BEGIN
+    DECLARE premium_min DECIMAL(20, 2) DEFAULT 1000000000.00;
+    IF NOT (OLD.balance <=> NEW.balance AND OLD.status <=> NEW.status) THEN
+        SELECT premium_min_balance INTO premium_min FROM settings WHERE id = 1;
+        UPDATE bank_totals
+        SET total_debt = total_debt
+                + IF(NEW.status = 'active', NEW.balance, 0)
+                - IF(OLD.status = 'active', OLD.balance, 0),
+            active_accounts = active_accounts
+                + (NEW.status = 'active') - (OLD.status = 'active'),
+            premium_accounts = premium_accounts
+                + (NEW.status = 'active' AND NEW.balance >= premium_min)
+                - (OLD.status = 'active' AND OLD.balance >= premium_min)
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER accounts_totals_delete
+AFTER DELETE ON accounts
+FOR EACH ROW
+BEGIN
+    DECLARE premium_min DECIMAL(20, 2) DEFAULT 1000000000.00;
+    IF OLD.status = 'active' THEN
+        SELECT premium_min_balance INTO premium_min FROM settings WHERE id = 1;
+        UPDATE bank_totals
+        SET total_debt = total_debt - OLD.balance,
+            active_accounts = active_accounts - 1,
+            premium_accounts = premium_accounts - (OLD.balance >= premium_min)
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER settings_totals_update
+AFTER UPDATE ON settings
+FOR EACH ROW
+BEGIN
+    IF NEW.id = 1 AND NOT (OLD.premium_min_balance <=> NEW.premium_min_balance) THEN
+        UPDATE bank_totals SET premium_accounts = 0;
+        UPDATE bank_totals
+        SET premium_accounts = (SELECT COUNT(*) FROM accounts
+                                WHERE status = 'active' AND balance >= NEW.premium_min_balance)
+        WHERE slot = 0;
+    END IF;
+END//
+
+CREATE TRIGGER races_totals_insert
+AFTER INSERT ON horse_races
+FOR EACH ROW
+BEGIN
+    IF NEW.ends_at IS NULL THEN
+        UPDATE bank_totals
+        SET open_races = open_races + 1,
+            open_prize_pools = open_prize_pools + NEW.prize_pool
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER races_totals_update
+AFTER UPDATE ON horse_races
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.prize_pool <=> NEW.prize_pool AND (OLD.ends_at IS NULL) = (NEW.ends_at IS NULL)) THEN
+        UPDATE bank_totals
+        SET open_races = open_races + (NEW.ends_at IS NULL) - (OLD.ends_at IS NULL),
+            open_prize_pools = open_prize_pools
+                + IF(NEW.ends_at IS NULL, NEW.prize_pool, 0)
+                - IF(OLD.ends_at IS NULL, OLD.prize_pool, 0)
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+CREATE TRIGGER races_totals_delete
+AFTER DELETE ON horse_races
+FOR EACH ROW
+BEGIN
+    IF OLD.ends_at IS NULL THEN
+        UPDATE bank_totals
+        SET open_races = open_races - 1,
+            open_prize_pools = open_prize_pools - OLD.prize_pool
+        WHERE slot = CONNECTION_ID() % 32;
+    END IF;
+END//
+
+DELIMITER ;
+
+INSERT INTO bank_totals (slot) VALUES
+    (0), (1), (2), (3), (4), (5), (6), (7), (8), (9), (10), (11), (12), (13), (14), (15),
+    (16), (17), (18), (19), (20), (21), (22), (23), (24), (25), (26), (27), (28), (29), (30), (31);
+INSERT INTO settings (id) VALUES (1);
+INSERT INTO rollup_state (id) VALUES (1);
+INSERT INTO horse_race_settings (id, rules) VALUES (1, 'No rules set');
+INSERT INTO interest_rate_history (normal_rate, premium_rate, premium_min_balance)
+SELECT interest_rate_per_period, premium_interest_rate_per_period, premium_min_balance
+FROM settings WHERE id = 1;
+
+CREATE TABLE schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(128) NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO schema_migrations (version, name) VALUES
+    (1, 'base_tables'),
+    (2, 'transactions_trigger'),
+    (3, 'hot_query_indexes'),
+    (4, 'interest_job_tables'),
+    (5, 'bank_totals'),
+    (6, 'transaction_rollups'),
+    (7, 'rollup_gaps');
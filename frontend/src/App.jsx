@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { Line } from 'react-chartjs-2';
 import { Chart as ChartJS, LineElement, PointElement, LinearScale, Title, Tooltip, Legend, CategoryScale } from 'chart.js';
@@ -8,6 +8,26 @@ ChartJS.register(LineElement, PointElement, LinearScale, Title, Tooltip, Legend,
 
 // FIX: Set API to use local host/port explicitly, relying on Flask's new CORS setup.
 const API = process.env.REACT_APP_API_URL || 'http://localhost:8085';
+// Most points the interest history chart asks for, however long the history
+const HISTORY_POINTS = 300;
+
+// Last ETag + body per polled URL, so unchanged data comes back as a bodiless 304
+const etagCache = new Map();
+
+const cachedGet = async (url) => {
+  const hit = etagCache.get(url);
+  const res = await axios.get(url, {
+    headers: hit ? { 'If-None-Match': hit.etag } : {},
+    validateStatus: status => (status >= 200 && status < 300) || status === 304
+  });
+  if (res.status === 304 && hit) {
+    return { ...res, data: hit.data };
+  }
+  if (res.headers.etag) {
+    etagCache.set(url, { etag: res.headers.etag, data: res.data });
+  }
+  return res;
+};
 
 // --- NEW COMPONENT: Pagination Controls ---
 const PaginationControls = ({ offset, limit, setOffset, totalCount }) => {
@@ -174,6 +194,7 @@ function App() {
   const [players, setPlayers] = useState([]);
   const [txns, setTxns] = useState([]);
   const [search, setSearch] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
   const [settings, setSettings] = useState({});
   const [history, setHistory] = useState([]);
   const [races, setRaces] = useState([]);
@@ -183,24 +204,94 @@ function App() {
   
   // --- NEW STATE FOR PAGINATION ---
   const PLAYER_LIMIT = 15;
-  const [playerTotal, setPlayerTotal] = useState(0); // Assuming the backend doesn't return total count currently
+  const [playerTotal, setPlayerTotal] = useState(0);
   const [playerOffset, setPlayerOffset] = useState(0);
   
   const TXN_LIMIT = 20;
   const [txnOffset, setTxnOffset] = useState(0);
+  const [txnTotal, setTxnTotal] = useState(0);
   // --- END NEW STATE ---
 
+  // Live deltas from /api/stream; while connected, polling drops to a slow resync
+  const [streamLive, setStreamLive] = useState(false);
+  const txnViewRef = useRef({ search, txnOffset });
+  txnViewRef.current = { search, txnOffset };
+  const loadDataRef = useRef(null);
+
 useEffect(() => {
     loadData();
-    const interval = setInterval(loadData, 5000);
+    const interval = setInterval(loadData, streamLive ? 30000 : 5000);
     return () => clearInterval(interval);
-}, [search, view, playerOffset, txnOffset]); // Add pagination state to dependency array
+}, [search, view, playerOffset, txnOffset, streamLive]); // Add pagination state to dependency array
+
+useEffect(() => {
+    if (!search) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    axios.get(`${API}/api/players/suggest?q=${encodeURIComponent(search)}&limit=8`)
+      .then(res => { if (!cancelled) setSuggestions(res.data); })
+      .catch(() => {});
+    return () => { cancelled = true; };
+}, [search]);
+
+useEffect(() => {
+    const es = new EventSource(`${API}/api/stream`);
+    const on = (type, handler) => es.addEventListener(type, e => handler(JSON.parse(e.data)));
+
+    const updateRace = (raceId, update) => {
+      setRaces(prev => prev.map(r => (r.id === raceId ? update(r) : r)));
+      setSelectedRace(prev => (prev && prev.id === raceId ? update(prev) : prev));
+    };
+
+    es.onopen = () => setStreamLive(true);
+    es.onerror = () => setStreamLive(false);
+
+    on('race.created', d => setRaces(prev => [{
+      ...d,
+      prize_pool: 0,
+      ends_at: null,
+      created_at: new Date().toISOString(),
+      status: 'scheduled',
+      jockey_count: 0,
+      jockeys: [],
+      winner1: null,
+      winner2: null,
+      winner3: null
+    }, ...prev]));
+    on('race.enrolled', d => updateRace(d.race_id, r => ({
+      ...r,
+      prize_pool: d.prize_pool,
+      jockeys: [...(r.jockeys || []), d.player],
+      jockey_count: (r.jockey_count || 0) + 1
+    })));
+    on('race.winner_set', d => updateRace(d.race_id, r => ({ ...r, [`winner${d.position}`]: d.player })));
+    on('race.ended', d => updateRace(d.race_id, r => ({ ...r, ends_at: d.ended_at, status: 'finished' })));
+    on('txn.created', d => {
+      const { search: q, txnOffset: off } = txnViewRef.current;
+      // Same substring match as /api/transactions/count?ign=
+      if (q && !d.ign.toLowerCase().includes(q.toLowerCase())) return;
+      setTxnTotal(n => n + 1);
+      if (off === 0) {
+        setTxns(prev => [d, ...prev].slice(0, TXN_LIMIT));
+      }
+    });
+    on('settings.changed', async () => {
+      const res = await cachedGet(`${API}/api/settings`);
+      setSettings(res.data);
+    });
+    // Missed deltas (slow client, another worker, restart): refetch everything
+    on('reset', () => loadDataRef.current());
+
+    return () => es.close();
+}, []);
 
 const loadData = async () => {
     try {
       const requests = [
-        axios.get(`${API}/api/settings`),
-        axios.get(`${API}/api/interest/history`)
+        cachedGet(`${API}/api/settings`),
+        cachedGet(`${API}/api/interest/history?order=desc&bucket=auto&points=${HISTORY_POINTS}`)
       ];
       
       const playerUrl = `${API}/api/players?q=${search}&limit=${PLAYER_LIMIT}&offset=${playerOffset}`;
@@ -210,27 +301,28 @@ const loadData = async () => {
 
       if (view === 'bank') {
         requests.push(
-          axios.get(playerUrl),
-          axios.get(txnUrl),
-          // Fetch all players for a proper total count (Less efficient, but necessary if API lacks count endpoint)
-          axios.get(`${API}/api/players`) 
+          cachedGet(playerUrl),
+          cachedGet(txnUrl),
+          // Totals come from the cached count endpoints instead of downloading every row
+          cachedGet(`${API}/api/players/count?q=${search}`),
+          cachedGet(`${API}/api/transactions/count?ign=${search}`)
         );
       } else {
-        requests.push(axios.get(raceUrl));
+        requests.push(cachedGet(raceUrl));
       }
       
       const responses = await Promise.all(requests);
       
       setSettings(responses[0].data);
       
-      // FIX: Reverse history data here so map functions can display it correctly (latest data first)
-      setHistory(responses[1].data.reverse()); 
+      // Already newest first and downsampled server-side
+      setHistory(responses[1].data);
 
       if (view === 'bank') {
         setPlayers(responses[2].data);
         setTxns(responses[3].data);
-        // Set total count based on the request that fetches ALL players
-        setPlayerTotal(responses[4]?.data?.length || 0);
+        setPlayerTotal(responses[4]?.data?.count || 0);
+        setTxnTotal(responses[5]?.data?.count || 0);
       } else {
         setRaces(responses[2].data);
       }
@@ -241,6 +333,8 @@ const loadData = async () => {
       setLoading(false);
     }
   };
+  loadDataRef.current = loadData;
+
 const formatCurrency = (amount) => {
     return new Intl.NumberFormat('en-US', {
       style: 'currency',
@@ -458,10 +552,14 @@ className="text-xs sm:text-sm text-slate-600 dark:text-slate-400">Active Players
                 type="text"
         
                 placeholder="Search player by name..."
+                list="ign-suggestions"
                 value={search}
                 onChange={e => setSearch(e.target.value)}
                 className="w-full pl-10 pr-4 py-3 rounded-xl border-2 border-slate-300 dark:border-slate-600 bg-white dark:bg-slate-800 text-slate-900 dark:text-slate-100 focus:ring-2 focus:ring-blue-500 focus:border-transparent transition-all"
               />
+              <datalist id="ign-suggestions">
+                {suggestions.map(ign => <option key={ign} value={ign} />)}
+              </datalist>
           
     </div>
           </div>
@@ -557,7 +655,7 @@ from-blue-500 to-purple-600 rounded-full flex items-center justify-center text-w
               <h3 className="text-xl font-bold mb-4 flex items-center gap-2">
                 <Activity className="w-6 h-6 text-green-600" />
        
-                Recent Transactions ({txns.length})
+                Recent Transactions ({txnTotal})
               </h3>
               <div className="overflow-x-auto">
                 <table className="w-full">
@@ -611,13 +709,11 @@ from-blue-500 to-purple-600 rounded-full flex items-center justify-center text-w
                   </tbody>
                 </table>
               </div>
-              {/* NOTE: Total count for transactions is not exposed by the API yet, 
-                     but pagination is implemented using the limit/offset structure */}
                <PaginationControls 
                 offset={txnOffset} 
                 limit={TXN_LIMIT} 
                 setOffset={setTxnOffset} 
-                totalCount={txns.length + txnOffset + (txns.length < TXN_LIMIT ? 0 : 1)}
+                totalCount={txnTotal}
               />
           </div>
 
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Race API JSON comparison
+Fetches the read-only race endpoints from one deployment and checks that
+another (or a saved snapshot) answers with identical JSON. Run it around a
+refactor of the race routes:
+
+    python scripts/compare_race_json.py --url http://127.0.0.1:8085 --save before.json
+    ... deploy the change ...
+    python scripts/compare_race_json.py --url http://127.0.0.1:8085 --check before.json
+
+or compare two servers side by side against the same database:
+
+    python scripts/compare_race_json.py --url http://old:8085 --against http://new:8085
+
+Write endpoints are not exercised; enrol/settle a scratch race with
+scripts/enroll_load_test.py on both and compare afterwards.
+"""
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.request
+
+PATHS = [
+    "/api/races",
+    "/api/races/info",
+    "/api/settings",
+]
+
+
+def fetch(base, path):
+    try:
+        with urllib.request.urlopen(base + path, timeout=30) as r:
+            return {"status": r.status, "body": json.loads(r.read())}
+    except urllib.error.HTTPError as e:
+        return {"status": e.code, "body": json.loads(e.read() or b"null")}
+
+
+def snapshot(base, paths):
+    return {path: fetch(base, path) for path in paths}
+
+
+def diff(a, b, path=""):
+    """Yield (json_path, left, right) for every differing leaf"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        for k in sorted(set(a) | set(b)):
+            yield from diff(a.get(k, "<missing>"), b.get(k, "<missing>"), f"{path}.{k}")
+    elif isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            yield f"{path}[len]", len(a), len(b)
+        for i, (x, y) in enumerate(zip(a, b)):
+            yield from diff(x, y, f"{path}[{i}]")
+    elif a != b:
+        yield path or ".", a, b
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Compare race endpoint JSON")
+    p.add_argument("--url", required=True)
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument("--save", help="write a snapshot of --url to this file")
+    group.add_argument("--check", help="compare --url against a saved snapshot")
+    group.add_argument("--against", help="compare --url against another server")
+    p.add_argument("--path", action="append", default=[],
+                   help="extra GET path to include (repeatable)")
+    args = p.parse_args(argv)
+
+    paths = PATHS + args.path
+    current = snapshot(args.url, paths)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"💾 Saved {len(paths)} responses to {args.save}")
+        return
+
+    if args.check:
+        with open(args.check) as f:
+            reference = json.load(f)
+    else:
+        reference = snapshot(args.against, paths)
+
+    failures = 0
+    for path in paths:
+        if path not in reference:
+            print(f"⚠️  {path}: not in reference")
+            continue
+        changes = list(diff(reference[path], current[path]))
+        if changes:
+            failures += 1
+            print(f"❌ {path}: {len(changes)} difference(s)")
+            for where, old, new in changes[:20]:
+                print(f"   {where}: {old!r} -> {new!r}")
+        else:
+            print(f"✅ {path}: identical")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
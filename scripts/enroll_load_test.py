@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Concurrent race-enrolment load test
+Opens a fresh race, fires every player's enrolment at once (each player
+twice, to provoke double-enrolment), then checks the race against what the
+API said it accepted:
+    jockey_count == successful enrolments
+    prize_pool   == successes * (entry_fee - imperial cut)
+and reports enrolments/second and latency percentiles.
+
+Players need an active account holding at least the entry fee. By default
+the top --players accounts from /api/players are used.
+
+Usage:
+    python scripts/enroll_load_test.py --url http://127.0.0.1:8085 --key $BANK_API_KEY \\
+        --players 50 --concurrency 50
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+
+def call(base, path, key=None, body=None):
+    req = urllib.request.Request(base + path, method="POST" if body is not None else "GET")
+    req.add_header("Content-Type", "application/json")
+    if key:
+        req.add_header("X-API-Key", key)
+    data = json.dumps(body).encode() if body is not None else None
+    try:
+        with urllib.request.urlopen(req, data, timeout=30) as r:
+            return r.status, json.loads(r.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Concurrent enrolment load test")
+    p.add_argument("--url", default=os.getenv("BANK_API_URL", "http://127.0.0.1:8085"))
+    p.add_argument("--key", default=os.getenv("BANK_API_KEY"))
+    p.add_argument("--players", type=int, default=50, help="distinct players to enrol")
+    p.add_argument("--player-names", help="comma-separated IGNs instead of the top N")
+    p.add_argument("--concurrency", type=int, default=50)
+    p.add_argument("--end", action="store_true",
+                   help="set winner1 and end the race afterwards")
+    args = p.parse_args(argv)
+    if not args.key:
+        sys.exit("❌ --key or BANK_API_KEY is required")
+
+    if args.player_names:
+        names = [n.strip() for n in args.player_names.split(",") if n.strip()]
+    else:
+        _, players = call(args.url, f"/api/players?limit={args.players}")
+        names = [pl['ign'] for pl in players]
+    if not names:
+        sys.exit("❌ no players to enrol")
+
+    _, settings = call(args.url, "/api/settings")
+    entry_fee = settings['horse_race']['entry_fee']
+    contribution = entry_fee - entry_fee * settings['horse_race']['imperial_cut'] / 100
+
+    starts_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    status, race = call(args.url, "/api/races/new", args.key,
+                        {"name": f"Load test {datetime.now():%H:%M:%S}", "starts_at": starts_at})
+    if status != 200:
+        sys.exit(f"❌ could not create race: {race}")
+    print(f"🏇 Race {race['race_id']}: {len(names)} players x2, concurrency {args.concurrency}")
+
+    lock = threading.Lock()
+    latencies, outcomes = [], {}
+    barrier = threading.Barrier(min(args.concurrency, len(names) * 2))
+
+    def enroll(name):
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        t0 = time.monotonic()
+        status, body = call(args.url, "/api/races/enroll", args.key, {"player_name": name})
+        dt = time.monotonic() - t0
+        with lock:
+            latencies.append(dt)
+            outcomes.setdefault(name, []).append((status, body))
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(enroll, names + names))
+    elapsed = time.monotonic() - started
+
+    ok = {n for n, res in outcomes.items() if any(s == 200 for s, _ in res)}
+    doubles = [n for n, res in outcomes.items() if sum(s == 200 for s, _ in res) > 1]
+    errors = [(n, s, b) for n, res in outcomes.items() for s, b in res
+              if s not in (200, 400)]
+
+    _, info = call(args.url, "/api/races/info")
+    expected_pool = len(ok) * contribution
+    checks = {
+        "latest race is ours": info.get("race_id") == race['race_id'],
+        "no double enrolment": not doubles,
+        "jockey_count matches": info.get("jockey_count") == len(ok),
+        "prize_pool matches": abs(info.get("prize_pool", -1) - expected_pool) < 0.01 * max(1, len(ok)),
+        "no server errors": not errors,
+    }
+
+    print(json.dumps({
+        "requests": len(latencies),
+        "enrolled": len(ok),
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "prize_pool": info.get("prize_pool"),
+        "expected_prize_pool": round(expected_pool, 2),
+        "checks": checks,
+    }, indent=2))
+    for n, s, b in errors[:10]:
+        print(f"❌ {n}: {s} {b}")
+
+    if args.end and ok:
+        call(args.url, "/api/races/winner1", args.key, {"player_name": sorted(ok)[0]})
+        call(args.url, "/api/races/end", args.key, {})
+        print(f"🏁 Race {race['race_id']} ended")
+
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check
+Builds a scratch database from database/migrations, seeds it with enough
+rows for the optimizer to behave like production, drives every API route
+through Flask's test client while recording each SQL statement the backend
+executes, then EXPLAINs them all. Fails (exit 1) when a plan does a full
+table or index scan or a filesort over more than --max-rows estimated
+rows, or when a statement can't be EXPLAINed at all.
+
+Needs a local MySQL 8 / MariaDB 10.5+ user that may create and drop the
+scratch database:
+
+    BANK_DB_USER=root BANK_DB_PASS=... python scripts/explain_check.py
+    python scripts/explain_check.py --players 50000 --transactions 500000 --keep
+
+Every .execute() call site in the backend modules listed in SOURCES is
+expected to be exercised; unexercised sites are reported, and --strict
+makes them fail the run too. Statements whose scans are understood and
+accepted are listed in EXPECTED_SCANS with the reason.
+"""
+import argparse
+import ast
+import os
+import random
+import re
+import sys
+import traceback
+
+import pymysql
+import pymysql.cursors
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.normpath(os.path.join(HERE, "..", "backend"))
+sys.path.insert(0, HERE)
+import migrate  # noqa: E402
+
+SOURCES = ["app.py", "horse_races.py", "settings_cache.py", "player_lookup.py", "data_version.py",
+           "leaderboard.py", "ign_index.py", "bank_totals.py", "ledger_export.py", "replicas.py"]
+
+# (regex searched in the statement, why a scan there is accepted)
+EXPECTED_SCANS = [
+    (r"p\.ign LIKE", "substring search (?q= / ?ign=) has a leading wildcard; no B-tree index can serve it"),
+    (r"^SELECT id, ign FROM players$", "ign_index's full load reads every IGN, once per process or invalidate()"),
+]
+
+SKIP_PREFIXES = ("INSERT INTO", "SET ", "SELECT 1", "SELECT NOW()", "COMMIT", "ROLLBACK", "SHOW ")
+
+
+# -------------------- SCRATCH DATABASE --------------------
+def build_database(name, players, transactions, races, seed=7):
+    rnd = random.Random(seed)
+    with migrate.connect(database=None) as cx:
+        with cx.cursor() as c:
+            c.execute(f"DROP DATABASE IF EXISTS `{name}`")
+            c.execute(f"CREATE DATABASE `{name}`")
+    with migrate.connect(database=name) as cx:
+        migrate.migrate(cx, verbose=False)
+        with cx.cursor() as c:
+            c.execute("SET @bank_skip_balance_trigger = 1")
+            _bulk(c, "players (id, ign)",
+                  [(i, f"player{i:06d}") for i in range(1, players + 1)])
+            _bulk(c, "accounts (id, player_id, status, balance, last_compounded_at)",
+                  [(i, i, "closed" if i % 10 == 0 else "active",
+                    round(rnd.lognormvariate(8, 2), 2), "2024-01-01 00:00:00")
+                   for i in range(1, players + 1)])
+            types = ["deposit", "payout", "interest", "horse_race_win"]
+            _bulk(c, "transactions (account_id, txn_type, amount, effective_delta, balance_after, note)",
+                  [(rnd.randint(1, players), t, 10, 10, 1000, "seed")
+                   for t in (rnd.choice(types) for _ in range(transactions))])
+            _bulk(c, "horse_races (id, name, prize_pool, starts_at, ends_at, winner1_id)",
+                  [(i, f"Race {i}", 1000, "2024-01-01 00:00:00", "2024-01-01 01:00:00", i)
+                   for i in range(1, races + 1)])
+            jockeys = []
+            for race in range(1, races + 1):
+                for player in rnd.sample(range(1, players + 1), min(20, players)):
+                    jockeys.append((race, player))
+            _bulk(c, "horse_jockeys (race_id, player_id)", jockeys)
+            _bulk(c, "interest_rate_history (changed_at, normal_rate, premium_rate, premium_min_balance)",
+                  [(f"2024-01-{1 + i % 28:02d} {i % 24:02d}:00:00", 0.05, 0.06, 1e9) for i in range(500)])
+            for table in ("players", "accounts", "transactions", "horse_races",
+                          "horse_jockeys", "interest_rate_history"):
+                c.execute(f"ANALYZE TABLE {table}")
+                c.fetchall()
+
+
+def _bulk(c, target, rows, batch=2000):
+    if not rows:
+        return
+    width = len(rows[0])
+    for i in range(0, len(rows), batch):
+        chunk = rows[i:i + batch]
+        values = ", ".join(["(" + ", ".join(["%s"] * width) + ")"] * len(chunk))
+        c.execute(f"INSERT INTO {target} VALUES {values}", [v for row in chunk for v in row])
+
+
+# -------------------- STATEMENT CAPTURE --------------------
+class Recorder:
+    def __init__(self):
+        self.statements = {}  # normalized sql -> (sql, site)
+        self.sites = set()
+
+    def install(self):
+        original = pymysql.cursors.Cursor.execute
+        recorder = self
+
+        def execute(cursor, query, args=None):
+            site = recorder._site()
+            if site:
+                recorder.sites.add(site)
+                sql = cursor.mogrify(query, args)
+                key = " ".join(query.split())
+                recorder.statements.setdefault(key, (sql, site))
+            return original(cursor, query, args)
+
+        pymysql.cursors.Cursor.execute = execute
+
+    @staticmethod
+    def _site():
+        for frame in reversed(traceback.extract_stack()[:-2]):
+            path = os.path.normpath(frame.filename)
+            if os.path.dirname(path) == BACKEND and os.path.basename(path) != "metrics.py":
+                return os.path.basename(path), frame.lineno
+        return None
+
+
+def execute_sites():
+    """{(file, first_line, last_line)} of every .execute(...) call in SOURCES"""
+    sites = set()
+    for name in SOURCES:
+        with open(os.path.join(BACKEND, name)) as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr == "execute"):
+                sites.add((name, node.lineno, node.end_lineno))
+    return sites
+
+
+# -------------------- ROUTES --------------------
+def drive(app_module):
+    cl = app_module.app.test_client()
+    key = {"X-API-Key": app_module.API_KEY}
+
+    def get(path):
+        r = cl.get(path)
+        assert r.status_code in (200, 404), f"GET {path} -> {r.status_code} {r.get_data(as_text=True)[:200]}"
+        return r.get_json()
+
+    def download(path):
+        r = cl.get(path)
+        body = r.get_data()  # drains the streamed export
+        assert r.status_code == 200, f"GET {path} -> {r.status_code} {body[:200]}"
+
+    def post(path, body=None):
+        r = cl.post(path, json=body or {}, headers=key)
+        assert r.status_code < 500, f"POST {path} -> {r.status_code} {r.get_data(as_text=True)[:200]}"
+        return r.get_json()
+
+    get("/healthz")
+    get("/api/players")
+    get("/api/players?q=player0001")
+    get("/api/players?q=pla")  # too broad for the IGN index: LIKE fallback
+    get("/api/players/suggest?q=player00012")
+    first = get("/api/players?cursor=&limit=50")
+    get(f"/api/players?cursor={first['next_cursor']}&limit=50")
+    get("/api/players?cursor=&q=player0002")
+    get("/api/players/count")
+    get("/api/players/rank?ign=player000042")
+    get("/api/players/count?q=player0003")
+    get("/api/transactions")
+    get("/api/transactions?ign=player0004")
+    first = get("/api/transactions?cursor=&limit=50")
+    get(f"/api/transactions?cursor={first['next_cursor']}&limit=50")
+    get("/api/transactions/count")
+    get("/api/transactions/count?ign=player0005")
+    download("/api/transactions/export")
+    download("/api/transactions/export?format=csv&ign=player000042&from=2024-01-01")
+    get("/api/settings")
+    get("/api/interest/history")
+    get("/api/interest/history?from=2024-01-10&order=desc&limit=50")
+    get("/api/interest/history?bucket=day&from=2024-01-01&to=2024-02-01")
+    get("/api/interest/history?bucket=auto&points=100&order=desc")
+    get("/api/series/bank?bucket=day&from=2024-01-01")
+    get("/api/series/player?ign=player000042&bucket=hour&from=2024-01-01")
+    get("/api/races")
+    get("/api/races/info")
+
+    post("/api/races/new", {"name": "Explain", "starts_at": "2030-01-01T00:00:00Z"})
+    post("/api/races/enroll", {"player_name": "player000001"})
+    post("/api/races/enroll", {"player_name": "player000001"})
+    post("/api/races/enroll/batch", {"player_names": [f"player{i:06d}" for i in range(2, 8)]})
+    post("/api/races/winner1", {"player_name": "player000001"})
+    post("/api/races/settle", {"winner1": "player000001", "winner2": "player000002",
+                               "winner3": "player000003", "end": True})
+    post("/api/races/new", {"name": "Explain 2", "starts_at": "2030-01-01T00:00:00Z"})
+    post("/api/races/enroll", {"player_name": "player000011"})
+    post("/api/races/winner1", {"player_name": "player000011"})
+    post("/api/races/end")
+    get("/api/players")  # leaderboard: incremental refresh after the writes
+    post("/api/players/invalidate", {"ign": "player000001"})
+    get("/api/players?q=player0001")  # IGN index: incremental sync; leaderboard: reload
+    post("/api/settings/invalidate")
+    get("/api/stats")
+
+    # scripts/reconcile_totals.py --fix, against a deliberately skewed slot
+    with app_module.db_primary() as cx:
+        with cx.cursor() as c:
+            c.execute("UPDATE bank_totals SET active_accounts = active_accounts + 1 WHERE slot = 0")
+            app_module.bank_totals.reconcile(c, fix=True)
+        cx.commit()
+
+
+# -------------------- EXPLAIN --------------------
+def check_plan(c, sql, max_rows):
+    """Return (problems, plan rows); problems are human-readable strings"""
+    c.execute("EXPLAIN " + sql)
+    plan = c.fetchall()
+    problems = []
+    for step in plan:
+        rows = int(step.get('rows') or 0)
+        extra = step.get('Extra') or ""
+        if rows <= max_rows:
+            continue
+        if step.get('type') == "ALL":
+            problems.append(f"full scan of {step.get('table')} (~{rows} rows)")
+        elif step.get('type') == "index":
+            problems.append(f"full index scan of {step.get('table')} (~{rows} rows)")
+        if "Using filesort" in extra:
+            problems.append(f"filesort on {step.get('table')} (~{rows} rows)")
+    return problems, plan
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="EXPLAIN every backend SQL statement")
+    p.add_argument("--database", default="factions_bank_explain",
+                   help="scratch database to (re)create (default factions_bank_explain)")
+    p.add_argument("--players", type=int, default=20000)
+    p.add_argument("--transactions", type=int, default=100000)
+    p.add_argument("--races", type=int, default=300)
+    p.add_argument("--max-rows", type=int, default=1000,
+                   help="estimated rows a full table/index scan or filesort may touch "
+                        "(default 1000)")
+    p.add_argument("--strict", action="store_true", help="fail on unexercised execute() sites")
+    p.add_argument("--keep", action="store_true", help="don't drop the scratch database")
+    args = p.parse_args(argv)
+
+    print(f"🧱 Building {args.database}: {args.players} players, "
+          f"{args.transactions} transactions, {args.races} races")
+    build_database(args.database, args.players, args.transactions, args.races)
+
+    recorder = Recorder()
+    recorder.install()
+    os.environ["BANK_DB_NAME"] = args.database
+    # The primary doubles as a read replica, so db_read() and the replica
+    # health check run too (a server that isn't a replica counts as healthy)
+    os.environ.setdefault("BANK_DB_REPLICAS", migrate.DB_HOST)
+    sys.path.insert(0, BACKEND)
+    import app as app_module
+    failures = 0
+    try:
+        drive(app_module)
+
+        with migrate.connect(database=args.database) as cx:
+            with cx.cursor() as c:
+                for key, (sql, (filename, line)) in sorted(recorder.statements.items(),
+                                                          key=lambda kv: kv[1][1]):
+                    if key.upper().startswith(SKIP_PREFIXES) and "SELECT" not in key.upper()[6:]:
+                        continue
+                    try:
+                        problems, _ = check_plan(c, sql, args.max_rows)
+                    except pymysql.err.MySQLError as e:
+                        # An unchecked statement is not a passing one
+                        failures += 1
+                        print(f"❌ {filename}:{line} could not EXPLAIN: {e}")
+                        continue
+                    accepted = [why for pattern, why in EXPECTED_SCANS if re.search(pattern, key)]
+                    label = f"{filename}:{line}  {key[:90]}"
+                    if problems and accepted:
+                        print(f"🟡 {label}\n     {'; '.join(problems)} - accepted: {accepted[0]}")
+                    elif problems:
+                        failures += 1
+                        print(f"❌ {label}\n     {'; '.join(problems)}")
+                    else:
+                        print(f"✅ {label}")
+
+        missed = sorted(
+            (f, a) for f, a, b in execute_sites()
+            if not any(f == hf and a <= hl <= b for hf, hl in recorder.sites)
+        )
+        for filename, line in missed:
+            print(f"{'❌' if args.strict else '⚠️ '} {filename}:{line} execute() never ran")
+        if args.strict:
+            failures += len(missed)
+    finally:
+        app_module.pool.close_all()
+        if not args.keep:
+            with migrate.connect(database=None) as cx:
+                with cx.cursor() as c:
+                    c.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+
+    print(f"{'❌' if failures else '✅'} {len(recorder.statements)} statements checked, "
+          f"{failures} problem(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Hourly interest compounding job
+Run from cron (e.g. `5 * * * * python scripts/hourly_interest.py`).
+
+Accounts are processed in id-range chunks, one transaction per chunk, with
+set-based SQL only: nothing is looped per account or per hour in Python.
+
+For each active account with at least one whole period (hour) elapsed since
+`last_compounded_at`, missed periods are caught up in closed form:
+
+    k     = periods spent below premium_min_balance (0 if already premium)
+          = LEAST(n, CEIL(LN(min / balance) / LN(1 + normal_rate)))
+    final = balance * (1 + normal_rate)^k * (1 + premium_rate)^(n - k)
+
+i.e. the tier is re-evaluated every period, exactly as an hour-by-hour loop
+would, since balances only grow while compounding. The gain is written as a
+single 'interest' transaction per account (the transactions insert trigger
+applies it to accounts.balance) and last_compounded_at moves forward by the
+whole periods consumed, so re-running the job is a no-op.
+
+Runs are checkpointed: the run row pins as_of and the rates, and each chunk
+(shard) records itself in interest_run_shards inside the same transaction
+that applies its interest. After a crash, the next invocation resumes the
+unfinished run and skips completed shards; a shard can never apply twice
+because its checkpoint row has a primary key. --workers N spreads shards
+over N processes, each with its own connection. --dry-run only reports
+projected totals.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+import pymysql
+
+DB_HOST = os.getenv("BANK_DB_HOST", "127.0.0.1")
+DB_USER = os.getenv("BANK_DB_USER", "factions_test")
+DB_PASS = os.getenv("BANK_DB_PASS", "SuperSecureTestPass123")
+DB_NAME = os.getenv("BANK_DB_NAME", "factions_bank")
+
+DEADLOCK_ERRORS = (1205, 1213)  # lock wait timeout, deadlock
+DUPLICATE_KEY = 1062
+MAX_RETRIES = 5
+
+
+def connect():
+    return pymysql.connect(
+        host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME,
+        autocommit=False, cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def load_rates(c):
+    c.execute("""
+        SELECT interest_rate_per_period, premium_interest_rate_per_period,
+               premium_min_balance
+        FROM settings WHERE id=1
+    """)
+    s = c.fetchone()
+    if not s:
+        raise SystemExit("❌ settings row id=1 is missing")
+    return {
+        "normal": s['interest_rate_per_period'] or 0,
+        "premium": s['premium_interest_rate_per_period'] or 0,
+        "min_balance": s['premium_min_balance'] or 0,
+    }
+
+
+def db_now(c):
+    c.execute("SELECT NOW() AS now")
+    return c.fetchone()['now']
+
+
+def id_bounds(c):
+    c.execute("SELECT MIN(id) AS lo, MAX(id) AS hi FROM accounts WHERE status='active'")
+    row = c.fetchone()
+    return row['lo'], row['hi']
+
+
+# Periods (n), periods below the premium tier (k) and interest for every
+# due account in [lo, hi], computed in SQL.
+_DUE_SQL = """
+    SELECT id, n,
+           CASE WHEN balance > 0 THEN
+               ROUND(balance * POW(1 + %(normal)s, k) * POW(1 + %(premium)s, n - k) - balance, 2)
+           ELSE 0 END AS interest
+    FROM (
+        SELECT id, balance, n,
+               CASE
+                   WHEN balance >= %(min_balance)s THEN 0
+                   WHEN balance <= 0 OR %(normal)s <= 0 THEN n
+                   ELSE LEAST(n, CEIL(LN(%(min_balance)s / balance) / LN(1 + %(normal)s)))
+               END AS k
+        FROM (
+            SELECT id, balance, TIMESTAMPDIFF(HOUR, last_compounded_at, %(as_of)s) AS n
+            FROM accounts
+            WHERE id BETWEEN %(lo)s AND %(hi)s AND status='active'
+        ) due
+        WHERE n >= 1
+    ) t
+"""
+
+_STAGE_SQL = "INSERT INTO interest_batch (account_id, periods, interest)" + _DUE_SQL
+
+
+def ensure_job_tables(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS interest_runs (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            status ENUM('running', 'done') NOT NULL DEFAULT 'running',
+            as_of DATETIME NOT NULL,
+            min_id BIGINT NOT NULL,
+            max_id BIGINT NOT NULL,
+            chunk_size INT NOT NULL,
+            normal_rate DECIMAL(12, 8) NOT NULL,
+            premium_rate DECIMAL(12, 8) NOT NULL,
+            premium_min_balance DECIMAL(20, 2) NOT NULL,
+            started_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            finished_at DATETIME NULL,
+            KEY idx_interest_runs_status (status)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS interest_run_shards (
+            run_id BIGINT NOT NULL,
+            lo BIGINT NOT NULL,
+            hi BIGINT NOT NULL,
+            accounts INT NOT NULL,
+            interest DECIMAL(20, 2) NOT NULL,
+            finished_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, lo)
+        )
+    """)
+
+
+def start_or_resume_run(cx, chunk_size, as_of=None):
+    """
+    Return the unfinished run if there is one (with its pinned as_of, rates
+    and shard layout), otherwise record a new one. Adds `done`: the set of
+    shard start ids already committed.
+    """
+    with cx.cursor() as c:
+        c.execute("""
+            SELECT * FROM interest_runs WHERE status='running'
+            ORDER BY id LIMIT 1 FOR UPDATE
+        """)
+        run = c.fetchone()
+        if run:
+            print(f"↩️  Resuming run {run['id']} (as of {run['as_of']})")
+            if as_of:
+                print("⚠️  --as-of ignored while resuming")
+        else:
+            rates = load_rates(c)
+            lo, hi = id_bounds(c)
+            if lo is None:
+                cx.commit()
+                return None
+            c.execute("""
+                INSERT INTO interest_runs
+                    (as_of, min_id, max_id, chunk_size,
+                     normal_rate, premium_rate, premium_min_balance)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (as_of or db_now(c), lo, hi, chunk_size,
+                  rates['normal'], rates['premium'], rates['min_balance']))
+            c.execute("SELECT * FROM interest_runs WHERE id=%s", (c.lastrowid,))
+            run = c.fetchone()
+
+        c.execute("SELECT lo FROM interest_run_shards WHERE run_id=%s", (run['id'],))
+        run['done'] = {r['lo'] for r in c.fetchall()}
+    cx.commit()
+    return run
+
+
+def run_rates(run):
+    return {
+        "normal": run['normal_rate'],
+        "premium": run['premium_rate'],
+        "min_balance": run['premium_min_balance'],
+    }
+
+
+def shard_ranges(lo, hi, chunk_size):
+    return [(start, min(start + chunk_size - 1, hi)) for start in range(lo, hi + 1, chunk_size)]
+
+
+def create_batch_table(c):
+    """Per-connection scratch table; created outside any chunk transaction"""
+    c.execute("""
+        CREATE TEMPORARY TABLE IF NOT EXISTS interest_batch (
+            account_id BIGINT PRIMARY KEY,
+            periods INT NOT NULL,
+            interest DECIMAL(20, 2) NOT NULL
+        ) ENGINE=MEMORY
+    """)
+
+
+def compound_chunk(cx, lo, hi, as_of, rates, run_id):
+    """
+    Compound accounts with id in [lo, hi] up to `as_of` and checkpoint the
+    shard, in one transaction. Returns (accounts_compounded, interest_total),
+    or None if another process already committed this shard.
+    Retries on deadlock.
+    """
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            with cx.cursor() as c:
+                # Lock the range so writers can't move balances under us
+                c.execute("""
+                    SELECT COUNT(*) AS n FROM accounts
+                    WHERE id BETWEEN %s AND %s FOR UPDATE
+                """, (lo, hi))
+
+                # Accounts that never compounded start their clock now
+                c.execute("""
+                    UPDATE accounts SET last_compounded_at = %s
+                    WHERE id BETWEEN %s AND %s AND status='active'
+                      AND last_compounded_at IS NULL
+                """, (as_of, lo, hi))
+
+                c.execute("DELETE FROM interest_batch")
+                c.execute(_STAGE_SQL, {**rates, "as_of": as_of, "lo": lo, "hi": hi})
+                compounded = c.rowcount
+
+                c.execute("""
+                    INSERT INTO transactions (account_id, txn_type, amount, note)
+                    SELECT account_id, 'interest', interest,
+                           CONCAT('Interest - ', periods, ' period(s)')
+                    FROM interest_batch WHERE interest > 0
+                """)
+
+                c.execute("""
+                    UPDATE accounts a
+                    JOIN interest_batch b ON b.account_id = a.id
+                    SET a.last_compounded_at = a.last_compounded_at + INTERVAL b.periods HOUR
+                """)
+
+                c.execute("SELECT COALESCE(SUM(interest), 0) AS total FROM interest_batch")
+                total = c.fetchone()['total']
+
+                try:
+                    c.execute("""
+                        INSERT INTO interest_run_shards (run_id, lo, hi, accounts, interest)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """, (run_id, lo, hi, compounded, total))
+                except pymysql.err.IntegrityError as e:
+                    # Only the checkpoint's own key means "already done";
+                    # anything else is a real failure and must stop the run
+                    if e.args[0] != DUPLICATE_KEY:
+                        raise
+                    cx.rollback()
+                    return None
+            cx.commit()
+            return compounded, total
+        except pymysql.err.OperationalError as e:
+            cx.rollback()
+            if e.args[0] not in DEADLOCK_ERRORS or attempt == MAX_RETRIES:
+                raise
+            time.sleep(min(2.0, 0.05 * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def project_chunk(cx, lo, hi, as_of, rates):
+    """Dry run: (accounts_due, projected_interest) for [lo, hi], no locks, no writes"""
+    with cx.cursor() as c:
+        c.execute(f"SELECT COUNT(*) AS n, COALESCE(SUM(interest), 0) AS total FROM ({_DUE_SQL}) d",
+                  {**rates, "as_of": as_of, "lo": lo, "hi": hi})
+        row = c.fetchone()
+    cx.rollback()
+    return row['n'], row['total']
+
+
+# -------------------- WORKERS --------------------
+_worker_cx = None
+
+
+def _init_worker():
+    global _worker_cx
+    _worker_cx = connect()
+    with _worker_cx.cursor() as c:
+        create_batch_table(c)
+    _worker_cx.commit()
+
+
+def _do_shard(job):
+    mode, lo, hi, as_of, rates, run_id = job
+    if mode == "project":
+        return lo, hi, project_chunk(_worker_cx, lo, hi, as_of, rates)
+    return lo, hi, compound_chunk(_worker_cx, lo, hi, as_of, rates, run_id)
+
+
+def _execute(jobs, workers):
+    """Yield shard results, in-process for 1 worker, else from a process pool"""
+    if workers <= 1:
+        _init_worker()
+        try:
+            for job in jobs:
+                yield _do_shard(job)
+        finally:
+            _worker_cx.close()
+        return
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        yield from pool.imap_unordered(_do_shard, jobs)
+
+
+def run(chunk_size=5000, workers=1, dry_run=False, as_of=None):
+    started = time.monotonic()
+    with connect() as cx:
+        with cx.cursor() as c:
+            ensure_job_tables(c)
+        cx.commit()
+
+        if dry_run:
+            with cx.cursor() as c:
+                rates = load_rates(c)
+                as_of = as_of or db_now(c)
+                lo, hi = id_bounds(c)
+            cx.rollback()
+            run_id, done = None, set()
+        else:
+            run = start_or_resume_run(cx, chunk_size, as_of)
+            if run:
+                rates, as_of = run_rates(run), run['as_of']
+                lo, hi, chunk_size = run['min_id'], run['max_id'], run['chunk_size']
+                run_id, done = run['id'], run['done']
+            else:
+                lo = None
+
+        if lo is None:
+            print("ℹ️  No active accounts")
+            return
+
+        shards = [r for r in shard_ranges(lo, hi, chunk_size) if r[0] not in done]
+        mode = "project" if dry_run else "compound"
+        print(f"💰 {'Projecting' if dry_run else 'Compounding'} accounts {lo}..{hi} up to {as_of} "
+              f"(normal {rates['normal']}, premium {rates['premium']} "
+              f"from {rates['min_balance']}): {len(shards)} shards, {workers} workers")
+
+        scanned = compounded = 0
+        total = 0
+        jobs = [(mode, a, b, as_of, rates, run_id) for a, b in shards]
+        for i, (a, b, result) in enumerate(_execute(jobs, workers), 1):
+            scanned += b - a + 1
+            if result is None:
+                print(f"⏭️  Shard {a}..{b} already done by another process")
+                continue
+            compounded += result[0]
+            total += result[1]
+            if i % 50 == 0 or i == len(jobs):
+                print(f"   {i}/{len(jobs)} shards")
+
+        if not dry_run:
+            with cx.cursor() as c:
+                c.execute("""
+                    UPDATE interest_runs SET status='done', finished_at=NOW()
+                    WHERE id=%s
+                """, (run_id,))
+            cx.commit()
+
+    elapsed = time.monotonic() - started
+    verb = "due, projected" if dry_run else "compounded,"
+    print(f"✅ {compounded} accounts {verb} ${total:,.2f} interest "
+          f"in {elapsed:.2f}s ({compounded / elapsed:,.0f} accounts/s, "
+          f"{scanned / elapsed:,.0f} ids scanned/s)")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Compound hourly interest for all active accounts")
+    p.add_argument("--chunk-size", type=int, default=5000,
+                   help="account ids per shard / transaction (default 5000)")
+    p.add_argument("--workers", type=int, default=1,
+                   help="worker processes, each with its own connection (default 1)")
+    p.add_argument("--dry-run", action="store_true",
+                   help="only report how many accounts are due and the projected interest")
+    p.add_argument("--as-of", help="compound up to this DB timestamp instead of NOW()")
+    args = p.parse_args(argv)
+    run(chunk_size=args.chunk_size, workers=args.workers,
+        dry_run=args.dry_run, as_of=args.as_of)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Schema migrations
+Applies database/migrations/NNN_name.sql files in order and records each
+version in schema_migrations, so every deployment ends up with the same
+tables, triggers and indexes.
+
+    python scripts/migrate.py              # apply pending migrations
+    python scripts/migrate.py --status     # list applied / pending
+    python scripts/migrate.py --baseline 2 # record 001-002 as applied, then migrate
+
+Files may use the mysql client's DELIMITER directive (for triggers). MySQL
+commits DDL implicitly, so a migration that fails halfway is not rolled
+back: fix the cause, undo the partial change by hand and re-run. A fresh
+install can load database/schema.sql instead, which already records every
+version up to the latest migration.
+
+A database that predates migrations already has some of these objects,
+so running them again would fail or duplicate them. When
+schema_migrations is empty and `players` exists, each migration whose
+tables, triggers, indexes and columns all exist (per information_schema)
+is recorded as applied without running it, up to the first one with none
+of them. Anything less clear-cut (a half-present migration, or a later
+one present after a missing one) is refused: check the schema by hand and
+pass --baseline N to record 001..N.
+"""
+import argparse
+import os
+import re
+
+import pymysql
+
+DB_HOST = os.getenv("BANK_DB_HOST", "127.0.0.1")
+DB_USER = os.getenv("BANK_DB_USER", "factions_test")
+DB_PASS = os.getenv("BANK_DB_PASS", "SuperSecureTestPass123")
+DB_NAME = os.getenv("BANK_DB_NAME", "factions_bank")
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "migrations")
+_FILE = re.compile(r"^(\d{3})_(\w+)\.sql$")
+
+
+def connect(database=DB_NAME):
+    return pymysql.connect(
+        host=DB_HOST, user=DB_USER, password=DB_PASS, database=database,
+        autocommit=True, cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def split_statements(sql):
+    """Split a script into statements, honouring DELIMITER lines and -- comments"""
+    delimiter = ";"
+    statements, buf = [], []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith("DELIMITER "):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        if not buf and (not stripped or stripped.startswith("--")):
+            continue
+        buf.append(line)
+        if stripped.endswith(delimiter) and not stripped.startswith("--"):
+            statement = "\n".join(buf).rstrip()[:-len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            buf = []
+    tail = "\n".join(buf).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def migrations(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] sorted by version"""
+    found = []
+    for filename in os.listdir(directory):
+        m = _FILE.match(filename)
+        if m:
+            found.append((int(m.group(1)), m.group(2), os.path.join(directory, filename)))
+    return sorted(found)
+
+
+def ensure_table(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            name VARCHAR(128) NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(c):
+    c.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in c.fetchall()}
+
+
+_CREATE_TABLE = re.compile(r"^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?", re.I)
+_CREATE_TRIGGER = re.compile(
+    r"^CREATE\s+TRIGGER\s+`?(\w+)`?\s+(BEFORE|AFTER)\s+(INSERT|UPDATE|DELETE)\s+ON\s+`?(\w+)`?", re.I)
+_ALTER = re.compile(r"^ALTER\s+TABLE\s+`?(\w+)`?", re.I)
+_ADDS = re.compile(r"\bADD\s+(?:(?:UNIQUE|FULLTEXT)\s+)?(KEY|INDEX|COLUMN)\s+`?(\w+)`?", re.I)
+
+_PRESENT_SQL = {
+    "table": "SELECT COUNT(*) AS n FROM information_schema.tables "
+             "WHERE table_schema = DATABASE() AND table_name = %s",
+    # A hand-made trigger for the same table and event counts too: running
+    # the migration would fire both
+    "trigger": "SELECT COUNT(*) AS n FROM information_schema.triggers "
+               "WHERE trigger_schema = DATABASE() AND (trigger_name = %s OR "
+               "(action_timing = %s AND event_manipulation = %s AND event_object_table = %s))",
+    "index": "SELECT COUNT(*) AS n FROM information_schema.statistics "
+             "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+    "column": "SELECT COUNT(*) AS n FROM information_schema.columns "
+              "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+}
+
+
+def schema_objects(sql):
+    """The tables, triggers, indexes and columns a migration creates: [(kind, *names)]"""
+    found = []
+    for statement in split_statements(sql):
+        m = _CREATE_TABLE.match(statement)
+        if m:
+            found.append(("table", m.group(1)))
+            continue
+        m = _CREATE_TRIGGER.match(statement)
+        if m:
+            name, timing, event, table = m.groups()
+            found.append(("trigger", name, timing.upper(), event.upper(), table))
+            continue
+        m = _ALTER.match(statement)
+        if m:
+            for kind, name in _ADDS.findall(statement):
+                kind = "column" if kind.upper() == "COLUMN" else "index"
+                found.append((kind, m.group(1), name))
+    return found
+
+
+def present(c, obj):
+    kind, *names = obj
+    c.execute(_PRESENT_SQL[kind], names)
+    return c.fetchone()['n'] > 0
+
+
+def detect_baseline(c, directory=MIGRATIONS_DIR):
+    """
+    The last version an unversioned database already has in full, judged
+    from information_schema. Raises SystemExit when the schema doesn't line
+    up with a prefix of the migrations.
+    """
+    baseline, missing = 0, False
+    for version, name, path in migrations(directory):
+        with open(path) as f:
+            objects = schema_objects(f.read())
+        have = [present(c, obj) for obj in objects]
+        if objects and all(have) and not missing:
+            baseline = version
+        elif any(have) or not objects:
+            raise SystemExit(
+                f"❌ can't tell whether {version:03d}_{name} is applied on this unversioned "
+                f"database; check the schema and rerun with --baseline N"
+            )
+        else:
+            missing = True
+    return baseline
+
+
+def stamp(c, upto, directory=MIGRATIONS_DIR, verbose=True):
+    """Record migrations up to `upto` as applied without running them; returns those versions"""
+    applied = applied_versions(c)
+    done = []
+    for version, name, _ in migrations(directory):
+        if version > upto or version in applied:
+            continue
+        if verbose:
+            print(f"📌 {version:03d}_{name} (baseline, not run)")
+        c.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                  (version, name))
+        done.append(version)
+    return done
+
+
+def migrate(cx, directory=MIGRATIONS_DIR, verbose=True, baseline=None):
+    """
+    Apply every pending migration; returns the versions applied. An
+    unversioned database that already has the base tables is first stamped
+    at `baseline`, or at whatever detect_baseline finds already in place.
+    """
+    done = []
+    with cx.cursor() as c:
+        ensure_table(c)
+        if not applied_versions(c):
+            if baseline is None and present(c, ("table", "players")):
+                baseline = detect_baseline(c, directory)
+            if baseline:
+                stamp(c, baseline, directory, verbose)
+        applied = applied_versions(c)
+        for version, name, path in migrations(directory):
+            if version in applied:
+                continue
+            if verbose:
+                print(f"⬆️  {version:03d}_{name}")
+            with open(path) as f:
+                for statement in split_statements(f.read()):
+                    c.execute(statement)
+            c.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                      (version, name))
+            done.append(version)
+    return done
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Apply database migrations")
+    p.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    p.add_argument("--baseline", type=int, metavar="N",
+                   help="on a database with no recorded migrations, record 001..N as applied "
+                        "without running them (default: detected from information_schema "
+                        "when the base tables exist)")
+    args = p.parse_args(argv)
+
+    with connect() as cx:
+        if args.status:
+            with cx.cursor() as c:
+                ensure_table(c)
+                applied = applied_versions(c)
+            for version, name, _ in migrations():
+                mark = "✅" if version in applied else "⏳"
+                print(f"{mark} {version:03d}_{name}")
+            return
+
+        done = migrate(cx, baseline=args.baseline)
+    print(f"✅ Applied {len(done)} migration(s)" if done else "✅ Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
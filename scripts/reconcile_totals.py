@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Reconcile the trigger-maintained bank_totals (migration 005)
+Recomputes total debt, active/premium account counts and open prize pools
+from the base tables and reports any drift from the maintained counters.
+
+    python scripts/reconcile_totals.py         # report; exit 1 on drift
+    python scripts/reconcile_totals.py --fix   # report and rewrite the counters
+
+Writers that would change the counters wait for the few hundred ms the
+recount takes; nothing else is blocked. Safe to run from cron.
+"""
+import argparse
+import os
+import sys
+
+import pymysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+import bank_totals  # noqa: E402
+
+DB_HOST = os.getenv("BANK_DB_HOST", "127.0.0.1")
+DB_USER = os.getenv("BANK_DB_USER", "factions_test")
+DB_PASS = os.getenv("BANK_DB_PASS", "SuperSecureTestPass123")
+DB_NAME = os.getenv("BANK_DB_NAME", "factions_bank")
+
+
+def connect():
+    return pymysql.connect(
+        host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME,
+        autocommit=False, cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Recompute bank_totals and report drift")
+    p.add_argument("--fix", action="store_true", help="rewrite the counters when they drifted")
+    args = p.parse_args(argv)
+
+    with connect() as cx:
+        with cx.cursor() as c:
+            drift = bank_totals.reconcile(c, fix=args.fix)
+        cx.commit()
+
+    if not drift:
+        print("✅ bank_totals matches the base tables")
+        return
+    for field, (maintained, actual) in drift.items():
+        print(f"⚠️  {field}: maintained {maintained}, actual {actual} (drift {maintained - actual})")
+    if args.fix:
+        print("🔧 Counters rewritten")
+    else:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
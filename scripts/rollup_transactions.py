@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Transaction rollup job
+Run from cron (e.g. `* * * * * python scripts/rollup_transactions.py`).
+
+Folds transactions past the rollup_state watermark into hourly and daily
+buckets, per account (account_rollups) and bank-wide (bank_rollups), for
+/api/series. Work goes in id-range chunks, one transaction per chunk that
+also advances the watermark, so an interrupted run resumes where it left
+off and no transaction is ever counted twice. The first run backfills the
+whole ledger.
+
+Ids are handed out at insert time, so a transaction can commit after a
+higher id has been rolled up. Every id a chunk passes over without a row
+goes into rollup_gaps; each run first folds in the gaps that have since
+shown up, and forgets gaps more than --gap-window ids behind the watermark
+(a rolled-back insert leaves a gap that never fills).
+"""
+import argparse
+import os
+import time
+
+import pymysql
+
+DB_HOST = os.getenv("BANK_DB_HOST", "127.0.0.1")
+DB_USER = os.getenv("BANK_DB_USER", "factions_test")
+DB_PASS = os.getenv("BANK_DB_PASS", "SuperSecureTestPass123")
+DB_NAME = os.getenv("BANK_DB_NAME", "factions_bank")
+
+BUCKETS = {
+    "hour": "TIMESTAMP(DATE(created_at), MAKETIME(HOUR(created_at), 0, 0))",
+    "day": "TIMESTAMP(DATE(created_at))",
+}
+
+_ACCOUNT_SQL = """
+    INSERT INTO account_rollups (account_id, bucket, bucket_start, txns, net_delta,
+                                 inflow, outflow, close_balance, last_txn_id)
+    SELECT g.acct, %(bucket)s, g.b_start, g.n, g.net, g.inflow_sum, g.outflow_sum,
+           t.balance_after, g.last_id
+    FROM (
+        SELECT account_id AS acct, {expr} AS b_start, COUNT(*) AS n,
+               SUM(effective_delta) AS net,
+               SUM(GREATEST(effective_delta, 0)) AS inflow_sum,
+               -SUM(LEAST(effective_delta, 0)) AS outflow_sum,
+               MAX(id) AS last_id
+        FROM transactions
+        WHERE {where}
+        GROUP BY acct, b_start
+    ) g
+    JOIN transactions t ON t.id = g.last_id
+    ON DUPLICATE KEY UPDATE
+        txns = txns + VALUES(txns),
+        net_delta = net_delta + VALUES(net_delta),
+        inflow = inflow + VALUES(inflow),
+        outflow = outflow + VALUES(outflow),
+        close_balance = IF(VALUES(last_txn_id) > last_txn_id, VALUES(close_balance), close_balance),
+        last_txn_id = GREATEST(last_txn_id, VALUES(last_txn_id))
+"""
+
+_BANK_SQL = """
+    SELECT {expr} AS bucket_start, COUNT(*) AS txns,
+           SUM(effective_delta) AS net_delta,
+           SUM(IF(txn_type = 'deposit', effective_delta, 0)) AS deposits,
+           -SUM(IF(txn_type = 'payout', effective_delta, 0)) AS payouts,
+           SUM(IF(txn_type = 'interest', effective_delta, 0)) AS interest,
+           SUM(IF(txn_type = 'horse_race_win', effective_delta, 0)) AS race_winnings,
+           MAX(id) AS last_txn_id
+    FROM transactions
+    WHERE {where}
+    GROUP BY bucket_start
+    ORDER BY bucket_start
+"""
+
+_BANK_UPSERT_SQL = """
+    INSERT INTO bank_rollups (bucket, bucket_start, txns, net_delta, deposits, payouts,
+                              interest, race_winnings, ledger_total, last_txn_id)
+    VALUES (%(bucket)s, %(bucket_start)s, %(txns)s, %(net_delta)s, %(deposits)s, %(payouts)s,
+            %(interest)s, %(race_winnings)s, %(ledger_total)s, %(last_txn_id)s)
+    ON DUPLICATE KEY UPDATE
+        txns = txns + VALUES(txns),
+        net_delta = net_delta + VALUES(net_delta),
+        deposits = deposits + VALUES(deposits),
+        payouts = payouts + VALUES(payouts),
+        interest = interest + VALUES(interest),
+        race_winnings = race_winnings + VALUES(race_winnings),
+        ledger_total = VALUES(ledger_total),
+        last_txn_id = GREATEST(last_txn_id, VALUES(last_txn_id))
+"""
+
+
+def connect():
+    return pymysql.connect(
+        host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME,
+        autocommit=False, cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+_RANGE = "id > %(lo)s AND id <= %(hi)s"
+
+
+def fold(c, where, args, ledger_total):
+    """
+    Add the transactions matching `where` to both bucket sizes, for a range
+    above every bucket already rolled up. Returns their net delta.
+    """
+    chunk_net = 0
+    for bucket, expr in BUCKETS.items():
+        c.execute(_ACCOUNT_SQL.format(expr=expr, where=where), {**args, "bucket": bucket})
+
+        c.execute(_BANK_SQL.format(expr=expr, where=where), args)
+        total = ledger_total
+        rows = []
+        for r in c.fetchall():
+            total += r['net_delta']
+            rows.append({**r, "bucket": bucket, "ledger_total": total})
+        if rows:
+            c.executemany(_BANK_UPSERT_SQL, rows)
+        chunk_net = total - ledger_total
+    return chunk_net
+
+
+def fold_late(c, where, args):
+    """
+    Add late-committed transactions matching `where`, whose buckets may sit
+    below ones already rolled up: each bucket's running ledger_total, and
+    that of every later bucket, moves up by its net delta. Returns the net.
+    """
+    late_net = 0
+    for bucket, expr in BUCKETS.items():
+        c.execute(_ACCOUNT_SQL.format(expr=expr, where=where), {**args, "bucket": bucket})
+
+        c.execute(_BANK_SQL.format(expr=expr, where=where), args)
+        late_net = 0
+        for r in c.fetchall():
+            c.execute("""
+                SELECT ledger_total FROM bank_rollups
+                WHERE bucket = %s AND bucket_start <= %s
+                ORDER BY bucket_start DESC LIMIT 1
+            """, (bucket, r['bucket_start']))
+            prev = c.fetchone()
+            base = prev['ledger_total'] if prev else 0
+            c.execute("""
+                UPDATE bank_rollups SET ledger_total = ledger_total + %s
+                WHERE bucket = %s AND bucket_start > %s
+            """, (r['net_delta'], bucket, r['bucket_start']))
+            c.execute(_BANK_UPSERT_SQL, {**r, "bucket": bucket,
+                                         "ledger_total": base + r['net_delta']})
+            late_net += r['net_delta']
+    return late_net
+
+
+def fill_gaps(cx, gap_window, chunk_size):
+    """
+    Fold in passed-over ids that have committed since, and drop gaps older
+    than gap_window ids, in one transaction. Returns how many were filled.
+    """
+    with cx.cursor() as c:
+        c.execute("SELECT last_txn_id FROM rollup_state WHERE id = 1 FOR UPDATE")
+        watermark = c.fetchone()['last_txn_id']
+        c.execute("DELETE FROM rollup_gaps WHERE txn_id <= %s", (watermark - gap_window,))
+        c.execute("""
+            SELECT g.txn_id FROM rollup_gaps g
+            JOIN transactions t ON t.id = g.txn_id
+            ORDER BY g.txn_id LIMIT %s
+        """, (chunk_size,))
+        ids = [r['txn_id'] for r in c.fetchall()]
+        if not ids:
+            cx.commit()
+            return 0
+
+        # named placeholders: the bucket SQL also takes %(bucket)s
+        args = {f"id{i}": v for i, v in enumerate(ids)}
+        where = f"id IN ({', '.join(f'%(id{i})s' for i in range(len(ids)))})"
+        late_net = fold_late(c, where, args)
+
+        c.execute(f"DELETE FROM rollup_gaps WHERE txn_id IN ({', '.join(['%s'] * len(ids))})", ids)
+        c.execute("""
+            UPDATE rollup_state SET ledger_total = ledger_total + %s, version = version + 1
+            WHERE id = 1
+        """, (late_net,))
+    cx.commit()
+    return len(ids)
+
+
+def roll_chunk(cx, hi_limit, chunk_size):
+    """
+    Fold the next chunk (at most chunk_size ids, none above hi_limit) into
+    the rollups, record the ids it found no row for, and move the
+    watermark, in one transaction.
+    Returns (lo, hi) processed, or None when caught up.
+    """
+    with cx.cursor() as c:
+        c.execute("SELECT last_txn_id, ledger_total FROM rollup_state WHERE id = 1 FOR UPDATE")
+        state = c.fetchone()
+        lo = state['last_txn_id']
+        hi = min(lo + chunk_size, hi_limit)
+        if hi <= lo:
+            cx.rollback()
+            return None
+
+        args = {"lo": lo, "hi": hi}
+        # A locking read, like the INSERT ... SELECT below: it waits out
+        # inserts still open in the range, so both folds and `seen` agree
+        c.execute(f"SELECT id FROM transactions WHERE {_RANGE} LOCK IN SHARE MODE", args)
+        seen = {r['id'] for r in c.fetchall()}
+        gaps = [i for i in range(lo + 1, hi + 1) if i not in seen]
+        chunk_net = fold(c, _RANGE, args, state['ledger_total']) if seen else 0
+        if gaps:
+            c.executemany("INSERT IGNORE INTO rollup_gaps (txn_id) VALUES (%s)", gaps)
+
+        c.execute("""
+            UPDATE rollup_state SET last_txn_id = %s, ledger_total = ledger_total + %s,
+                                    version = version + 1
+            WHERE id = 1
+        """, (hi, chunk_net))
+    cx.commit()
+    return lo, hi
+
+
+def run(chunk_size=20000, gap_window=100000):
+    started = time.monotonic()
+    chunks = 0
+    first = last = None
+    with connect() as cx:
+        filled = 0
+        while True:
+            n = fill_gaps(cx, gap_window, chunk_size)
+            filled += n
+            if n < chunk_size:
+                break
+        if filled:
+            print(f"   folded in {filled} late-committed transaction(s)")
+
+        with cx.cursor() as c:
+            c.execute("SELECT COALESCE(MAX(id), 0) AS hi FROM transactions")
+            hi_limit = c.fetchone()['hi']
+        cx.rollback()
+
+        while True:
+            done = roll_chunk(cx, hi_limit, chunk_size)
+            if done is None:
+                break
+            chunks += 1
+            first = done[0] if first is None else first
+            last = done[1]
+            if chunks % 50 == 0:
+                print(f"   rolled up to transaction {last}")
+
+    elapsed = time.monotonic() - started
+    if not chunks:
+        print("✅ Rollups are up to date")
+        return
+    print(f"✅ Rolled up transactions {first + 1}..{last} in {chunks} chunk(s), {elapsed:.2f}s")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Fold new transactions into hourly/daily rollups")
+    p.add_argument("--chunk-size", type=int, default=20000,
+                   help="transaction ids per chunk / transaction (default 20000)")
+    p.add_argument("--gap-window", type=int, default=100000,
+                   help="keep waiting for passed-over ids this close to the watermark (default 100000)")
+    args = p.parse_args(argv)
+    run(chunk_size=args.chunk_size, gap_window=args.gap_window)
+
+
+if __name__ == "__main__":
+    main()
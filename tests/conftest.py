@@ -0,0 +1,28 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The backend modules import each other as top-level modules (app.py runs from backend/)
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, ROOT)
+
+import pytest  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces time.monotonic with a clock the test moves by hand"""
+    c = Clock()
+    monkeypatch.setattr("time.monotonic", c)
+    return c
@@ -0,0 +1,66 @@
+import pytest
+
+import app as bank
+import data_version
+
+
+class FakeDB:
+    """A connection/cursor pair holding the transaction count and MAX(id)"""
+
+    def __init__(self, n):
+        self.n = n
+        self.sql = ""
+
+    def __call__(self, sticky=True):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.sql = sql
+
+    def fetchone(self):
+        if "MAX(id)" in self.sql:
+            row = dict.fromkeys(data_version._PROBE_MAP, 0)
+            row["transactions"] = self.n
+            return row
+        return {"n": self.n}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB(5)
+    monkeypatch.setattr(bank, "db_read", fake)
+    monkeypatch.setattr(data_version, "PROBE_INTERVAL", 0)
+    data_version.reset()
+    bank.counts.clear()
+    yield fake
+    data_version.reset()
+    bank.counts.clear()
+
+
+def test_outside_write_seen_by_the_probe_is_served_fresh(db):
+    client = bank.app.test_client()
+    first = client.get("/api/transactions/count")
+    assert first.get_json() == {"count": 5}
+    tag = first.headers["ETag"]
+
+    db.n = 6  # e.g. the interest job inserted a row
+    again = client.get("/api/transactions/count", headers={"If-None-Match": tag})
+    assert again.status_code == 200
+    assert again.get_json() == {"count": 6}
+    assert again.headers["ETag"] != tag
+
+
+def test_unchanged_data_answers_304(db):
+    client = bank.app.test_client()
+    tag = client.get("/api/transactions/count").headers["ETag"]
+    again = client.get("/api/transactions/count", headers={"If-None-Match": tag})
+    assert again.status_code == 304
@@ -0,0 +1,126 @@
+import pytest
+
+import data_version
+
+
+@pytest.fixture(autouse=True)
+def fresh():
+    data_version.reset()
+    yield
+    data_version.reset()
+
+
+def test_bump_changes_the_etag():
+    before = data_version.etag("/api/players", "accounts")
+    data_version.bump("accounts")
+    assert data_version.etag("/api/players", "accounts") != before
+
+
+def test_etag_depends_on_key_and_only_on_its_tables():
+    tag = data_version.etag("/api/races", "races")
+    assert data_version.etag("/api/races?x=1", "races") != tag
+    data_version.bump("settings")
+    assert data_version.etag("/api/races", "races") == tag
+
+
+def test_deadline_bumps_once_it_passes(clock):
+    v0 = data_version.current("races")
+    data_version.expire_in("races", 10)
+    clock.advance(9)
+    assert data_version.current("races") == v0
+    clock.advance(1)
+    assert data_version.current("races") == (v0[0] + 1,)
+    clock.advance(100)
+    assert data_version.current("races") == (v0[0] + 1,)
+
+
+def test_every_deadline_fires(clock):
+    start, = data_version.current("races")
+    data_version.expire_in("races", 10)
+    data_version.expire_in("races", 30)  # e.g. a second race's start
+    data_version.expire_in("races", 20)
+    seen = []
+    for _ in range(4):
+        clock.advance(10)
+        seen.append(data_version.current("races")[0] - start)
+    assert seen == [1, 2, 3, 3]
+
+
+def test_deadlines_are_per_table(clock):
+    accounts, races = data_version.current("accounts", "races")
+    data_version.expire_in("races", 5)
+    clock.advance(5)
+    assert data_version.current("accounts", "races") == (accounts, races + 1)
+
+
+def test_passed_deadlines_fire_when_a_new_one_is_added(clock):
+    start, = data_version.current("races")
+    data_version.expire_in("races", 1)
+    clock.advance(2)
+    data_version.expire_in("races", 60)
+    assert data_version.current("races") == (start + 1,)
+
+
+def test_reset_drops_deadlines_and_changes_the_epoch(clock):
+    tag = data_version.etag("/api/races", "races")
+    start = data_version.current("races")
+    data_version.expire_in("races", 1)
+    data_version.reset()
+    clock.advance(5)
+    assert data_version.current("races") == start
+    assert data_version.etag("/api/races", "races") != tag
+
+
+class FakeDB:
+    """Answers the probe query from a dict of MAX(id)s"""
+
+    def __init__(self, **maxima):
+        self.row = dict.fromkeys(data_version._PROBE_MAP, 0)
+        self.row.update(maxima)
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return dict(self.row)
+
+
+def test_probe_bumps_changed_tables_after_telling_listeners(monkeypatch, clock):
+    seen = []
+    monkeypatch.setattr(data_version, "_listeners", [])
+    data_version.on_change(lambda tables: seen.append(
+        (set(tables), data_version.current("transactions", "accounts", "races"))))
+    db = FakeDB(transactions=10)
+    data_version.maybe_probe(db)
+    before = data_version.current("transactions", "accounts", "races")
+
+    db.row["transactions"] = 11
+    data_version.maybe_probe(db)  # throttled
+    assert seen == []
+    clock.advance(data_version.PROBE_INTERVAL)
+    data_version.maybe_probe(db)
+    assert seen == [({"transactions", "accounts"}, before)]
+    t, a, r = data_version.current("transactions", "accounts", "races")
+    assert (t > before[0], a > before[1], r) == (True, True, before[2])
+
+
+def test_repeated_deadlines_are_queued_once(clock):
+    start, = data_version.current("races")
+    for i in range(50):  # every poll re-announces the same race start
+        data_version.expire_in("races", 30 - i * 0.01)
+        clock.advance(0.01)
+    assert len(data_version._deadlines["races"]) == 1
+    clock.advance(30)
+    assert data_version.current("races") == (start + 1,)
@@ -0,0 +1,162 @@
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeRaw:
+    """Stands in for a pymysql connection"""
+
+    def __init__(self, n):
+        self.n = n
+        self.open = True
+        self.rollbacks = 0
+        self.pings = 0
+        self.ping_fails = False
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.ping_fails:
+            raise OSError("gone away")
+
+    def close(self):
+        self.open = False
+
+
+class Connector:
+    def __init__(self):
+        self.made = []
+        self.fail = False
+
+    def __call__(self):
+        if self.fail:
+            raise OSError("can't connect")
+        raw = FakeRaw(len(self.made))
+        self.made.append(raw)
+        return raw
+
+
+@pytest.fixture
+def connect():
+    return Connector()
+
+
+def make_pool(connect, **kwargs):
+    kwargs.setdefault("ping_interval", 5)
+    return ConnectionPool(connect, **kwargs)
+
+
+def test_released_connection_is_reused_and_rolled_back(connect, clock):
+    pool = make_pool(connect, size=2)
+    with pool.connection() as cx:
+        first = cx.n
+    with pool.connection() as cx:
+        assert cx.n == first
+    assert len(connect.made) == 1
+    assert connect.made[0].rollbacks == 2
+    stats = pool.stats()
+    assert (stats["open"], stats["idle"], stats["in_use"], stats["checkouts"]) == (1, 1, 0, 2)
+
+
+def test_returned_connection_cannot_be_used(connect, clock):
+    pool = make_pool(connect)
+    cx = pool.connection()
+    cx.close()
+    with pytest.raises(AttributeError):
+        cx.cursor()
+    cx.close()  # twice is harmless
+    assert pool.stats()["idle"] == 1
+
+
+def test_checkout_times_out_when_the_pool_is_exhausted(connect):
+    pool = make_pool(connect, size=1, timeout=0.05)
+    held = pool.connection()
+    with pytest.raises(PoolTimeout):
+        pool.connection()
+    assert pool.stats()["timeouts"] == 1
+    held.close()
+
+
+def test_waiter_gets_the_released_connection(connect):
+    pool = make_pool(connect, size=1, timeout=5)
+    held = pool.connection()
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool.connection()))
+    t.start()
+    held.close()
+    t.join(5)
+    assert got and got[0].n == 0
+    assert pool.stats()["waits"] == 1
+    got[0].close()
+
+
+def test_old_connections_are_recycled(connect, clock):
+    pool = make_pool(connect, max_idle=30, max_lifetime=100)
+    pool.connection().close()
+    clock.advance(31)  # idle too long: closed on the next checkout
+    with pool.connection() as cx:
+        assert cx.n == 1
+        clock.advance(100)  # too old: closed when released
+    assert [raw.open for raw in connect.made] == [False, False]
+    assert pool.stats()["recycled"] == 2
+    assert pool.stats()["open"] == 0
+
+
+def test_idle_connection_is_pinged_and_replaced_if_dead(connect, clock):
+    pool = make_pool(connect, ping_interval=5)
+    pool.connection().close()
+    with pool.connection():
+        pass
+    assert connect.made[0].pings == 0  # released moments ago
+    clock.advance(5)
+    connect.made[0].ping_fails = True
+    with pool.connection() as cx:
+        assert cx.n == 1
+    assert pool.stats()["ping_failures"] == 1
+
+
+def test_failed_connect_frees_the_slot(connect, clock):
+    pool = make_pool(connect, size=1, timeout=0.05)
+    connect.fail = True
+    with pytest.raises(OSError):
+        pool.connection()
+    connect.fail = False
+    with pool.connection() as cx:
+        assert cx.n == 0
+
+
+def test_discard_closes_instead_of_returning(connect, clock):
+    pool = make_pool(connect)
+    cx = pool.connection()
+    cx.discard()
+    assert not connect.made[0].open
+    assert pool.stats()["open"] == 0
+    assert pool.stats()["discarded"] == 1
+
+
+def test_close_all_closes_idle_connections(connect, clock):
+    pool = make_pool(connect, size=3)
+    a, b = pool.connection(), pool.connection()
+    a.close()
+    pool.close_all()
+    assert [raw.open for raw in connect.made] == [False, True]
+    b.close()
+    assert pool.stats()["open"] == 1
+
+
+def test_after_fork_inherited_connections_are_dropped_not_closed(connect, clock, monkeypatch):
+    pool = make_pool(connect, size=1, timeout=0.05)
+    pool.connection().close()
+    held = pool.connection()
+    monkeypatch.setattr("os.getpid", lambda: -1)  # now in the forked child
+    with pool.connection() as cx:  # notices the new pid and starts empty
+        assert cx.n == 1
+    held.close()  # the parent's checkout: neither returned nor closed
+    assert connect.made[0].open
+    assert connect.made[0].rollbacks == 1
+    assert pool.stats()["open"] == 1
+    assert pool.stats()["idle"] == 1
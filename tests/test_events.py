@@ -0,0 +1,106 @@
+import queue
+
+import pytest
+
+from events import EventHub, TooManyClients
+
+
+def drain(q):
+    out = []
+    while True:
+        try:
+            out.append(q.get_nowait())
+        except queue.Empty:
+            return out
+
+
+def types(events):
+    return [ev[1] for ev in events]
+
+
+def frames(hub, q, n):
+    gen = hub.stream(q, heartbeat=0.01)
+    return [next(gen) for _ in range(n)]
+
+
+@pytest.fixture
+def hub():
+    h = EventHub(queue_size=5, max_clients=2)
+    for i in range(3):
+        h.publish("txn.created", {"id": i})
+    return h
+
+
+def last_id(hub):
+    return hub.stats()["last_event_id"]
+
+
+def test_ids_carry_the_epoch(hub):
+    q = hub.subscribe()
+    hub.publish("race.ended", {"race_id": 1})
+    retry, frame = frames(hub, q, 2)
+    assert retry == "retry: 3000\n\n"
+    assert frame.startswith(f"id: {last_id(hub)}\nevent: race.ended\n")
+    assert last_id(hub).endswith("-4")
+
+
+def test_new_connection_gets_no_backlog(hub):
+    assert drain(hub.subscribe()) == []
+
+
+def test_reconnect_replays_what_it_missed(hub):
+    epoch = last_id(hub).split("-")[0]
+    backlog = drain(hub.subscribe(f"{epoch}-1"))
+    assert [ev[0] for ev in backlog] == [2, 3]
+    assert drain(hub.subscribe(last_id(hub))) == []
+
+
+@pytest.mark.parametrize("last", ["0badbeef-2", "2", "garbage", "{epoch}-99"])
+def test_ids_from_another_epoch_or_unknown_get_a_reset(hub, last):
+    epoch = last_id(hub).split("-")[0]
+    assert types(drain(hub.subscribe(last.format(epoch=epoch)))) == ["reset"]
+
+
+def test_ids_older_than_the_buffer_get_a_reset():
+    h = EventHub(queue_size=500)
+    epoch = last_id(h).split("-")[0]
+    for i in range(300):  # more than REPLAY_SIZE
+        h.publish("txn.created", {"id": i})
+    assert types(drain(h.subscribe(f"{epoch}-10"))) == ["reset"]
+    assert len(drain(h.subscribe(f"{epoch}-250"))) == 50
+
+
+def test_backlog_larger_than_the_queue_is_a_reset_not_a_cut(hub):
+    epoch = last_id(hub).split("-")[0]
+    for i in range(5):
+        hub.publish("txn.created", {"id": i})
+    backlog = drain(hub.subscribe(f"{epoch}-0"))  # 8 missed, queue holds 5
+    assert types(backlog) == ["reset"]
+    assert backlog[0][0] == 8
+
+
+def test_slow_client_is_dropped_with_a_reset(hub):
+    q = hub.subscribe()
+    for i in range(6):
+        hub.publish("txn.created", {"id": i})
+    assert hub.stats()["clients"] == 0
+    assert hub.stats()["dropped_clients"] == 1
+    out = frames(hub, q, 6)
+    assert out[-1] == "event: reset\ndata: {}\n\n"
+
+
+def test_client_limit(hub):
+    hub.subscribe()
+    q = hub.subscribe()
+    with pytest.raises(TooManyClients):
+        hub.subscribe()
+    hub.unsubscribe(q)
+    hub.subscribe()
+
+
+def test_reset_after_fork_starts_a_new_epoch(hub):
+    old = last_id(hub)
+    hub.subscribe()
+    hub.reset()
+    assert hub.stats()["clients"] == 0
+    assert types(drain(hub.subscribe(old))) == ["reset"]
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+import ign_index
+
+
+class FakeCursor:
+    """Answers ign_index's two queries from a list of (id, ign) players"""
+
+    def __init__(self, players):
+        self.players = players
+        self.queries = []
+
+    def execute(self, sql, args=None):
+        self.queries.append((sql, args))
+        after = args[0] if args else None
+        self.rows = [{"id": pid, "ign": ign} for pid, ign in self.players
+                     if after is None or pid > after]
+
+    def fetchall(self):
+        return self.rows
+
+
+PLAYERS = [(1, "Steve"), (2, "alex_99"), (3, "Eve"), (4, "Notch"), (5, "evelyn")]
+
+
+@pytest.fixture
+def index():
+    ign_index.reset_after_fork()
+    ign_index.refresh(FakeCursor(PLAYERS))
+    yield ign_index
+    ign_index.reset_after_fork()
+
+
+def test_substring_search_is_case_insensitive(index):
+    assert sorted(index.search("EVE")) == [1, 3, 5]
+    assert index.search("otc") == [4]
+    assert index.search("zzz") == []
+
+
+@pytest.mark.parametrize("q, expected", [("ev", [1, 3, 5]), ("e", [1, 2, 3, 5]),
+                                         ("_", [2]), ("9", [2]), ("qq", [])])
+def test_short_queries_use_their_own_posting_lists(index, q, expected):
+    assert sorted(index.search(q)) == expected
+
+
+def test_wildcards_are_literal(index):
+    assert index.search("%") == []
+    assert index.search("x_9") == [2]
+
+
+def test_too_broad_searches_fall_back(index, monkeypatch):
+    monkeypatch.setattr(ign_index, "MAX_IDS", 2)
+    assert index.search("e") is None
+    assert index.search("eve") is None
+    assert index.search("otc") == [4]
+    assert index.stats()["too_broad"] == 2
+
+
+def test_suggest_lists_prefix_matches_first(index):
+    assert index.suggest("ev", limit=10) == ["Eve", "evelyn", "Steve"]
+    assert index.suggest("ev", limit=1) == ["Eve"]
+
+
+def test_mark_stale_picks_up_new_players_incrementally(index):
+    assert not index.due()
+    index.mark_stale()
+    assert index.due()
+    cursor = FakeCursor(PLAYERS + [(6, "Everest")])
+    index.refresh(cursor)
+    assert "WHERE id >" in cursor.queries[0][0]
+    assert sorted(index.search("eve")) == [1, 3, 5, 6]
+    assert sorted(index.search("ev")) == [1, 3, 5, 6]
+
+
+def test_renamed_player_is_reindexed(index):
+    index.refresh(FakeCursor([(5, "Bob")]), force=False)  # not due: no-op
+    assert 5 in index.search("evelyn")
+    index.mark_stale()
+    # Incremental syncs re-read recent ids, so a rename in that window moves
+    index.refresh(FakeCursor([(5, "Bob")]))
+    assert index.search("evelyn") == []
+    assert index.search("bo") == [5]
+
+
+def test_invalidate_rebuilds_from_scratch(index):
+    index.invalidate()
+    index.refresh(FakeCursor([(1, "Steve")]))
+    assert index.search("eve") == [1]
+    assert index.stats()["players"] == 1
+
+
+def test_only_one_thread_syncs_at_a_time(index):
+    index.mark_stale()
+    cursor = FakeCursor(PLAYERS + [(6, "Everest")])
+    with ign_index._sync_lock:  # another request is mid-sync
+        index.refresh(cursor)
+    assert cursor.queries == []
+    assert index.due()
+    index.refresh(cursor)
+    assert len(cursor.queries) == 1
+
+
+@pytest.mark.parametrize("name", ["_lock", "_sync_lock"])
+def test_reset_after_fork_does_not_wait_for_a_held_lock(name):
+    held = getattr(ign_index, name)
+    held.acquire()
+    try:
+        t = threading.Thread(target=ign_index.reset_after_fork, daemon=True)
+        t.start()
+        t.join(2)
+        assert not t.is_alive()
+        assert getattr(ign_index, name) is not held
+    finally:
+        held.release()
+        ign_index.reset_after_fork()
@@ -0,0 +1,148 @@
+import threading
+from decimal import Decimal
+
+import pytest
+
+import leaderboard
+
+
+class FakeDB:
+    """A db_func whose connection answers leaderboard's sync queries"""
+
+    def __init__(self, accounts):
+        # account_id -> [player_id, ign, status, balance]
+        self.accounts = {aid: list(a) for aid, a in accounts.items()}
+        self.txns = []  # [(id, account_id)]
+        self.queries = 0
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def write(self, account_id, balance):
+        self.accounts[account_id][3] = Decimal(balance)
+        self.txns.append((len(self.txns) + 1, account_id))
+
+    def _row(self, aid):
+        player_id, ign, status, balance = self.accounts[aid]
+        return {"account_id": aid, "player_id": player_id, "status": status, "ign": ign,
+                "balance": Decimal(balance), "last_compounded_at": None, "created_at": None}
+
+    def execute(self, sql, args=None):
+        self.queries += 1
+        if "MAX(id)" in sql:
+            self.rows = [{"txn": len(self.txns), "account": max(self.accounts, default=0)}]
+        elif args is None:
+            self.rows = [self._row(aid) for aid, a in self.accounts.items() if a[2] == "active"]
+        else:
+            txn_after, account_after = args
+            touched = {aid for tid, aid in self.txns if tid > txn_after}
+            self.rows = [self._row(aid) for aid in self.accounts
+                         if aid in touched or aid > account_after]
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+
+ACCOUNTS = {
+    10: (1, "Steve", "active", "500"),
+    11: (2, "alex_99", "active", "900"),
+    12: (3, "Eve", "active", "500"),
+    13: (4, "Notch", "closed", "5000"),
+}
+
+
+@pytest.fixture
+def db(clock):
+    leaderboard.reset_after_fork()
+    fake = FakeDB(ACCOUNTS)
+    leaderboard.refresh(fake)
+    yield fake
+    leaderboard.reset_after_fork()
+
+
+def igns(rows):
+    return [r["ign"] for r in rows]
+
+
+def test_board_is_ordered_by_balance_then_player_id(db):
+    assert igns(leaderboard.page(10)) == ["alex_99", "Eve", "Steve"]
+    assert igns(leaderboard.page(1, offset=1)) == ["Eve"]
+    assert leaderboard.count() == 3
+
+
+def test_keyset_cursor_resumes_after_the_last_row(db):
+    first = leaderboard.page(2)
+    last = first[-1]
+    assert igns(leaderboard.page(2, after=(last["balance"], last["player_id"]))) == ["Steve"]
+
+
+def test_filters_by_player_ids_and_needle(db):
+    assert igns(leaderboard.page(10, player_ids=[1, 3, 4])) == ["Eve", "Steve"]
+    assert leaderboard.count(needle="EV") == 2
+    assert leaderboard.count(player_ids=[4]) == 0
+
+
+def test_rank_and_neighbours(db):
+    rank, rows = leaderboard.rank(3, around=1)
+    assert rank == 2
+    assert igns(rows) == ["alex_99", "Eve", "Steve"]
+    assert leaderboard.rank(4) is None
+
+
+def test_not_due_means_no_queries(db, clock):
+    before = db.queries
+    leaderboard.refresh(db)
+    assert db.queries == before
+    clock.advance(leaderboard.REFRESH)
+    leaderboard.refresh(db)
+    assert db.queries > before
+
+
+def test_stale_board_applies_writes_and_new_accounts(db):
+    db.write(10, "1000")
+    db.accounts[14] = [5, "newbie", "active", Decimal("700")]
+    db.accounts[11][2] = "closed"
+    db.txns.append((len(db.txns) + 1, 11))
+    leaderboard.mark_stale()
+    leaderboard.refresh(db)
+    assert igns(leaderboard.page(10)) == ["Steve", "newbie", "Eve"]
+    assert leaderboard.rank(2) is None
+
+
+def test_resync_corrects_edits_made_outside_the_ledger(db):
+    db.accounts[12][3] = Decimal("2000")  # no transaction row
+    leaderboard.mark_stale()
+    leaderboard.refresh(db)
+    assert igns(leaderboard.page(1)) == ["alex_99"]
+    leaderboard.invalidate()
+    leaderboard.refresh(db)
+    assert igns(leaderboard.page(1)) == ["Eve"]
+    assert leaderboard.stats()["drift_corrected"] == 1
+
+
+@pytest.mark.parametrize("name", ["_lock", "_sync_lock"])
+def test_reset_after_fork_does_not_wait_for_a_held_lock(name):
+    held = getattr(leaderboard, name)
+    held.acquire()  # e.g. another thread was mid-sync when the parent forked
+    try:
+        t = threading.Thread(target=leaderboard.reset_after_fork, daemon=True)
+        t.start()
+        t.join(2)
+        assert not t.is_alive()
+        assert getattr(leaderboard, name) is not held
+        assert leaderboard.count() == 0
+    finally:
+        held.release()
+        leaderboard.reset_after_fork()
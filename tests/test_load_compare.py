@@ -0,0 +1,55 @@
+from benchmarks.load import compare
+
+
+def report(**endpoints):
+    base = {"requests": 100, "errors": 0, "rps": 100.0,
+            "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 40.0}
+    return {"endpoints": {ep: {**base, **fields} for ep, fields in endpoints.items()}}
+
+
+def run(current, baseline, threshold=0.2, min_delta_ms=2.0, min_requests=30):
+    return compare(current, baseline, threshold, min_delta_ms, min_requests)
+
+
+def test_identical_runs_pass():
+    assert run(report(players={}), report(players={})) == []
+
+
+def test_latency_regression_beyond_threshold_and_delta_fails():
+    problems = run(report(players={"p95_ms": 25.0}), report(players={}))
+    assert problems == ["players: p95_ms 20.0 -> 25.0"]
+
+
+def test_latency_growth_within_threshold_passes():
+    assert run(report(players={"p95_ms": 23.9}), report(players={})) == []
+
+
+def test_small_absolute_growth_is_ignored_even_past_threshold():
+    baseline = report(players={"p50_ms": 1.0})
+    assert run(report(players={"p50_ms": 2.5}), baseline) == []
+    assert run(report(players={"p50_ms": 3.5}), baseline) == ["players: p50_ms 1.0 -> 3.5"]
+
+
+def test_rps_drop_fails():
+    assert run(report(players={"rps": 79.0}), report(players={})) == ["players: rps 100.0 -> 79.0"]
+    assert run(report(players={"rps": 81.0}), report(players={})) == []
+
+
+def test_new_errors_fail_even_for_sparse_endpoints():
+    baseline = report(enroll={"requests": 5})
+    current = report(enroll={"requests": 5, "errors": 2, "p99_ms": 500.0})
+    assert run(current, baseline) == ["enroll: 2 errors (baseline had none)"]
+
+
+def test_errors_already_in_the_baseline_are_not_new():
+    baseline = report(enroll={"errors": 1})
+    assert run(report(enroll={"errors": 3}), baseline) == []
+
+
+def test_endpoint_missing_from_the_run_only_warns(capsys):
+    assert run(report(players={}), report(players={}, races={})) == []
+    assert "races: in the baseline but not exercised" in capsys.readouterr().err
+
+
+def test_endpoints_only_in_the_run_are_ignored():
+    assert run(report(players={}, races={"p99_ms": 900.0}), report(players={})) == []
@@ -0,0 +1,81 @@
+import re
+import threading
+
+import pytest
+from flask import Flask
+
+import metrics
+
+
+@pytest.fixture
+def app():
+    metrics.reset_after_fork()
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.get("/api/players/<int:player_id>")
+    def player(player_id):
+        return {"id": player_id}
+
+    yield app
+    metrics.reset_after_fork()
+
+
+def test_render_without_traffic_has_every_family():
+    metrics.reset_after_fork()
+    text = metrics.render()
+    assert text.endswith("\n")
+    for family, kind in (("bank_http_request_duration_seconds", "histogram"),
+                         ("bank_http_requests_total", "counter"),
+                         ("bank_http_requests_in_flight", "gauge"),
+                         ("bank_db_queries_total", "counter"),
+                         ("bank_db_rows_fetched_total", "counter"),
+                         ("bank_db_seconds_total", "counter")):
+        assert f"# TYPE {family} {kind}" in text
+    assert "bank_http_requests_in_flight 0" in text
+
+
+def test_requests_are_labelled_by_route_rule(app):
+    client = app.test_client()
+    client.get("/api/players/1")
+    client.get("/api/players/2")
+    resp = client.get("/api/players/3")
+    assert resp.headers["Server-Timing"].startswith('db;dur=0.00;desc="0 queries, 0 rows"')
+
+    text = metrics.render()
+    labels = 'route="/api/players/<int:player_id>",method="GET"'
+    assert f"bank_http_requests_total{{{labels},status=\"200\"}} 3" in text
+    assert f"bank_http_request_duration_seconds_count{{{labels}}} 3" in text
+    assert f'bank_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert "/api/players/1" not in text
+
+
+def test_histogram_buckets_are_cumulative(app):
+    client = app.test_client()
+    for _ in range(5):
+        client.get("/api/players/1")
+    counts = [int(v) for v in re.findall(r'_bucket\{[^}]*\} (\d+)', metrics.render())]
+    assert len(counts) == len(metrics.LATENCY_BUCKETS) + 1
+    assert counts == sorted(counts)
+    assert counts[-1] == 5
+
+
+def test_gauges_are_appended_in_name_order():
+    metrics.reset_after_fork()
+    lines = metrics.render({"bank_sse_clients": 2, "bank_db_pool_idle": 7}).splitlines()
+    assert lines[-4:] == ["# TYPE bank_db_pool_idle gauge", "bank_db_pool_idle 7",
+                          "# TYPE bank_sse_clients gauge", "bank_sse_clients 2"]
+
+
+def test_reset_after_fork_does_not_wait_for_a_held_lock():
+    held = metrics._lock
+    held.acquire()
+    try:
+        t = threading.Thread(target=metrics.reset_after_fork, daemon=True)
+        t.start()
+        t.join(2)
+        assert not t.is_alive()
+        assert "bank_http_requests_in_flight 0" in metrics.render()
+    finally:
+        held.release()
+        metrics.reset_after_fork()
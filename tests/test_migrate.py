@@ -0,0 +1,65 @@
+import pytest
+
+from scripts import migrate
+
+DEFAULT = migrate.migrations()
+
+
+class FakeCursor:
+    """Answers migrate's information_schema probes from a set of existing objects"""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.n = 0
+
+    def execute(self, sql, args=()):
+        kind = next(k for k, q in migrate._PRESENT_SQL.items() if q == sql)
+        if kind == "trigger":
+            name, timing, event, table = args
+            self.n = any(o[0] == "trigger" and (o[1] == name or o[2:] == (timing, event, table))
+                         for o in self.existing)
+        else:
+            self.n = (kind, *args) in self.existing
+
+    def fetchone(self):
+        return {"n": int(self.n)}
+
+
+def objects_upto(version):
+    found = set()
+    for v, _, path in DEFAULT:
+        if v <= version:
+            with open(path) as f:
+                found.update(migrate.schema_objects(f.read()))
+    return found
+
+
+def test_objects_cover_tables_triggers_indexes_and_columns():
+    kinds = {obj[0] for v, _, path in DEFAULT for obj in migrate.schema_objects(open(path).read())}
+    assert kinds == {"table", "trigger", "index", "column"}
+    assert ("trigger", "transactions_before_insert", "BEFORE", "INSERT", "transactions") in objects_upto(2)
+    assert ("index", "accounts", "idx_accounts_player_status") in objects_upto(3)
+    assert ("column", "rollup_state", "version") in objects_upto(7)
+
+
+@pytest.mark.parametrize("version", [1, 2, 3, len(DEFAULT)])
+def test_baseline_is_the_last_fully_present_migration(version):
+    assert migrate.detect_baseline(FakeCursor(objects_upto(version))) == version
+
+
+def test_existing_trigger_under_another_name_counts():
+    existing = objects_upto(1) | {("trigger", "ledger_bi", "BEFORE", "INSERT", "transactions"),
+                                  ("trigger", "ledger_ai", "AFTER", "INSERT", "transactions")}
+    assert migrate.detect_baseline(FakeCursor(existing)) == 2
+
+
+def test_partly_applied_migration_is_refused():
+    existing = objects_upto(1) | {("trigger", "ledger_bi", "BEFORE", "INSERT", "transactions")}
+    with pytest.raises(SystemExit, match="002_"):
+        migrate.detect_baseline(FakeCursor(existing))
+
+
+def test_later_migration_present_after_a_missing_one_is_refused():
+    existing = objects_upto(1) | (objects_upto(3) - objects_upto(2))
+    with pytest.raises(SystemExit, match="003_"):
+        migrate.detect_baseline(FakeCursor(existing))
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+import pytest
+
+from pagination import BadCursor, decode_cursor, encode_cursor, page
+
+
+def test_cursor_round_trips_with_types():
+    token = encode_cursor(Decimal("1234.50"), 42)
+    assert "=" not in token
+    assert decode_cursor(token, Decimal, int) == (Decimal("1234.50"), 42)
+
+
+def test_empty_cursor_means_first_page():
+    assert decode_cursor("", Decimal, int) is None
+    assert decode_cursor(None, int) is None
+
+
+@pytest.mark.parametrize("token", [
+    "not base64 at all!",
+    encode_cursor(1),                 # wrong arity
+    encode_cursor("abc", 1),          # not a Decimal
+    "e30",                            # {} instead of a list
+])
+def test_foreign_cursors_are_rejected(token):
+    with pytest.raises(BadCursor):
+        decode_cursor(token, Decimal, int)
+
+
+def test_page_trims_the_extra_row_and_points_at_the_last_kept():
+    rows = [{"balance": Decimal(b), "player_id": i} for i, b in enumerate(["30", "20", "10"])]
+    kept, cursor = page(rows, 2, lambda r: (r["balance"], r["player_id"]))
+    assert kept == rows[:2]
+    assert decode_cursor(cursor, Decimal, int) == (Decimal("20"), 1)
+
+
+def test_page_without_extra_row_has_no_next_cursor():
+    rows = [{"id": 1}, {"id": 2}]
+    assert page(rows, 2, lambda r: (r["id"],)) == (rows, None)
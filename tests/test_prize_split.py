@@ -0,0 +1,23 @@
+from decimal import Decimal
+
+import pytest
+
+from horse_races import prize_split
+
+SETTINGS = {"winner_cut_pct": Decimal("50"), "second_cut_pct": Decimal("30"),
+            "third_cut_pct": Decimal("20")}
+
+
+def test_split_follows_the_configured_cuts():
+    assert prize_split(1000.0, SETTINGS) == {1: 500.0, 2: 300.0, 3: 200.0}
+
+
+def test_empty_pool_pays_nothing():
+    assert prize_split(0.0, SETTINGS) == {1: 0.0, 2: 0.0, 3: 0.0}
+
+
+def test_cuts_need_not_add_up_to_the_pool():
+    split = prize_split(900.0, {"winner_cut_pct": 60, "second_cut_pct": 25, "third_cut_pct": 5})
+    assert split[1] == pytest.approx(540.0)
+    assert split[2] == pytest.approx(225.0)
+    assert split[3] == pytest.approx(45.0)
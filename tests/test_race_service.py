@@ -0,0 +1,136 @@
+import re
+
+import pytest
+
+import horse_races
+import player_lookup
+import settings_cache
+from horse_races import RaceError, enroll_players, insert_transactions, settle_race
+
+
+class FakeCursor:
+    """
+    Answers the race service queries from in-memory players, like MySQL
+    with a case-insensitive collation on players.ign
+    """
+
+    def __init__(self, players, step=1, mode=1):
+        self.players = players  # ign -> (player_id, account_id, balance)
+        self.step, self.mode = step, mode
+        self.race = {"id": 7, "name": "Derby", "prize_pool": 1000,
+                     "winner1_id": None, "winner2_id": None, "winner3_id": None}
+        self.jockeys = set()
+        self.txns = []
+        self.next_id = 100
+        self.lastrowid = None
+        self.rowcount = 0
+        self.rows = []
+
+    def execute(self, sql, args=()):
+        sql = " ".join(sql.split())
+        self.rows, self.rowcount = [], 1
+        if "@@auto_increment_increment" in sql:
+            self.rows = [{"step": self.step, "mode": self.mode}]
+        elif sql.startswith("SELECT p.id AS player_id"):
+            wanted = {a.lower() for a in args}
+            self.rows = [{"player_id": pid, "ign": ign, "account_id": aid, "balance": bal}
+                         for ign, (pid, aid, bal) in self.players.items()
+                         if ign.lower() in wanted]
+        elif "FROM horse_jockeys" in sql:
+            self.rows = [{"player_id": p} for p in args[1:] if p in self.jockeys]
+        elif "FROM horse_race_settings" in sql:
+            self.rows = [{"winner_cut_pct": 50, "second_cut_pct": 30, "third_cut_pct": 20,
+                          "entry_fee": 100, "imperial_cut_pct": 10, "rules": ""}]
+        elif sql.startswith("SELECT") and "FROM horse_races" in sql:
+            self.rows = [dict(self.race)]
+        elif sql.startswith("INSERT INTO horse_jockeys"):
+            self.jockeys.update(args[1::2])
+        elif sql.startswith("INSERT INTO transactions"):
+            self.lastrowid = self.next_id
+            for i in range(0, len(args), 4):
+                self.txns.append((self.next_id, args[i], args[i + 2]))
+                self.next_id += self.step
+        elif sql.startswith("UPDATE horse_races SET prize_pool"):
+            self.race["prize_pool"] += args[0]
+        elif sql.startswith("UPDATE horse_races SET winner"):
+            for position, player_id in zip(re.findall(r"winner(\d)_id", sql), args):
+                self.race[f"winner{position}_id"] = player_id
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+PLAYERS = {"Steve": (1, 11, 500), "alex_99": (2, 12, 500), "Broke": (3, 13, 50)}
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(horse_races, "_consecutive_ids", None)
+    settings_cache.reset_after_fork()
+    player_lookup.reset_after_fork()
+    yield
+    settings_cache.reset_after_fork()
+    player_lookup.reset_after_fork()
+
+
+@pytest.mark.parametrize("step, mode", [(1, 2), (2, 1)])
+def test_ids_come_from_each_insert_when_not_consecutive(step, mode):
+    c = FakeCursor(PLAYERS, step=step, mode=mode)
+    ids = insert_transactions(c, "payout", [(11, 100, "a"), (12, 100, "b"), (13, 100, "c")])
+    assert ids == [txn_id for txn_id, *_ in c.txns]
+    assert ids == [100, 100 + step, 100 + 2 * step]
+
+
+def test_consecutive_ids_use_one_insert():
+    c = FakeCursor(PLAYERS)
+    assert insert_transactions(c, "payout", [(11, 100, "a"), (12, 100, "b")]) == [100, 101]
+    assert c.lastrowid == 100
+
+
+def test_enrolment_matches_igns_case_insensitively():
+    c = FakeCursor(PLAYERS, step=2, mode=2)
+    out = enroll_players(c, ["steve", "ALEX_99", "Steve", "nobody", "broke"])
+
+    by_name = {r["player"]: r for r in out["results"]}
+    assert [r["player"] for r in out["results"]] == ["steve", "ALEX_99", "Steve", "nobody", "broke"]
+    assert by_name["steve"]["success"] and by_name["ALEX_99"]["success"]
+    assert {(r["txn_id"], a) for r in out["results"] if r["success"]
+            for t, a, _ in c.txns if t == r["txn_id"]} == {(100, 11), (102, 12)}
+    assert by_name["Steve"]["error"] == "Steve listed more than once"
+    assert by_name["nobody"]["status"] == 404
+    assert by_name["broke"]["error"].startswith("Insufficient balance")
+    assert out["enrolled"] == ["Steve", "alex_99"]
+    assert c.jockeys == {1, 2}
+    assert out["prize_pool"] == 1000 + 2 * 90
+
+
+def test_enrolled_player_is_rejected_in_any_case():
+    c = FakeCursor(PLAYERS)
+    c.jockeys.add(1)
+    out = enroll_players(c, ["STEVE"])
+    assert out["results"] == [{"player": "STEVE", "success": False, "status": 400,
+                               "error": "STEVE already enrolled"}]
+    assert c.txns == []
+
+
+def test_settlement_matches_igns_case_insensitively():
+    c = FakeCursor(PLAYERS)
+    c.jockeys.update({1, 2})
+    out = settle_race(c, {1: "STEVE", 2: "Alex_99"}, end=True)
+    assert [(a["position"], a["player"], a["prize"]) for a in out["awards"]] == [
+        (1, "Steve", 500.0), (2, "alex_99", 300.0)]
+    assert (c.race["winner1_id"], c.race["winner2_id"]) == (1, 2)
+    assert [(account, amount) for _, account, amount in c.txns] == [(11, 500.0), (12, 300.0)]
+
+
+def test_same_player_in_two_cases_is_placed_more_than_once():
+    c = FakeCursor(PLAYERS)
+    c.jockeys.update({1, 2})
+    with pytest.raises(RaceError) as e:
+        settle_race(c, {1: "Steve", 2: "steve"})
+    assert [r["error"] for r in e.value.results] == ["Steve placed more than once",
+                                                    "steve placed more than once"]
+    assert c.txns == []
@@ -0,0 +1,78 @@
+import pytest
+from flask import Flask
+
+import settings_cache
+
+
+class FakeCursor:
+    """Counts settings queries and answers them from two rows"""
+
+    def __init__(self):
+        self.queries = []
+        self.rows = {"settings": {"interest_rate_per_period": 5},
+                     "horse_race_settings": {"entry_fee": 100}}
+
+    def execute(self, sql, args=None):
+        self.queries.append(sql)
+        self.table = "horse_race_settings" if "horse_race_settings" in sql else "settings"
+
+    def fetchone(self):
+        row = self.rows[self.table]
+        return dict(row) if row else None
+
+
+@pytest.fixture(autouse=True)
+def fresh():
+    settings_cache.reset_after_fork()
+    yield
+    settings_cache.reset_after_fork()
+
+
+def test_rows_are_cached_across_calls(clock):
+    c = FakeCursor()
+    assert settings_cache.bank_settings(c) == {"interest_rate_per_period": 5}
+    assert settings_cache.race_settings(c) == {"entry_fee": 100}
+    settings_cache.bank_settings(c)
+    settings_cache.race_settings(c)
+    assert len(c.queries) == 2
+
+
+def test_rows_expire_after_the_ttl(clock):
+    c = FakeCursor()
+    settings_cache.bank_settings(c)
+    clock.advance(settings_cache.SETTINGS_TTL)
+    settings_cache.bank_settings(c)
+    assert len(c.queries) == 2
+
+
+def test_callers_get_copies(clock):
+    c = FakeCursor()
+    settings_cache.bank_settings(c)["interest_rate_per_period"] = 99
+    assert settings_cache.bank_settings(c) == {"interest_rate_per_period": 5}
+
+
+def test_missing_row_is_none_and_cached(clock):
+    c = FakeCursor()
+    c.rows["settings"] = None
+    assert settings_cache.bank_settings(c) is None
+    assert settings_cache.bank_settings(c) is None
+    assert len(c.queries) == 1
+
+
+def test_invalidate_reloads(clock):
+    c = FakeCursor()
+    settings_cache.bank_settings(c)
+    c.rows["settings"] = {"interest_rate_per_period": 7}
+    settings_cache.invalidate()
+    assert settings_cache.bank_settings(c) == {"interest_rate_per_period": 7}
+
+
+def test_one_request_reads_one_value_even_if_the_cache_is_cleared(clock):
+    c = FakeCursor()
+    with Flask(__name__).test_request_context():
+        settings_cache.bank_settings(c)
+        settings_cache._cache.clear()  # e.g. another thread's invalidate()
+        c.rows["settings"] = {"interest_rate_per_period": 7}
+        assert settings_cache.bank_settings(c) == {"interest_rate_per_period": 5}
+    assert settings_cache.stats()["request_memo_hits"] == 1
+    assert settings_cache.bank_settings(c) == {"interest_rate_per_period": 7}
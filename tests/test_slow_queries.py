@@ -0,0 +1,65 @@
+import json
+import threading
+from decimal import Decimal
+
+import pytest
+
+import slow_queries
+from slow_queries import normalize, shape
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    path = tmp_path / "slow-{pid}.log"
+    monkeypatch.setattr(slow_queries, "LOG_PATH", str(path))
+    slow_queries.reset_after_fork()
+    yield tmp_path
+    slow_queries.reset_after_fork()
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT *\n  FROM   players\n WHERE id = 42", "SELECT * FROM players WHERE id = ?"),
+    ("SELECT 1 FROM t WHERE ign = 'O\\'Brien' AND x > -1.5", "SELECT ? FROM t WHERE ign = ? AND x > ?"),
+    ("SELECT * FROM t WHERE id IN (%s, %s,%s)", "SELECT * FROM t WHERE id IN (%s, ...)"),
+    ("SELECT winner1_id, t2.id FROM t2", "SELECT winner1_id, t2.id FROM t2"),
+])
+def test_normalize(sql, expected):
+    assert normalize(sql) == expected
+
+
+def test_shape_reports_types_never_values():
+    assert shape(None) is None
+    assert shape(("steve", 1, 2, 3, Decimal("5"))) == ["str", "int x 3", "Decimal"]
+    assert shape({"ign": "steve"}) == {"ign": "str"}
+    assert shape([(1, "a"), (2, "b")], many=True) == {"rows": 2, "row": ["int", "str"]}
+
+
+def test_only_statements_over_the_threshold_are_logged(log):
+    slow_queries.set_threshold(100)
+    slow_queries.observe("SELECT * FROM players WHERE ign = %s", ("secret",), 0.05)
+    slow_queries.observe("SELECT * FROM players WHERE ign = %s", ("secret",), 0.25, rows=1)
+    [path] = log.iterdir()
+    [line] = path.read_text().splitlines()
+    record = json.loads(line)
+    assert record["ms"] == 250.0
+    assert record["params"] == ["str"]
+    assert "secret" not in line
+    assert slow_queries.stats()["logged"] == 1
+
+
+def test_threshold_zero_turns_logging_off(log):
+    slow_queries.set_threshold(0)
+    slow_queries.observe("SELECT 1", None, 10.0)
+    assert list(log.iterdir()) == []
+
+
+def test_reset_after_fork_does_not_wait_for_a_held_lock(log):
+    held = slow_queries._lock
+    held.acquire()
+    try:
+        t = threading.Thread(target=slow_queries.reset_after_fork, daemon=True)
+        t.start()
+        t.join(2)
+        assert not t.is_alive()
+    finally:
+        held.release()
@@ -0,0 +1,77 @@
+from ttl_cache import TTLCache
+
+
+def test_get_returns_value_until_ttl_passes(clock):
+    cache = TTLCache(maxsize=4, ttl=5)
+    cache.set("a", 1)
+    clock.advance(4.9)
+    assert cache.get("a") == 1
+    clock.advance(0.2)
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_per_entry_ttl_overrides_default(clock):
+    cache = TTLCache(ttl=5)
+    cache.set("a", 1, ttl=60)
+    clock.advance(30)
+    assert cache.get("a") == 1
+
+
+def test_zero_ttl_disables_caching():
+    cache = TTLCache(ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a", "missing") == "missing"
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_get_or_load_calls_loader_once():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    def load():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_load("k", load) == "value"
+    assert cache.get_or_load("k", load) == "value"
+    assert len(calls) == 1
+
+
+def test_get_or_load_caches_falsy_values():
+    cache = TTLCache(ttl=60)
+    calls = []
+    cache.get_or_load("k", lambda: calls.append(1) or 0)
+    cache.get_or_load("k", lambda: calls.append(1) or 0)
+    assert len(calls) == 1
+
+
+def test_pop_clear_and_stats():
+    cache = TTLCache(ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.pop("a")
+    cache.pop("missing")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+    cache.clear()
+    assert cache.stats()["size"] == 0
+
+
+def test_reset_after_fork_empties_the_map():
+    cache = TTLCache(ttl=60)
+    cache.set("a", 1)
+    cache.reset_after_fork()
+    assert cache.get("a") is None